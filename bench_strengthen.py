@@ -0,0 +1,63 @@
+import importlib
+import sys
+
+from schedule_dag import ScheduleDAG
+from dag_io import load_input_spec
+from drmt import DrmtScheduleSolver
+import bounds
+
+PROGRAMS = ['switch_combined', 'switch_combined_subset', 'switch_egress', 'switch_egress_subset',\
+            'switch_ingress', 'switch_ingress_subset']
+
+def run(G, input_spec, latency_spec, period, minute_limit, strengthen, seed):
+  """ Returns (outcome, schedule length, build time, solve time) of model 2
+  at the period, from the seed heuristics with the given master seed.
+  The schedule cache is off, it would answer the second run. """
+  solver = DrmtScheduleSolver(G, input_spec, latency_spec, seed_rnd_sieve = True,\
+                              period_duration = period, minute_limit = minute_limit, model = 2,\
+                              seed = seed, strengthen = strengthen, cache = None)
+  solution = solver.solve()
+  if solution is None:
+    return ('time limit', None, None, None)
+  if not solution.success:
+    return ('infeasible', None, solution.build_time, solution.time)
+  return ('solved', solution.length, solution.build_time, solution.time)
+
+if __name__ == "__main__":
+  # Cmd line args
+  if (len(sys.argv) < 4):
+    print ("Usage: ", sys.argv[0], " <HW file> <latency file> <time limit in mins> [<program>[:<P>] ...]")
+    print ("Compares the time to optimal of model 2 with and without strengthen, at the period")
+    print ("lower bound of every program unless given. The default programs are ", ' '.join(PROGRAMS))
+    exit(1)
+  hw_file      = sys.argv[1]
+  latency_file = sys.argv[2]
+  minute_limit = int(sys.argv[3])
+  programs = sys.argv[4:] or PROGRAMS
+
+  hw_spec    = importlib.import_module(hw_file, "*")
+  latency_spec=importlib.import_module(latency_file, "*")
+  rows = []
+  for program in programs:
+    (input_file, _, period) = program.partition(':')
+    input_spec = load_input_spec(input_file)
+    input_spec.action_fields_limit = hw_spec.action_fields_limit
+    input_spec.match_unit_limit    = hw_spec.match_unit_limit
+    input_spec.match_unit_size     = hw_spec.match_unit_size
+    input_spec.action_proc_limit   = hw_spec.action_proc_limit
+    input_spec.match_proc_limit    = hw_spec.match_proc_limit
+
+    G = ScheduleDAG()
+    G.create_dag(input_spec.nodes, input_spec.edges, latency_spec)
+    period = int(period) if period else bounds.period_lower_bound(G, input_spec)[0]
+    for strengthen in (False, True):
+      # Same seed for both, so both models start from the same schedule
+      rows.append((input_file, period, strengthen) + run(G, input_spec, latency_spec, period, minute_limit, strengthen, 1))
+
+  print ('{:*^80}'.format(' Strengthened model 2 '))
+  print ('%-24s %4s %10s %-10s %6s %10s %10s' % ('program', 'P', 'strengthen', 'outcome', 'length', 'build (s)', 'solve (s)'))
+  for (program, period, strengthen, outcome, length, build_time, solve_time) in rows:
+    print ('%-24s %4d %10s %-10s %6s %10s %10s' % (program, period, strengthen, outcome,\
+           '-' if length is None else length,\
+           '-' if build_time is None else '%.2f' % build_time,\
+           '-' if solve_time is None else '%.2f' % solve_time))
@@ -0,0 +1,134 @@
+import collections
+import importlib
+import math
+import sys
+
+from schedule_dag import ScheduleDAG, NODE_TYPES
+from dag_io import load_input_spec
+
+def resource_bound(demands, limit):
+  """ Slots needed for the total demand: ceil(sum / limit) """
+  return int(math.ceil((1.0 * sum(demands)) / limit))
+
+def bin_packing_bound(demands, limit):
+  """ Slots needed to pack the demands as items into bins of size limit
+
+  Every ring slot is a bin, and a node takes its whole demand from one
+  slot. This is the L2 bound of Martello and Toth: for every threshold
+  k <= limit / 2, items above limit - k need a bin each, items above
+  limit / 2 need a bin each too, and items of size at least k have to fit
+  into the room those bins leave, or open new bins.
+  It is at least the number of items above limit / 2 and at least
+  resource_bound.
+  """
+  items = sorted([d for d in demands if d > 0], reverse=True)
+  best = resource_bound(items, limit)
+  for k in sorted(set([0] + [d for d in items if d <= limit / 2.0])):
+    large = [d for d in items if d > limit - k]
+    medium = [d for d in items if (limit / 2.0 < d <= limit - k)]
+    small = [d for d in items if (k <= d <= limit / 2.0)]
+    room = len(medium) * limit - sum(medium)
+    extra = max(0, int(math.ceil((1.0 * (sum(small) - room)) / limit)))
+    best = max(best, len(large) + len(medium) + extra)
+  return best
+
+def distinct_times(dag, select):
+  """ Lower bound on the number of distinct start times of the select
+  ('match' or 'action') nodes in any schedule
+
+  Two such nodes on one path must start at different times whenever the
+  path between them has a positive delay. Longest path DP with two
+  states per node: the count so far, and whether the delay since the
+  last counted node is still zero (so the next one may share its time).
+  """
+  frozen = dag.freeze()
+  counted = (frozen.types == NODE_TYPES.index(select)).tolist()
+  # longest count ending at v, with positive (False) or zero (True) delay since the last counted node
+  count = [None] * len(frozen.names)
+  for v in frozen.order:
+    states = [(0, False)]
+    for k in range(frozen.pred_ptr[v], frozen.pred_ptr[v + 1]):
+      u = frozen.pred_idx[k]
+      states.append((count[u][False], False))
+      if count[u][True] is not None:
+        states.append((count[u][True], frozen.pred_delay[k] == 0))
+    best = {False: 0, True: None}
+    for (c, zero) in states:
+      if counted[v]:
+        (c, zero) = (c if zero else c + 1, True)
+      if (best[zero] is None) or (c > best[zero]):
+        best[zero] = c
+    count[v] = best
+  return max([max(c for c in best.values() if c is not None) for best in count] or [0])
+
+def head_and_tail(dag):
+  """ Longest delay on a path ending (head) and starting (tail) at every node """
+  return dag.head_and_tail()
+
+def time_windows(dag, horizon):
+  """ Earliest and latest start time of every node when all start times
+  are in [0, horizon]: from ASAP (head) and ALAP (horizon - tail)
+
+  Returns
+  -------
+  windows : dict
+      (earliest, latest) per node, empty (earliest > latest) if the
+      horizon is shorter than the longest path through the node
+  """
+  head, tail = head_and_tail(dag)
+  return dict((v, (head[v], horizon - tail[v])) for v in head)
+
+def period_lower_bound(dag, input_spec):
+  """ Smallest period for which a dRMT schedule can exist
+
+  Every slot of the ring holds at most match_unit_limit match units and
+  action_fields_limit action fields, and match (action) nodes from at
+  most match_proc_limit (action_proc_limit) distinct start times.
+
+  Returns
+  -------
+  bound : int
+      Lower bound on the period, at least 1
+  contributions : OrderedDict
+      The bound every argument gives on its own
+  """
+  arrays = dag.resource_arrays(input_spec)
+  match_units = arrays.match_units[arrays.is_match].tolist()
+  action_fields = arrays.action_fields[arrays.is_action].tolist()
+
+  contributions = collections.OrderedDict()
+  contributions['match units'] = resource_bound(match_units, input_spec.match_unit_limit)
+  contributions['action fields'] = resource_bound(action_fields, input_spec.action_fields_limit)
+  contributions['match unit packing'] = bin_packing_bound(match_units, input_spec.match_unit_limit)
+  contributions['action field packing'] = bin_packing_bound(action_fields, input_spec.action_fields_limit)
+  contributions['match packets'] = int(math.ceil((1.0 * distinct_times(dag, 'match')) / input_spec.match_proc_limit))
+  contributions['action packets'] = int(math.ceil((1.0 * distinct_times(dag, 'action')) / input_spec.action_proc_limit))
+  return max([1] + list(contributions.values())), contributions
+
+def print_bounds(bound, contributions):
+  print ('{:*^80}'.format(' Period lower bound '))
+  for name in contributions:
+    print ('%-24s %4d' % (name, contributions[name]))
+  print ('Period lower bound = %d cycles' % bound)
+
+if __name__ == "__main__":
+  # Cmd line args
+  if (len(sys.argv) != 4):
+    print ("Usage: ", sys.argv[0], " <DAG file> <HW file> <latency file>")
+    exit(1)
+  input_file   = sys.argv[1]
+  hw_file      = sys.argv[2]
+  latency_file = sys.argv[3]
+
+  input_spec = load_input_spec(input_file)
+  hw_spec    = importlib.import_module(hw_file, "*")
+  latency_spec=importlib.import_module(latency_file, "*")
+  input_spec.action_fields_limit = hw_spec.action_fields_limit
+  input_spec.match_unit_limit    = hw_spec.match_unit_limit
+  input_spec.match_unit_size     = hw_spec.match_unit_size
+  input_spec.action_proc_limit   = hw_spec.action_proc_limit
+  input_spec.match_proc_limit    = hw_spec.match_proc_limit
+
+  G = ScheduleDAG()
+  G.create_dag(input_spec.nodes, input_spec.edges, latency_spec)
+  print_bounds(*period_lower_bound(G, input_spec))
@@ -7,7 +7,13 @@ import importlib
 import sys
 import networkx as nx
 from schedule_dag import ScheduleDAG
+from dag_io import load_input_spec, program_name
+import result_store
+from ilp_backend import DEFAULT_BACKEND
+import tracing
 from printing import Printing
+from bounds import period_lower_bound, print_bounds
+from schedule_validator import debug_check
 
 if __name__ == '__main__':
 	if (len(sys.argv) != 5):
@@ -18,8 +24,10 @@ if __name__ == '__main__':
 		hw_file      = sys.argv[2]
 		latency_file = sys.argv[3]
 		minute_limit = int(sys.argv[4])
+	run = tracing.start('compare_ilps', program = program_name(input_file), hw = hw_file, latency = latency_file)
+	load = tracing.start('load dag')
 	# Input specification
-	input_spec = importlib.import_module(input_file, "*")
+	input_spec = load_input_spec(input_file)
 	hw_spec    = importlib.import_module(hw_file, "*")
 	latency_spec_short=importlib.import_module(latency_file, "*")
 	input_spec.action_fields_limit = hw_spec.action_fields_limit
@@ -35,12 +43,17 @@ if __name__ == '__main__':
 	G.nodes()
 	G.create_dag(input_spec.nodes, input_spec.edges, latency_spec_short)
 	cpath, cplat = G.critical_path()
+	load.stop()
+	# No period below this is feasible, for any of the solvers
+	period_bound, contributions = period_lower_bound(G, input_spec)
+	print_bounds(period_bound, contributions)
 
 #=========================================================
 # 	MYILP
 #=========================================================
 	solver = MyILP(G,input_spec, minute_limit)
-	solution_myilp = solver.solve()
+	with tracing.span('myilp'):
+		solution_myilp = solver.solve()
 
 	if not solution_myilp.result:
 		print(input_file+", MyILP: "+solution_myilp.descr)
@@ -56,6 +69,7 @@ if __name__ == '__main__':
 	solution_prmt = solver.solve(solve_coarse = False) #What is false?
 
 	prmt_last_good_p = None
+	rotate = tracing.start('sieve rotator')
 	while P > 0:
 		prmt_sch = sieve_rotator(solution_prmt.ops_at_time, P, latency_spec_short.dM, latency_spec_short.dA)
 		if prmt_sch == None:
@@ -70,6 +84,7 @@ if __name__ == '__main__':
 			prmt_last_good_p = P
 			prmt_last_good_solution = prmt_sch
 			P -= 1
+	rotate.stop()
 #=========================================================
 # 	DRMT
 #=========================================================
@@ -78,9 +93,26 @@ if __name__ == '__main__':
 	else:
 		P = solution_myilp.P
 
-	while P > 0:
-		solver = DrmtScheduleSolver(G, input_spec, latency_spec_short, seed_rnd_sieve = False, period_duration = P, minute_limit = minute_limit, model = 2)
+	P = max(P, period_bound)
+	drmt_last_good_p = None
+	drmt_last_not_good_P = None
+	drmt_last_not_good_solution = None
+
+	# One model 2 for every period, retargeted instead of rebuilt. It needs
+	# Gurobi, the other backends build model 2 for every period.
+	persistent_model = None
+	probes = []
+	if DEFAULT_BACKEND == 'gurobi':
+		from incremental_drmt import IncrementalDrmtModel
+		persistent_model = IncrementalDrmtModel(G, input_spec)
+		probes = persistent_model.probes
+	sweep = tracing.start('drmt sweep')
+	while P >= period_bound:
+		solver = DrmtScheduleSolver(G, input_spec, latency_spec_short, seed_rnd_sieve = False, period_duration = P, minute_limit = minute_limit, model = 2, persistent_model = persistent_model)
 		solution_drmt = solver.solve()
+		if persistent_model is None:
+			probes.append({'period': P, 'build_time': solution_drmt.build_time, 'solve_time': solution_drmt.time,\
+			               'status': 'feasible' if solution_drmt.success else 'infeasible'})
 		if solution_drmt.success == True:
 			# New solution found
 			drmt_last_good_p   = P
@@ -96,8 +128,37 @@ if __name__ == '__main__':
 			else:
 				# Currently no good solution for any P
 				P += 1
+	sweep.stop()
 
+	# The schedules behind the reported periods, MyILP has only the period
+	if prmt_last_good_p != None:
+		debug_check(G, input_spec, prmt_last_good_solution, prmt_last_good_p, 'prmt + rotator')
+	if drmt_last_good_p != None:
+		debug_check(G, input_spec, drmt_last_good_solution.time_of_op, drmt_last_good_p, 'drmt')
 
 	print(input_file+", MyILP: "+str(solution_myilp.P)+", PRMT: "+ str(prmt_last_good_p)+", DRMT: "+str(drmt_last_good_p))
-	print("time, MyILP: "+str(solution_myilp.time)+", PRMT: "+ str(solution_prmt.time)+", DRMT: "+str(drmt_last_good_solution.time))
-	print(drmt_last_not_good_P,drmt_last_not_good_solution.time)
\ No newline at end of file
+	print("time, MyILP: "+str(getattr(solution_myilp, 'time', None))+", PRMT: "+ str(solution_prmt.time)+", DRMT: "+str(drmt_last_good_solution.time))
+	if drmt_last_not_good_solution is None:
+		print("period "+str(period_bound - 1)+" is below the lower bound "+str(period_bound))
+	else:
+		print(drmt_last_not_good_P,drmt_last_not_good_solution.time)
+	for probe in probes:
+		print("period: "+str(probe['period'])+", build: "+str(probe['build_time'])+", solve: "+str(probe.get('solve_time'))+", "+str(probe.get('status')))
+
+	record = result_store.problem_record('compare_ilps', program_name(input_file), hw_file, latency_file,\
+	                                     G, input_spec, latency_spec_short)
+	solutions = (('myilp', solution_myilp.P if solution_myilp.result else None, solution_myilp),\
+	             ('prmt', prmt_last_good_p, solution_prmt),\
+	             ('drmt', drmt_last_good_p, drmt_last_good_solution if drmt_last_good_p != None else None))
+	record.update({'minute_limit': minute_limit,\
+	               'period_lower_bound': period_bound,\
+	               'probes': probes})
+	for (name, period, solution) in solutions:
+		record[name] = {'period': period,\
+		                'length': getattr(solution, 'length', None),\
+		                'solve_time': getattr(solution, 'time', None)}
+	run.stop()
+	if tracing.enabled():
+		record['spans'] = tracing.totals()
+	result_store.emit(record)
+	tracing.report()
@@ -0,0 +1,131 @@
+import gzip
+import importlib
+import json
+import os
+import sys
+import types
+
+from schedule_dag import ScheduleDAG
+
+# Files with one of these suffixes are serialized programs, anything else
+# is the name of a module with nodes and edges dicts
+PROGRAM_SUFFIXES = ('.json', '.json.gz')
+
+FORMAT = 'drmt-program'
+VERSION = 1
+
+def save_program(path, nodes, edges):
+  """ Writes a program in the serialized format, gzipped if path ends with .gz
+
+  Node names are stored once. Every attribute is a column with one
+  entry per node (edge), null where the node (edge) does not have it,
+  and edges refer to their endpoints by node index.
+
+  Parameters
+  ----------
+  path : string
+      Output file
+  nodes : dict
+      Annotated nodes, as in the input modules
+  edges : dict
+      Annotated edges, keyed by (u, v)
+  """
+  names = sorted(nodes)
+  index = dict((name, i) for (i, name) in enumerate(names))
+  pairs = sorted(edges)
+  program = {'format': FORMAT,\
+             'version': VERSION,\
+             'names': names,\
+             'node_attrs': _columns([nodes[name] for name in names]),\
+             'src': [index[u] for (u, v) in pairs],\
+             'dst': [index[v] for (u, v) in pairs],\
+             'edge_attrs': _columns([edges[pair] for pair in pairs])}
+  with _open(path, 'w') as f:
+    f.write(json.dumps(program, separators = (',', ':'), sort_keys = True))
+
+def load_program(path):
+  """ Reads a program written by save_program
+
+  Returns
+  -------
+  nodes : dict
+      Annotated nodes
+  edges : dict
+      Annotated edges, keyed by (u, v)
+  """
+  with _open(path, 'r') as f:
+    program = json.loads(f.read())
+  if (program.get('format') != FORMAT) or (program.get('version') != VERSION):
+    raise ValueError('%s is not a version %d %s file' % (path, VERSION, FORMAT))
+  names = [str(name) for name in program['names']]
+  nodes = dict((name, dict()) for name in names)
+  _fill([nodes[name] for name in names], program['node_attrs'])
+  edges = dict(((names[u], names[v]), dict()) for (u, v) in zip(program['src'], program['dst']))
+  _fill([edges[names[u], names[v]] for (u, v) in zip(program['src'], program['dst'])], program['edge_attrs'])
+  return nodes, edges
+
+def load_input_spec(name):
+  """ Input specification from a serialized program or a module
+
+  A name ending in .json or .json.gz is read with load_program,
+  anything else is imported as before. Either way the result has nodes
+  and edges attributes, and takes the hardware limits the same way.
+  """
+  if not name.endswith(PROGRAM_SUFFIXES):
+    return importlib.import_module(name, "*")
+  input_spec = types.ModuleType(program_name(name))
+  (input_spec.nodes, input_spec.edges) = load_program(name)
+  return input_spec
+
+def program_name(name):
+  """ Name of a program for reports and file names: the module name, or
+  the file name without directory and suffix """
+  for suffix in PROGRAM_SUFFIXES:
+    if name.endswith(suffix):
+      return os.path.basename(name[:-len(suffix)])
+  return name
+
+def load_dag(name, latency_spec):
+  """ Returns (input_spec, ScheduleDAG) of a serialized program or a module """
+  input_spec = load_input_spec(name)
+  G = ScheduleDAG()
+  G.create_dag(input_spec.nodes, input_spec.edges, latency_spec)
+  return input_spec, G
+
+def _columns(records):
+  keys = sorted(set(key for record in records for key in record))
+  return dict((key, [record.get(key) for record in records]) for key in keys)
+
+def _fill(records, columns):
+  for key in columns:
+    for (record, value) in zip(records, columns[key]):
+      if value is not None:
+        record[str(key)] = str(value) if isinstance(value, type(u'')) else value
+
+def _open(path, mode):
+  if path.endswith('.gz'):
+    return gzip.open(path, mode + 't') if sys.version_info[0] >= 3 else gzip.open(path, mode + 'b')
+  return open(path, mode)
+
+if __name__ == "__main__":
+  # Cmd line args
+  if (len(sys.argv) < 2):
+    print ("Usage: ", sys.argv[0], " <DAG file> ... [-o <output dir>]")
+    print ("Converts every DAG module (or .py file) to <name>.json.gz, in the")
+    print ("output directory if given, else next to the module")
+    exit(1)
+  args = sys.argv[1:]
+  out_dir = None
+  if '-o' in args:
+    out_dir = args[args.index('-o') + 1]
+    args = args[:args.index('-o')] + args[args.index('-o') + 2:]
+  for arg in args:
+    if arg.endswith('.py'):
+      (directory, module) = os.path.split(arg[:-len('.py')])
+      sys.path.insert(0, directory or '.')
+    else:
+      (directory, module) = ('', arg)
+    input_spec = importlib.import_module(module, "*")
+    path = os.path.join(out_dir if out_dir is not None else directory, module + '.json.gz')
+    save_program(path, input_spec.nodes, input_spec.edges)
+    print ('%s: %d nodes, %d edges -> %s' % (arg, len(input_spec.nodes), len(input_spec.edges), path))
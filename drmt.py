@@ -1,31 +1,65 @@
-from gurobipy import *
+from ilp_backend import make_backend, capped_threads, DEFAULT_BACKEND, INTEGER, BINARY, INFINITY, OPTIMAL, INFEASIBLE, TIME_LIMIT
 import networkx as nx
 import numpy as np
 import collections
 import importlib
+import itertools
 import math
-from printing import Printing
-from schedule_dag import ScheduleDAG
+from printing import Printing, peak_memory
+from schedule_dag import ScheduleDAG, NODE_TYPES
+from dag_io import load_input_spec, program_name
 from printers import *
 from solution import Solution
+from schedule_arrays import usage_dict
+from schedule_validator import debug_check, validate_schedule
+from drmt_cpsat import DrmtCpSatModel
 from randomized_sieve import *
 from sieve_rotator import *
+from seed_portfolio import default_portfolio
+from schedule_cache import default_cache, fingerprint
+import bounds
+import result_store
+import tracing
 from prmt import PrmtFineSolver
 import time
 import sys
 
-RND_SIEVE_TIME = 30
+SEED_TIME = 30 # seconds for the seed heuristics, see seed_portfolio
+
+def seedless_horizon(dag, period_duration):
+  """ Schedule length the ILP searches up to when no seed schedule is
+  found: 1.5 times the critical path, rounded up to whole periods. An
+  infeasible answer only rules out schedules up to this length. """
+  cpath, cplat = dag.critical_path()
+  return int(math.ceil(1.5 * cplat / period_duration)) * period_duration
 
 class DrmtScheduleSolver:
-    def __init__(self, dag, input_spec, latency_spec, seed_rnd_sieve, period_duration, minute_limit, model, logToConsole = 0):
+    def __init__(self, dag, input_spec, latency_spec, seed_rnd_sieve, period_duration, minute_limit, model, logToConsole = 0, threads = 0, persistent_model = None, backend = None, seed = None, strengthen = False, cache = True):
         self.G = dag
         self.input_spec = input_spec
         self.latency_spec = latency_spec
         self.seed_rnd_sieve = seed_rnd_sieve
         self.period_duration = period_duration
         self.minute_limit    = minute_limit
-        self.model = model
+        self.model = model # 1: P minimization, 2: quotient/remainder ILP, 3: CP-SAT
         self.logToConsole = logToConsole
+        self.threads = threads # 0 lets the solver pick
+        # IncrementalDrmtModel reused across periods instead of rebuilding model 2
+        self.persistent_model = persistent_model
+        # ILP backend name, None for ilp_backend.DEFAULT_BACKEND
+        self.backend = backend
+        # Master seed of the randomized sieve, a random one if None
+        self.seed = seed
+        # Symmetry breaking and redundant cuts in a fresh model 2, see _strengthen
+        self.strengthen = strengthen
+        # The persistent model is plain model 2 on Gurobi, other backends and
+        # strengthen build the windowed model 2 for every period instead
+        if (persistent_model is not None) and (((backend or DEFAULT_BACKEND) != 'gurobi') or strengthen):
+          print ('Not reusing the persistent model with backend %s%s' %\
+                 (backend or DEFAULT_BACKEND, ' and strengthen' if strengthen else ''))
+          self.persistent_model = None
+        # ScheduleCache for warm starts and known answers, True for the default one, None for none
+        self.cache = default_cache() if (cache is True) else cache
 
     def solve(self):
         """ Returns the optimal schedule
@@ -39,42 +73,65 @@ class DrmtScheduleSolver:
         length : int
             Maximum latency of optimal schedule
         """
+        with tracing.span('drmt solve', period = self.period_duration, model = self.model):
+          return self._solve()
+
+    def _solve(self):
+        # Known answers for this period come from the cache, before any model is built
+        self.cache_key = None
+        cached = None
+        if (self.cache is not None) and (self.model != 1):
+          with tracing.span('cache lookup'):
+            self.cache_key = fingerprint(self.G, self.input_spec, self.latency_spec, self.period_duration, 'drmt')
+            cached = self.cache.lookup(self.cache_key)
+          if cached and (cached['status'] == 'feasible') and\
+             validate_schedule(self.G, self.input_spec, cached['schedule'], self.period_duration):
+            print ('Ignoring invalid cached schedule')
+            cached = None
+        # Infeasibility is only proven up to the horizon the solver searched,
+        # it answers once the seed heuristics find nothing either
+        proven = None
+        if cached and (cached['status'] == 'infeasible'):
+          (proven, cached) = (cached['provenance'], None)
+        if cached and (cached['gap'] == 0.0):
+          print ('Optimal solution from the schedule cache, found by %s' % cached['provenance'].get('solver'))
+          solution = self._solution(cached['schedule'], cached['length'], 0.0, 0.0, peak_memory())
+          (solution.gap, solution.seed) = (0.0, 'cache')
+          return solution
+
+        seed_name = None
         init_drmt_schedule = None
-        if (self.seed_rnd_sieve):
-          print ('{:*^80}'.format(' Running rnd sieve '))
-          rnd_sch = rnd_sieve(self.input_spec, self.G, RND_SIEVE_TIME, self.period_duration)
-
-          print ('{:*^80}'.format(' Running PRMT + rotator '))
-          psolver = PrmtFineSolver(self.G, self.input_spec, self.latency_spec, seed_greedy=True)
-          solution = psolver.solve(solve_coarse = False)
-          prmt_sch = sieve_rotator(solution.ops_at_time, self.period_duration, self.latency_spec.dM, self.latency_spec.dA)
-
-          if ((rnd_sch == None) and (prmt_sch == None)):
-            print ("Both heuristics returned nothing")
-            init_drmt_schedule = None
-          elif ((rnd_sch == None)):
-            print ("Picking output from PRMT")
-            print ("Latency for PRMT ", max(prmt_sch.values()))
-            init_drmt_schedule = prmt_sch
-          elif ((prmt_sch == None)):
-            print ("Picking output from RND sieve")
-            print ("Latency for RND sieve: ", max(rnd_sch.values()))
-            init_drmt_schedule = rnd_sch
-          else:
-            print ("Latencies, PRMT: ", max(prmt_sch.values()), " RND sieve: ", max(rnd_sch.values()))
-            if (max(prmt_sch.values()) < max(rnd_sch.values())):
-              print ("Picking output from PRMT")
-              init_drmt_schedule = prmt_sch
-            else:
-              print ("Picking output from RND sieve")
-              init_drmt_schedule = rnd_sch
+        if cached:
+          # At least as good as the heuristics, it was their best or better
+          print ('Seeding from the schedule cache, length %d' % cached['length'])
+          (seed_name, init_drmt_schedule) = ('cache', cached['schedule'])
+        elif (self.seed_rnd_sieve):
+          print ('{:*^80}'.format(' Running seed heuristics '))
+          # The parallel sieve gets the cores the ILP solver gets later, all of them if threads is 0
+          portfolio = default_portfolio(self.input_spec, self.G, self.latency_spec, self.period_duration,\
+                                        SEED_TIME, seed = self.seed, processes = (capped_threads(self.threads) or None),\
+                                        backend = self.backend)
+          with tracing.span('seed heuristics'):
+            (seed_name, init_drmt_schedule) = portfolio.run()
+          portfolio.print_log()
+        # Replays the seed schedule with replay_sieve or replay_greedy
+        seed_value = getattr(init_drmt_schedule, 'seed', None)
 
         if (init_drmt_schedule):
           Q_MAX = int(math.ceil((1.0 * (max(init_drmt_schedule.values()) + 1)) / self.period_duration))
         else:
           # Set Q_MAX based on critical path
-          cpath, cplat = self.G.critical_path()
-          Q_MAX = int(math.ceil(1.5 * cplat / self.period_duration))
+          Q_MAX = seedless_horizon(self.G, self.period_duration) // self.period_duration
+
+        if (proven is not None) and (init_drmt_schedule is None) and\
+           (Q_MAX * self.period_duration <= (proven.get('horizon') or 0)):
+          print ('Infeasible up to length %d, proven by %s' % (proven['horizon'], proven.get('solver')))
+          solution = Solution()
+          solution.time = solution.build_time = 0.0
+          solution.build_memory = peak_memory()
+          solution.success = False
+          (solution.seed, solution.horizon) = ('cache', proven['horizon'])
+          return solution
 
         print ('{:*^80}'.format(' Running DRMT ILP solver '))
         T = self.period_duration
@@ -84,113 +141,160 @@ class DrmtScheduleSolver:
         edges = self.G.edges()
         print(Q_MAX,T,len(nodes))
 
-        m = Model()
-        m.setParam("LogToConsole", self.logToConsole)
-
-        qwe = Printing(self.logToConsole)
-        qwe = qwe.count
+        build_timer = Printing()
+        build_timer.start()
+        build = tracing.start('build')
 
         if self.model == 1:
+          m = make_backend(self.backend, self.logToConsole)
           T = len(nodes)
-          t = m.addVars(nodes, lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="t")
-          qr  = m.addVars(list(itertools.product(nodes, range(T))), vtype=GRB.BINARY, name="qr")
-          any_match = m.addVars(list(range(T)), vtype=GRB.BINARY, name = "any_match")
-          any_action = m.addVars(list(range(T)), vtype=GRB.BINARY, name = "any_action")
-          P = m.addVar(lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="P")
-          A = m.addVar(lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="A")
-          M = m.addVar(lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="M")
+          t = m.add_vars(nodes, lb=0, ub=INFINITY, vtype=INTEGER, name="t")
+          qr  = m.add_vars(list(itertools.product(nodes, range(T))), vtype=BINARY, name="qr")
+          any_match = m.add_vars(list(range(T)), vtype=BINARY, name = "any_match")
+          any_action = m.add_vars(list(range(T)), vtype=BINARY, name = "any_action")
+          P = m.add_var(lb=0, ub=INFINITY, vtype=INTEGER, name="P")
+          A = m.add_var(lb=0, ub=INFINITY, vtype=INTEGER, name="A")
+          M = m.add_var(lb=0, ub=INFINITY, vtype=INTEGER, name="M")
 
-          m.setObjective(P, GRB.MINIMIZE)
+          m.minimize(P)
 
-          m.addConstrs((sum(qr[v, r] for r in range(T)) == 1 for v in nodes),\
+          m.add_constrs((m.quicksum(qr[v, r] for r in range(T)) == 1 for v in nodes),\
                       "constr_unique_quotient_remainder")
-          m.addConstrs((t[v] == \
-                        sum(r * qr[v, r] for r in range(T)) \
+          m.add_constrs((t[v] == \
+                        m.quicksum(r * qr[v, r] for r in range(T)) \
                         for v in nodes), "constr_division")
-          m.addConstrs((t[v] - t[u] >= int(self.G.edge[u][v]['delay'] > 0) for (u,v) in edges),\
+          m.add_constrs((t[v] - t[u] >= int(self.G.edge[u][v]['delay'] > 0) for (u,v) in edges),\
                       "constr_dag_dependencies")
-          m.addConstrs((sum(math.ceil((1.0 * self.G.node[v]['key_width']) / self.input_spec.match_unit_size) * qr[v, r]\
+          m.add_constrs((m.quicksum(math.ceil((1.0 * self.G.node[v]['key_width']) / self.input_spec.match_unit_size) * qr[v, r]\
                         for v in match_nodes)\
                         <= self.input_spec.match_unit_limit * any_match[r]\
                         for r in range(T)),\
                         "constr_match_units")
-          m.addConstrs((sum(self.G.node[v]['num_fields'] * qr[v, r]\
+          m.add_constrs((m.quicksum(self.G.node[v]['num_fields'] * qr[v, r]\
                         for v in action_nodes)\
                         <= self.input_spec.action_fields_limit * any_action[r]\
                         for r in range(T)),\
                         "constr_action_fields")
-          #m.addConstrs((sum(qr[v, r] for v in match_nodes) <= (len(match_nodes) * any_match[r]) \
+          #m.add_constrs((m.quicksum(qr[v, r] for v in match_nodes) <= (len(match_nodes) * any_match[r]) \
           #              for r in range(T)),\
           #              "constr_any_match1");
-          #m.addConstrs((sum(qr[v, r] for v in action_nodes) <= (len(action_nodes) * any_action[r]) \
+          #m.add_constrs((m.quicksum(qr[v, r] for v in action_nodes) <= (len(action_nodes) * any_action[r]) \
           #              for r in range(T)),\
           #              "constr_any_action1");
-          m.addConstr(M == sum(any_match[i] for i in range(T)), "M_constraint")
-          m.addConstr(A == sum(any_action[i] for i in range(T)), "A_constraint")
-          m.addConstr(P == max_(A,M), "P_constraint")
+          m.add_constr(M == m.quicksum(any_match[i] for i in range(T)), "M_constraint")
+          m.add_constr(A == m.quicksum(any_action[i] for i in range(T)), "A_constraint")
+          m.add_max_constr(P, [A, M], "P_constraint")
+
+        elif (self.model == 2) and (self.persistent_model is not None):
+          # Same model 2, retargeted to this period instead of rebuilt
+          self.persistent_model.retarget(T, Q_MAX, init_drmt_schedule,\
+                                         self._time_windows(T, Q_MAX, init_drmt_schedule))
+          m = self.persistent_model.backend
+          t = self.persistent_model.t
+          length = self.persistent_model.length
 
         elif self.model == 2:
+          m = make_backend(self.backend, self.logToConsole)
+          windows = self._time_windows(T, Q_MAX, init_drmt_schedule)
+
+          # The (q, r) cells with q * T + r inside the time window of each node
+          cells = dict((v, [divmod(x, T) for x in range(windows[v][0], windows[v][1] + 1)]) for v in nodes)
+          match_at = collections.defaultdict(list)  # (q, r) -> match nodes that can start there
+          action_at = collections.defaultdict(list) # (q, r) -> action nodes that can start there
+          for v in match_nodes:
+            for cell in cells[v]:
+              match_at[cell].append(v)
+          for v in action_nodes:
+            for cell in cells[v]:
+              action_at[cell].append(v)
+          build.mark('time windows')
+
           # Create variables
           # t is the start time for each DAG node in the first scheduling period
-          t = m.addVars(nodes, lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="t")
-          qwe()
+          t = dict((v, m.add_var(lb=windows[v][0], ub=windows[v][1], vtype=INTEGER, name="t[%s]" % v))\
+                   for v in nodes)
+          build.mark('t variables')
           # The quotients and remainders when dividing by T (see below)
           # qr[v, q, r] is 1 when t[v]
           # leaves a quotient of q and a remainder of r, when divided by T.
-          qr  = m.addVars(list(itertools.product(nodes, range(Q_MAX), range(T))), vtype=GRB.BINARY, name="qr")
-          qwe()
+          # Only created inside the time window of v.
+          qr  = m.add_vars([(v, q, r) for v in nodes for (q, r) in cells[v]], vtype=BINARY, name="qr")
+          build.mark('qr variables')
 
           # Is there any match/action from packet q in time slot r?
           # This is required to enforce limits on the number of packets that
           # can be performing matches or actions concurrently on any processor.
-          any_match = m.addVars(list(itertools.product(range(Q_MAX), range(T))), vtype=GRB.BINARY, name = "any_match")
-          qwe()
-          any_action = m.addVars(list(itertools.product(range(Q_MAX), range(T))), vtype=GRB.BINARY, name = "any_action")
-          qwe()
+          any_match = m.add_vars(sorted(match_at), vtype=BINARY, name = "any_match")
+          build.mark('any_match variables')
+          any_action = m.add_vars(sorted(action_at), vtype=BINARY, name = "any_action")
+          build.mark('any_action variables')
+          print ('qr binaries: %d of %d, any_match/any_action binaries: %d of %d (rest outside the time windows)' %\
+                 (len(qr), len(nodes) * Q_MAX * T, len(any_match) + len(any_action), 2 * Q_MAX * T))
 
           # The length of the schedule
-          length = m.addVar(lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="length")
+          length = m.add_var(lb=0, ub=INFINITY, vtype=INTEGER, name="length")
 
           # Set objective: minimize length of schedule
-          m.setObjective(length, GRB.MINIMIZE)
+          m.minimize(length)
 
           # Set constraints
 
           # The length is the maximum of all t's
-          m.addConstrs((t[v]  <= length for v in nodes), "constr_length_is_max")
+          m.add_constrs((t[v]  <= length for v in nodes), "constr_length_is_max")
+          build.mark('length is max')
+
+          # Index arrays for the rows below, built in one pass over qr:
+          # the qr variables and their q * T + r per node, their variables and
+          # resource costs per ring slot r, and their variables per (q, r) cell.
+          # Every row is then a single linear(coeffs, variables) call.
+          frozen = self.G.freeze()
+          arrays = frozen.resource_arrays(self.input_spec)
+          cost = (arrays.match_units + arrays.action_fields).tolist()
+          node_vars = dict((v, []) for v in nodes)
+          node_times = dict((v, []) for v in nodes)
+          slot_vars = {'match': [[] for r in range(T)], 'action': [[] for r in range(T)]}
+          slot_costs = {'match': [[] for r in range(T)], 'action': [[] for r in range(T)]}
+          cell_vars = {'match': collections.defaultdict(list), 'action': collections.defaultdict(list)}
+          for (i, v) in enumerate(frozen.names):
+            select = NODE_TYPES[frozen.types[i]]
+            for (q, r) in cells[v]:
+              x = qr[v, q, r]
+              node_vars[v].append(x)
+              node_times[v].append(q * T + r)
+              if select in slot_vars:
+                slot_vars[select][r].append(x)
+                slot_costs[select][r].append(cost[i])
+                cell_vars[select][q, r].append(x)
+          build.mark('index arrays')
 
           # Given v, qr[v, q, r] is 1 for exactly one q, r, i.e., there's a unique quotient and remainder
-          m.addConstrs((sum(qr[v, q, r] for q in range(Q_MAX) for r in range(T)) == 1 for v in nodes),\
-                      "constr_unique_quotient_remainder")
-          qwe()
+          for v in nodes:
+            m.add_constr(m.linear([1] * len(node_vars[v]), node_vars[v]) == 1,\
+                         "constr_unique_quotient_remainder[%s]" % v)
+          build.mark('unique quotient remainder')
 
           # This is just a way to write dividend = quotient * divisor + remainder
-          m.addConstrs((t[v] == \
-                        sum(q * qr[v, q, r] for q in range(Q_MAX) for r in range(T)) * T + \
-                        sum(r * qr[v, q, r] for q in range(Q_MAX) for r in range(T)) \
-                        for v in nodes), "constr_division")
-          qwe()
+          for v in nodes:
+            m.add_constr(m.linear(node_times[v] + [-1], node_vars[v] + [t[v]]) == 0,\
+                         "constr_division[%s]" % v)
+          build.mark('division')
 
           # Respect dependencies in DAG
-          m.addConstrs((t[v] - t[u] >= self.G.edge[u][v]['delay'] for (u,v) in edges),\
+          m.add_constrs((t[v] - t[u] >= delay for (u, v, delay) in frozen.edge_delays()),\
                       "constr_dag_dependencies")
-          qwe()
+          build.mark('dependencies')
 
           # Number of match units does not exceed match_unit_limit
           # for every time step (j) < T, check the total match unit requirements
           # across all nodes (v) that can be "rotated" into this time slot.
-          m.addConstrs((sum(math.ceil((1.0 * self.G.node[v]['key_width']) / self.input_spec.match_unit_size) * qr[v, q, r]\
-                        for v in match_nodes for q in range(Q_MAX))\
-                        <= self.input_spec.match_unit_limit for r in range(T)),\
-                        "constr_match_units")
-          qwe()
-
-          # The action field resource constraint (similar comments to above)
-          m.addConstrs((sum(self.G.node[v]['num_fields'] * qr[v, q, r]\
-                        for v in action_nodes for q in range(Q_MAX))\
-                        <= self.input_spec.action_fields_limit for r in range(T)),\
-                        "constr_action_fields")
-          qwe()
+          # The action field resource constraint is the same with num_fields.
+          for (select, limit, name) in (('match', self.input_spec.match_unit_limit, 'constr_match_units'),\
+                                        ('action', self.input_spec.action_fields_limit, 'constr_action_fields')):
+            for r in range(T):
+              if slot_vars[select][r]:
+                m.add_constr(m.linear(slot_costs[select][r], slot_vars[select][r]) <= limit,\
+                             "%s[%d]" % (name, r))
+          build.mark('resources')
 
           # Any time slot (r) can have match or action operations
           # from only match_proc_limit/action_proc_limit packets
@@ -199,80 +303,119 @@ class DrmtScheduleSolver:
           # First, detect if there is any (at least one) match/action operation from packet q in time slot r
           # if qr[v, q, r] = 1 for any match node, then any_match[q,r] must = 1 (same for actions)
           # Notice that any_match[q, r] may be 1 even if all qr[v, q, r] are zero
-          m.addConstrs((sum(qr[v, q, r] for v in match_nodes) <= (len(match_nodes) * any_match[q, r]) \
-                        for q in range(Q_MAX)\
-                        for r in range(T)),\
-                        "constr_any_match1");
-          qwe()
-
-          m.addConstrs((sum(qr[v, q, r] for v in action_nodes) <= (len(action_nodes) * any_action[q, r]) \
-                        for q in range(Q_MAX)\
-                        for r in range(T)),\
-                        "constr_any_action1");
-          qwe()
-
           # Second, check that, for any r, the summation over q of any_match[q, r] is under proc_limits
-          m.addConstrs((sum(any_match[q, r] for q in range(Q_MAX)) <= self.input_spec.match_proc_limit\
-                        for r in range(T)), "constr_match_proc")
-          qwe()
-          m.addConstrs((sum(any_action[q, r] for q in range(Q_MAX)) <= self.input_spec.action_proc_limit\
-                        for r in range(T)), "constr_action_proc")
-          qwe()
+          for (select, any_var, proc_limit) in (('match', any_match, self.input_spec.match_proc_limit),\
+                                                ('action', any_action, self.input_spec.action_proc_limit)):
+            per_slot = [[] for r in range(T)]
+            for (q, r) in sorted(any_var):
+              xs = cell_vars[select][q, r]
+              m.add_constr(m.linear([1] * len(xs) + [-len(xs)], xs + [any_var[q, r]]) <= 0,\
+                           "constr_any_%s1[%d,%d]" % (select, q, r))
+              per_slot[r].append(any_var[q, r])
+            build.mark('any_%s' % select)
+            for r in range(T):
+              if per_slot[r]:
+                m.add_constr(m.linear([1] * len(per_slot[r]), per_slot[r]) <= proc_limit,\
+                             "constr_%s_proc[%d]" % (select, r))
+            build.mark('%s proc limit' % select)
+
+          if self.strengthen:
+            init_drmt_schedule = self._strengthen(m, t, qr, length, cells, any_match, any_action,\
+                                                  init_drmt_schedule)
+            build.mark('strengthen')
 
           print(init_drmt_schedule)
           # Seed initial values
           if init_drmt_schedule:
             for i in nodes:
               pass
-              t[i].start = init_drmt_schedule[i]
+              m.set_start(t[i], init_drmt_schedule[i])
+            build.mark('mip start')
+
+        elif self.model == 3:
+          # Constraint programming instead of the qr tensor of model 2
+          print(init_drmt_schedule)
+          m = DrmtCpSatModel(self.G, self.input_spec, T, Q_MAX, init_drmt_schedule, self.logToConsole)
+          t = m.t
+          length = m.length
+
+        build_timer.stop()
+        build.stop()
+        build_memory = peak_memory()
 
         # Solve model
-        m.setParam('TimeLimit', self.minute_limit * 60)
+        m.set_time_limit(self.minute_limit * 60)
+        threads = capped_threads(self.threads)
+        if threads:
+          m.set_threads(threads)
         my_timer = Printing()
 
-        qwe()
         my_timer.start()
-        m.optimize()
+        with tracing.span('solve'):
+          ret = m.optimize()
         my_timer.stop()
-        qwe()
-        ret = m.Status
+        print ('Model build time %f s (peak memory %.1f MB), solve time %f s' %\
+               (build_timer.result, build_memory, my_timer.result))
 
         solution = Solution()
         solution.time = my_timer.result
+        solution.build_time = build_timer.result
+        solution.build_memory = build_memory
         solution.success = False
-        if (ret == GRB.INFEASIBLE):
+        (solution.seed, solution.seed_value) = (seed_name, seed_value)
+        solution.horizon = Q_MAX * T
+        if (ret == INFEASIBLE):
           print ('Infeasible')
+          self._record_probe('infeasible', my_timer.result, None)
+          self._cache_store('infeasible', None, None, seed_name, seed_value, Q_MAX, my_timer.result)
           return solution
-        elif ((ret == GRB.TIME_LIMIT) or (ret == GRB.INTERRUPTED)):
-          if (m.SolCount == 0):
+        elif (ret == TIME_LIMIT):
+          if (m.sol_count() == 0):
             print ('Hit time limit or interrupted, no solution found yet')
+            self._record_probe('unknown', my_timer.result, None)
             return None
           else:
-            print ('Hit time limit or interrupted, suboptimal solution found with gap ', m.MIPGap)
-        elif (ret == GRB.OPTIMAL):
-          print ('Optimal solution found with gap ', m.MIPGap)
+            gap = m.mip_gap()
+            print ('Hit time limit or interrupted, suboptimal solution found' +\
+                   ('' if gap is None else ' with gap %f' % gap))
+        elif (ret == OPTIMAL):
+          print ('Optimal solution found with gap ', m.mip_gap())
         else:
           print ('Return code is ', ret)
           assert(False)
 
         # Construct and return schedule
-        self.time_of_op = {}
-        self.ops_at_time = collections.defaultdict(list)
+        extract = tracing.start('extract')
         if self.model == 1:
           print(P,A,M)
           for v in nodes:
             for r in range(T):
-              if qr[v, r].x > 0:
-                print(v, r,self.G.node[v],qr[v, r].x)
-          self.length = int(P.x + 1)
-          assert(self.length == P.x + 1)
+              if m.value(qr[v, r]) > 0:
+                print(v, r,self.G.node[v],m.value(qr[v, r]))
+          self.length = int(m.value(P) + 1)
+          assert(self.length == m.value(P) + 1)
         else:
-          self.length = int(length.x + 1)
-          assert(self.length == length.x + 1)
-        for v in nodes:
-            tv = int(t[v].x)
-            self.time_of_op[v] = tv
-            self.ops_at_time[tv].append(v)
+          self.length = int(m.value(length) + 1)
+          assert(self.length == m.value(length) + 1)
+        time_of_op = dict((v, int(m.value(t[v]))) for v in nodes)
+
+        self._record_probe('feasible', my_timer.result, time_of_op)
+        gap = 0.0 if (ret == OPTIMAL) else m.mip_gap()
+        if self.model != 1:
+          debug_check(self.G, self.input_spec, time_of_op, self.period_duration, 'model %d' % self.model)
+          self._cache_store('feasible', time_of_op, gap, seed_name, seed_value, Q_MAX, my_timer.result)
+        solution = self._solution(time_of_op, self.length, my_timer.result, build_timer.result, build_memory)
+        (solution.gap, solution.seed, solution.seed_value) = (gap, seed_name, seed_value)
+        extract.stop()
+        return solution
+
+    def _solution(self, time_of_op, length, solve_time, build_time, build_memory):
+        """ Solution with the periodic schedule and resource usage of the start times """
+        self.time_of_op = dict(time_of_op)
+        self.ops_at_time = collections.defaultdict(list)
+        for v in self.time_of_op:
+          self.ops_at_time[self.time_of_op[v]].append(v)
+        self.length = length
 
         # Compute periodic schedule to calculate resource usage
         self.compute_periodic_schedule()
@@ -288,42 +431,112 @@ class DrmtScheduleSolver:
         solution.match_units_usage   = self.match_units_usage
         solution.match_proc_usage    = self.match_proc_usage
         solution.action_proc_usage   = self.action_proc_usage
-        solution.time = my_timer.result
+        solution.time = solve_time
+        solution.build_time = build_time
+        solution.build_memory = build_memory
         solution.success = True
         return solution
 
+    def _cache_store(self, status, time_of_op, gap, seed_name, seed_value, Q_MAX, solve_time):
+        if self.cache_key is None:
+          return
+        provenance = {'solver': 'drmt model %d' % self.model,\
+                      'backend': 'cp-sat' if (self.model == 3) else (self.backend or DEFAULT_BACKEND),\
+                      'seed': seed_name,\
+                      'seed value': seed_value,\
+                      'horizon': Q_MAX * self.period_duration,\
+                      'solve time': round(solve_time, 3)}
+        self.cache.store(self.cache_key, status, time_of_op, gap, provenance)
+
+    def _strengthen(self, m, t, qr, length, cells, any_match, any_action, init_schedule):
+        """ Adds symmetry breaking constraints and redundant cuts to model 2
+
+        Symmetries:
+          - Shifting a schedule in time keeps it valid, since every ring
+            slot just moves to another one. So some source starts at 0.
+          - Nodes of the same type and cost with the same predecessors and
+            successors (with the same delays) can swap their start times,
+            they start in the order of their names.
+        Cuts:
+          - t[v] plus the longest delay from v to a sink is at most length.
+          - There are at least bounds.distinct_times match (action) times,
+            so at least as many any_match (any_action) are 1.
+        Also tying any_match[q, r] to the qr of its cell from above, which
+        would take the free any_match out of the search, made cbc slower.
+
+        Returns
+        -------
+        init_schedule : dict
+            The seed schedule shifted to start at 0, None if there is none
+        """
+        head, tail = bounds.head_and_tail(self.G)
+        sources = [v for v in self.G.nodes() if self.G.in_degree(v) == 0 and (0, 0) in cells[v]]
+        m.add_constr(m.quicksum(qr[v, 0, 0] for v in sources) >= 1, "constr_source_at_zero")
+
+        for (select, any_var) in (('match', any_match), ('action', any_action)):
+          m.add_constr(m.quicksum(any_var.values()) >= bounds.distinct_times(self.G, select),\
+                       "constr_any_%s_count" % select)
+
+        twins = collections.defaultdict(list)
+        for v in self.G.nodes():
+          d = self.G.node[v]
+          key = (d['type'], d.get('key_width'), d.get('num_fields'),\
+                 tuple(sorted((u, self.G.edge[u][v]['delay']) for u in self.G.predecessors(v))),\
+                 tuple(sorted((w, self.G.edge[v][w]['delay']) for w in self.G.successors(v))))
+          twins[key].append(v)
+        pairs = 0
+        for group in twins.values():
+          group = sorted(group)
+          for (u, v) in zip(group, group[1:]):
+            m.add_constr(t[u] <= t[v], "constr_twins[%s,%s]" % (u, v))
+            pairs += 1
+
+        for v in self.G.nodes():
+          m.add_constr(t[v] + tail[v] <= length, "constr_tail[%s]" % v)
+        print ('Strengthened model 2: %d sources, %d twin pairs' % (len(sources), pairs))
+
+        if not init_schedule:
+          return init_schedule
+        # Same shift and twin order as the constraints above
+        shift = min(init_schedule.values())
+        schedule = dict((v, init_schedule[v] - shift) for v in init_schedule)
+        for group in twins.values():
+          for (v, time) in zip(sorted(group), sorted(schedule[v] for v in group)):
+            schedule[v] = time
+        return schedule
+
+    def _time_windows(self, T, Q_MAX, init_schedule):
+        """ Start time window of every node for model 2
+
+        Start times are in [0, Q_MAX * T - 1]. When the seed schedule is
+        valid, the optimum is no longer than the seed, so its length is
+        the horizon instead. Within the horizon, every node starts after
+        its longest path from a source (ASAP) and before its longest path
+        to a sink needs to (ALAP).
+        """
+        horizon = Q_MAX * T - 1
+        if init_schedule and not validate_schedule(self.G, self.input_spec, init_schedule, T):
+          horizon = min(horizon, max(init_schedule.values()))
+        return bounds.time_windows(self.G, horizon)
+
+    def _record_probe(self, status, solve_time, time_of_op):
+        if (self.model == 2) and (self.persistent_model is not None):
+          self.persistent_model.record_probe(status, solve_time, time_of_op)
+
     def compute_periodic_schedule(self):
         T = self.period_duration
-        self.ops_on_ring = collections.defaultdict(list)
-        self.match_key_usage = dict()
-        self.action_fields_usage = dict()
-        self.match_units_usage = dict()
-        self.match_proc_set = dict()
-        self.match_proc_usage = dict()
-        self.action_proc_set = dict()
-        self.action_proc_usage = dict()
-        for t in range(T):
-          self.match_key_usage[t]     = 0
-          self.action_fields_usage[t] = 0
-          self.match_units_usage[t]   = 0
-          self.match_proc_set[t]      = set()
-          self.match_proc_usage[t]    = 0
-          self.action_proc_set[t]     = set()
-          self.action_proc_usage[t]   = 0
+        arrays = self.G.resource_arrays(self.input_spec)
+        usage = arrays.periodic_usage(arrays.times(self.time_of_op), T)
+        self.match_key_usage     = usage_dict(usage['match_key'])
+        self.action_fields_usage = usage_dict(usage['action_fields'])
+        self.match_units_usage   = usage_dict(usage['match_units'])
+        self.match_proc_usage    = usage_dict(usage['match_proc'])
+        self.action_proc_usage   = usage_dict(usage['action_proc'])
 
-        for v in self.G.nodes():
-            k = self.time_of_op[v] / T
-            r = self.time_of_op[v] % T
+        self.ops_on_ring = collections.defaultdict(list)
+        for v in arrays.names:
+            (k, r) = divmod(self.time_of_op[v], T)
             self.ops_on_ring[r].append('p[%d].%s' % (k,v))
-            if self.G.node[v]['type'] == 'match':
-                self.match_key_usage[r] += self.G.node[v]['key_width']
-                self.match_units_usage[r] += math.ceil((1.0 * self.G.node[v]['key_width'])/ self.input_spec.match_unit_size)
-                self.match_proc_set[r].add(k)
-                self.match_proc_usage[r] = len(self.match_proc_set[r])
-            else:
-                self.action_fields_usage[r] += self.G.node[v]['num_fields']
-                self.action_proc_set[r].add(k)
-                self.action_proc_usage[r] = len(self.action_proc_set[r])
 
 if __name__ == "__main__":
   # Cmd line args
@@ -337,13 +550,20 @@ if __name__ == "__main__":
     minute_limit = int(sys.argv[4])
     model = int(sys.argv[5])
     P = int(sys.argv[6])
-  with open('results/'+input_file+'_'+latency_file+'_'+str(model)+'_'+str(P)+'.txt', 'w') as f:
+  from period_sweep import PeriodSweep
+  output = result_store.output_path(program_name(input_file)+'_'+hw_file+'_'+latency_file+'_'+str(model)+'_'+str(P)+'.txt')
+  with open(output, 'w') as f:
     print(input_file, hw_file, latency_file, minute_limit, model, P)
+    print('Output in %s' % output)
     original_stdout = sys.stdout
     sys.stdout = f
+    timings = dict() # seconds per phase, for the result record
+    start = time.time()
+    run = tracing.start('drmt', program = program_name(input_file), hw = hw_file, latency = latency_file)
+    load = tracing.start('load dag')
 
     # Input specification
-    input_spec = importlib.import_module(input_file, "*")
+    input_spec = load_input_spec(input_file)
     hw_spec    = importlib.import_module(hw_file, "*")
     latency_spec=importlib.import_module(latency_file, "*")
     input_spec.action_fields_limit = hw_spec.action_fields_limit
@@ -359,6 +579,8 @@ if __name__ == "__main__":
     G.nodes()
     G.create_dag(input_spec.nodes, input_spec.edges, latency_spec)
     cpath, cplat = G.critical_path()
+    timings['dag'] = time.time() - start
+    load.stop()
 
     print ('{:*^80}'.format(' Input DAG '))
     tpt_upper_bound = print_problem(G, input_spec)
@@ -366,31 +588,46 @@ if __name__ == "__main__":
     print ('\n\n')
 
     # Try to max. throughput
-    # We do this by min. the period
-    period_lower_bound = P#int(math.ceil((1.0) / tpt_upper_bound))
-    period_upper_bound = P#int(math.ceil((1.0) / tpt_lower_bound))
-    period = period_upper_bound
-    last_good_solution = None
-    last_good_period   = None
+    # We do this by min. the period, no period below the bound is feasible
+    phase = time.time()
+    with tracing.span('bounds'):
+      period_bound, contributions = bounds.period_lower_bound(G, input_spec)
+    timings['bounds'] = time.time() - phase
+    bounds.print_bounds(period_bound, contributions)
+    period_upper_bound = max(P, period_bound)
+    period_lower_bound = period_bound
     print ('Searching between limits ', period_lower_bound, ' and ', period_upper_bound, ' cycles')
-    low = period_lower_bound
-    high = period_upper_bound
-    while (low <= high):
-      assert(low > 0)
-      assert(high > 0)
-      period = int(math.ceil((low + high)/2.0))
-      print('\n')
-      print ('period =', period, ' cycles')
-      print ('{:*^80}'.format(' Scheduling DRMT '))
-      solver = DrmtScheduleSolver(G, input_spec, latency_spec,\
-                                  seed_rnd_sieve = True, period_duration = period, minute_limit = minute_limit, model = model)
-      solution = solver.solve()
-      if (solution):
-        last_good_period   = period
-        last_good_solution = solution
-        high = period - 1
-      else:
-        low  = period + 1
+    sweep = PeriodSweep(G, input_spec, latency_spec, minute_limit = minute_limit, model = model,\
+                        program = program_name(input_file))
+    phase = time.time()
+    with tracing.span('sweep'):
+      last_good_period, last_good_solution = sweep.run(period_lower_bound, period_upper_bound)
+    timings['sweep'] = time.time() - phase
+    sweep.print_timings()
+    if sweep.memo:
+      sweep.memo.print_table(program_name(input_file))
+    print ('\n')
+
+    record = result_store.problem_record('drmt', program_name(input_file), hw_file, latency_file,\
+                                         G, input_spec, latency_spec)
+    record.update({'model': model,\
+                   'minute_limit': minute_limit,\
+                   'period_lower_bound': period_lower_bound,\
+                   'period_upper_bound': period_upper_bound,\
+                   'bounds': dict(contributions),\
+                   'probes': [{'period': period, 'status': status, 'time': elapsed}\
+                              for (period, (status, elapsed)) in sorted(sweep.timings.items())],\
+                   'period': last_good_period,\
+                   'status': 'infeasible' if (last_good_solution == None) else 'feasible'})
+    if (last_good_solution != None):
+      record.update(result_store.solution_record(last_good_solution))
+      record['throughput'] = 1.0 / last_good_period
+    record['timings'] = dict(timings, total = time.time() - start)
+    run.stop()
+    if tracing.enabled():
+      record['spans'] = tracing.totals()
+    result_store.emit(record)
+    tracing.report()
 
     if (last_good_solution == None):
       print ("Best throughput so far is below ", tpt_lower_bound, " packets/cycle.")
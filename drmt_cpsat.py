@@ -0,0 +1,112 @@
+import math
+from ilp_backend import OPTIMAL, INFEASIBLE, TIME_LIMIT, OTHER
+
+class DrmtCpSatModel:
+    """ Constraint programming formulation of the dRMT scheduling problem,
+    solved with OR-tools CP-SAT (model 3 of DrmtScheduleSolver).
+
+    It solves the same problem as model 2 without the qr[v, q, r] tensor:
+      * t[v] = T * q[v] + r[v] with q[v] and r[v] plain integer variables,
+      * match units and action fields per slot are cumulative constraints
+        over unit length intervals starting at r[v],
+      * at most match_proc_limit (action_proc_limit) packets per slot:
+        every match (action) node marks its absolute time t[v] as busy and
+        the busy times that fall into a slot are counted. Two nodes from
+        the same packet in the same slot necessarily share t[v].
+    The size grows as |V| + Q_MAX * T instead of |V| * Q_MAX * T.
+
+    The object answers the same calls as an ilp_backend model
+    (set_time_limit, set_threads, optimize, sol_count, mip_gap, value),
+    so DrmtScheduleSolver extracts the schedule the same way.
+    """
+    def __init__(self, dag, input_spec, period_duration, Q_MAX, init_schedule = None, logToConsole = 0):
+        from ortools.sat.python import cp_model
+        self.cp_model = cp_model
+        self.m = cp_model.CpModel()
+        self.solver = cp_model.CpSolver()
+        self.solver.parameters.log_search_progress = bool(logToConsole)
+        self.status = None
+
+        m = self.m
+        T = period_duration
+        horizon = Q_MAX * T
+        nodes = dag.nodes()
+        match_nodes = dag.nodes(select='match')
+        action_nodes = dag.nodes(select='action')
+
+        self.t = dict()
+        quot = dict()
+        rem = dict()
+        for v in nodes:
+          self.t[v] = m.NewIntVar(0, horizon - 1, 't[%s]' % v)
+          quot[v] = m.NewIntVar(0, Q_MAX - 1, 'q[%s]' % v)
+          rem[v] = m.NewIntVar(0, T - 1, 'r[%s]' % v)
+          m.Add(self.t[v] == T * quot[v] + rem[v])
+
+        # The length of the schedule, minimized
+        self.length = m.NewIntVar(0, horizon - 1, 'length')
+        m.AddMaxEquality(self.length, [self.t[v] for v in nodes])
+        m.Minimize(self.length)
+
+        # Respect dependencies in DAG
+        for (u, v) in dag.edges():
+          m.Add(self.t[v] - self.t[u] >= dag.edge[u][v]['delay'])
+
+        # Match units and action fields in every slot of the ring
+        match_units = dict((v, int(math.ceil((1.0 * dag.node[v]['key_width']) / input_spec.match_unit_size)))\
+                           for v in match_nodes)
+        action_fields = dict((v, dag.node[v]['num_fields']) for v in action_nodes)
+        for (demands, limit) in ((match_units, input_spec.match_unit_limit),\
+                                 (action_fields, input_spec.action_fields_limit)):
+          users = [v for v in demands if demands[v] > 0]
+          intervals = [m.NewFixedSizeIntervalVar(rem[v], 1, 'slot[%s]' % v) for v in users]
+          m.AddCumulative(intervals, [demands[v] for v in users], limit)
+
+        # Packets per slot
+        for (users, limit) in ((match_nodes, input_spec.match_proc_limit),\
+                               (action_nodes, input_spec.action_proc_limit)):
+          if (not users) or (limit >= Q_MAX):
+            continue
+          busy = [m.NewBoolVar('busy[%d]' % i) for i in range(horizon)]
+          for v in users:
+            m.AddElement(self.t[v], busy, 1)
+          for r in range(T):
+            m.Add(sum(busy[q * T + r] for q in range(Q_MAX)) <= limit)
+
+        # Seed initial values
+        if init_schedule:
+          for v in nodes:
+            if init_schedule[v] < horizon:
+              m.AddHint(self.t[v], init_schedule[v])
+              m.AddHint(quot[v], init_schedule[v] // T)
+              m.AddHint(rem[v], init_schedule[v] % T)
+
+    def set_time_limit(self, seconds):
+        self.solver.parameters.max_time_in_seconds = seconds
+
+    def set_threads(self, threads):
+        self.solver.parameters.num_workers = threads
+
+    def optimize(self):
+        cp_model = self.cp_model
+        self.status = self.solver.Solve(self.m)
+        if self.status == cp_model.OPTIMAL:
+          return OPTIMAL
+        elif self.status == cp_model.INFEASIBLE:
+          return INFEASIBLE
+        elif self.status in (cp_model.FEASIBLE, cp_model.UNKNOWN):
+          return TIME_LIMIT
+        print ('CP-SAT status is %s' % self.solver.StatusName(self.status))
+        return OTHER
+
+    def sol_count(self):
+        if self.status in (self.cp_model.OPTIMAL, self.cp_model.FEASIBLE):
+          return 1
+        return 0
+
+    def mip_gap(self):
+        objective = self.solver.ObjectiveValue()
+        return (objective - self.solver.BestObjectiveBound()) / max(1.0, abs(objective))
+
+    def value(self, var):
+        return self.solver.Value(var)
@@ -0,0 +1,27 @@
+# Experiment matrices for run_batch.py
+#
+# A matrix is a list of blocks. In a block, program, hw, latency and solver
+# are a name or a list of names, and every combination of them is a job.
+# The other keys are settings of the jobs of the block, see
+# run_batch.DEFAULTS:
+#   minutes : time limit of a solver run in minutes (drmt, compare_ilps)
+#   model   : dRMT model (drmt)
+#   period  : largest period the dRMT sweep tries (drmt)
+#   threads : cores the job may use, passed on as DRMT_THREADS
+
+PROGRAMS = ['switch_combined', 'switch_combined_subset', 'switch_egress', 'switch_egress_subset',\
+            'switch_ingress', 'switch_ingress_subset']
+
+# The dRMT and pRMT runs of the paper, formerly run_experiments.sh
+matrix = [
+  {'program': PROGRAMS, 'hw': ['large_hw', 'large_hw_ipc2'], 'latency': 'drmt_latencies',\
+   'solver': 'drmt', 'minutes': 10},
+  {'program': PROGRAMS, 'hw': 'large_hw', 'latency': 'prmt_latencies',\
+   'solver': ['prmt_fine', 'prmt_coarse'], 'threads': 1},
+]
+
+# compare_ilps.py on the random DAGs +0 ... +29, formerly main.py
+random_dags = [
+  {'program': ['+%d' % i for i in range(30)], 'hw': 'large_hw', 'latency': 'drmt_latencies_short',\
+   'solver': 'compare_ilps', 'minutes': 5},
+]
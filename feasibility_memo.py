@@ -0,0 +1,140 @@
+import os
+import sqlite3
+import sys
+import time
+
+from schedule_cache import dag_fingerprint, LATENCIES
+
+# Set DRMT_MEMO=0 to solve every period, whatever was proven before
+MEMO_ENABLED = (os.environ.get('DRMT_MEMO', '1') == '1')
+
+# SQLite file of the memo, relative to the working directory
+MEMO_PATH = os.environ.get('DRMT_MEMO_PATH', '.feasibility_memo.sqlite')
+
+# Fewer resources or a shorter period never make a schedule feasible.
+# match_unit_size changes the demand of the nodes instead, so it is part
+# of the program.
+LIMITS = ('match_unit_limit', 'action_fields_limit', 'match_proc_limit', 'action_proc_limit')
+
+COLUMNS = ('program', 'latency', 'match_unit_size') + LIMITS + ('period', 'feasible', 'length', 'horizon', 'source',\
+                                                                 'date')
+
+class FeasibilityMemo:
+    """ Proven feasible and infeasible (program, latency, hw limits, period) points
+
+    A point is feasible if some dRMT schedule meets every limit at that
+    period. Feasibility is monotone: a feasible point makes every point
+    with a longer period and no smaller limit feasible, an infeasible
+    point makes every point with a shorter period and no larger limit
+    infeasible. infer() answers from these dominance relations, so a
+    sweep over IPC1/IPC2 or small_hw/large_hw skips whatever earlier
+    sweeps already settled.
+
+    The dRMT ILP only proves that no schedule up to its horizon (a
+    schedule length) exists, so an infeasible point is recorded with that
+    horizon and only rules out periods whose own horizon it covers.
+
+    Programs are identified by dag_fingerprint, which covers the node
+    attributes and the delays (and so the latencies) of the DAG.
+    """
+    def __init__(self, path = MEMO_PATH):
+        self.path = path
+        self.db = sqlite3.connect(path, timeout = 30)
+        self.db.execute('CREATE TABLE IF NOT EXISTS points ('\
+                        ' dag TEXT, program TEXT, latency TEXT, match_unit_size INTEGER,'\
+                        ' match_unit_limit INTEGER, action_fields_limit INTEGER,'\
+                        ' match_proc_limit INTEGER, action_proc_limit INTEGER,'\
+                        ' period INTEGER, feasible INTEGER, length INTEGER, source TEXT, date TEXT,'\
+                        ' PRIMARY KEY (dag, match_unit_size, match_unit_limit, action_fields_limit,'\
+                        '              match_proc_limit, action_proc_limit, period))')
+        if 'horizon' not in [row[1] for row in self.db.execute('PRAGMA table_info(points)')]:
+          # Memos from before horizons: their infeasible points no longer count
+          self.db.execute('ALTER TABLE points ADD COLUMN horizon INTEGER')
+        self.db.commit()
+        self.keys = dict() # id(dag) -> (dag, fingerprint), hashing a DAG takes a while
+
+    def record(self, dag, input_spec, period, feasible, length = None, source = None,\
+               program = None, latency_spec = None, horizon = None):
+        """ Stores a proven point, a schedule length (feasible points only),
+        the horizon up to which no schedule exists (infeasible points only)
+        and the solver that proved it. program and latency_spec only name
+        the point in the table. """
+        latency = ' '.join('%s=%s' % (name, getattr(latency_spec, name))\
+                           for name in LATENCIES if hasattr(latency_spec, name))
+        key = self._key(dag)
+        self.db.execute('INSERT OR REPLACE INTO points (dag, ' + ', '.join(COLUMNS) + ')'\
+                        ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',\
+                        (key, program or key[:12], latency, input_spec.match_unit_size) +\
+                        tuple(getattr(input_spec, name) for name in LIMITS) +\
+                        (period, int(bool(feasible)), length, None if feasible else horizon, source,\
+                         time.strftime('%Y-%m-%d %H:%M:%S')))
+        self.db.commit()
+
+    def infer(self, dag, input_spec, period, horizon = None):
+        """ Returns True (feasible) or False (infeasible) when a recorded
+        point dominates this one, None if nothing is known. An infeasible
+        point only counts when its horizon is at least horizon, the one
+        the solver would search at this period; with no horizon given,
+        none does. """
+        limits = tuple(getattr(input_spec, name) for name in LIMITS)
+        same = 'dag = ? AND match_unit_size = ?'
+        args = (self._key(dag), input_spec.match_unit_size)
+        # A feasible point with no larger limits and no longer period
+        if self.db.execute('SELECT 1 FROM points WHERE ' + same + ' AND feasible = 1 AND period <= ? AND ' +\
+                           ' AND '.join('%s <= ?' % name for name in LIMITS) + ' LIMIT 1',\
+                           args + (period,) + limits).fetchone():
+          return True
+        # An infeasible point with no smaller limits, no shorter period and
+        # no shorter horizon
+        if (horizon is not None) and\
+           self.db.execute('SELECT 1 FROM points WHERE ' + same + ' AND feasible = 0 AND period >= ? AND ' +\
+                           'horizon >= ? AND ' + ' AND '.join('%s >= ?' % name for name in LIMITS) + ' LIMIT 1',\
+                           args + (period, horizon) + limits).fetchone():
+          return False
+        return None
+
+    def table(self, program = None):
+        """ Rows of the memo as tuples in COLUMNS order, by program,
+        latency, limits and period """
+        query = 'SELECT ' + ', '.join(COLUMNS) + ' FROM points'
+        args = ()
+        if program is not None:
+          query += ' WHERE program = ?'
+          args = (program,)
+        query += ' ORDER BY ' + ', '.join(COLUMNS[:COLUMNS.index('period') + 1])
+        return self.db.execute(query, args).fetchall()
+
+    def print_table(self, program = None):
+        print ('{:*^80}'.format(' Feasibility memo '))
+        print ('%-24s %-16s %4s %4s %4s %2s %2s %6s %-10s %6s %7s  %s' %\
+               ('program', 'latency', 'mus', 'mul', 'afl', 'mp', 'ap', 'period', 'outcome', 'length', 'horizon',\
+                'source'))
+        for row in self.table(program):
+          d = dict(zip(COLUMNS, row))
+          print ('%-24s %-16s %4d %4d %4d %2d %2d %6d %-10s %6s %7s  %s' %\
+                 (d['program'], d['latency'], d['match_unit_size'], d['match_unit_limit'],\
+                  d['action_fields_limit'], d['match_proc_limit'], d['action_proc_limit'], d['period'],\
+                  'feasible' if d['feasible'] else 'infeasible', '-' if d['length'] is None else d['length'],\
+                  '-' if d['horizon'] is None else d['horizon'], d['source']))
+
+    def _key(self, dag):
+        if id(dag) not in self.keys:
+          self.keys[id(dag)] = (dag, dag_fingerprint(dag))
+        return self.keys[id(dag)][1]
+
+def default_memo():
+  """ The memo PeriodSweep uses, None when DRMT_MEMO=0 """
+  if not MEMO_ENABLED:
+    return None
+  return FeasibilityMemo()
+
+if __name__ == "__main__":
+  # Prints the memo, optionally of one program
+  if (len(sys.argv) > 3):
+    print ("Usage: ", sys.argv[0], " [<memo file> [<program>]]")
+    exit(1)
+  path = sys.argv[1] if len(sys.argv) > 1 else MEMO_PATH
+  if not os.path.exists(path):
+    print ("No feasibility memo in", path)
+    exit(0)
+  FeasibilityMemo(path).print_table(sys.argv[2] if len(sys.argv) > 2 else None)
@@ -57,4 +57,6 @@ def contract_dag(input_spec, latency_spec):
       assert(G.node[v]['num_fields'] >= 0)
       # leave num_fields unchanged
 
+  # The types were set in place
+  G.invalidate_caches()
   return G
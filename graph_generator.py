@@ -5,11 +5,16 @@ import importlib
 matplotlib.use('Agg')
 matplotlib.rcParams.update({'font.size':18})
 import matplotlib.pyplot as plt
+import os
+from result_store import load, latest
 if (len(sys.argv) != 5):
-  print("Usage: ", sys.argv[0], " <result folder> <drmt latencies> <prmt latencies> <folder for figs>")
+  print("Usage: ", sys.argv[0], " <result records or folder> <drmt latencies> <prmt latencies> <folder for figs>")
+  print("Reads the records drmt.py and prmt.py appended to the file, <folder>/records.jsonl for a folder")
   exit(1)
 else:
-  result_folder = sys.argv[1]
+  records_path = sys.argv[1]
+  if os.path.isdir(records_path):
+    records_path = os.path.join(records_path, "records.jsonl")
   drmt_latencies = importlib.import_module(sys.argv[2], "*")
   prmt_latencies = importlib.import_module(sys.argv[3], "*")
   fig_folder    = sys.argv[4]
@@ -27,27 +32,34 @@ labels["prmt_coarse"]= "RMT"
 labels["prmt_fine"]  = "RMT fine"
 labels["upper_bound"] = "Upper bound"
 
+# Solver and hardware of every architecture
+runs_of = dict()
+runs_of["drmt_ipc_1"] = ("drmt", "large_hw")
+runs_of["drmt_ipc_2"] = ("drmt", "large_hw_ipc2")
+runs_of["prmt_coarse"]= ("prmt_coarse", "large_hw")
+runs_of["prmt_fine"]  = ("prmt_fine", "large_hw")
+
 pipeline_stages  = dict()
 drmt_min_periods = dict()
 drmt_thread_count= dict()
 
+# The latest run of every (solver, program, hw, latency)
+runs = latest(load(records_path), ("solver", "program", "hw", "latency"))
+
 for prog in progs:
   for arch in d_archs + p_archs:
-     fh = open(result_folder + "/" + arch + "_" + prog + ".txt", "r")
-     for line in fh.readlines():
-       if arch.startswith("prmt"):
-         if "stages" in line:
-           pipeline_stages[(prog, arch)] = float(line.split()[4])
-       elif arch.startswith("drmt"):
-         if "achieved throughput" in line:
-           drmt_min_periods[(prog, arch)] = int(line.split()[7])
-         if "thread count" in line:
-           drmt_thread_count[(prog, arch)] = int(line.split()[5])
-         if "Searching between limits" in line:
-           drmt_min_periods[(prog, "upper_bound")] = int(line.split()[3])
-       else:
-         print ("Unknown architecture")
-         assert(False)
+     (solver, hw) = runs_of[arch]
+     latency = sys.argv[2] if arch.startswith("drmt") else sys.argv[3]
+     record = runs[(solver, prog, hw, latency)]
+     if arch.startswith("prmt"):
+       pipeline_stages[(prog, arch)] = record["stages"]
+     elif arch.startswith("drmt"):
+       drmt_min_periods[(prog, arch)] = record["period"]
+       drmt_thread_count[(prog, arch)] = record["length"]
+       drmt_min_periods[(prog, "upper_bound")] = record["period_lower_bound"]
+     else:
+       print ("Unknown architecture")
+       assert(False)
 
 for prog in progs:
   plt.figure()
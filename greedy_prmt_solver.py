@@ -1,6 +1,7 @@
 import networkx as nx
 import math
 import collections
+from schedule_arrays import ScheduleArrays, usage_dict
 
 class GreedyPrmtSolver:
     def __init__(self, dag,
@@ -49,16 +50,13 @@ class GreedyPrmtSolver:
 
         # Compute ops on every time slot
         self.ops_at_time = collections.defaultdict(list)
-        self.match_units_usage = dict()
-        for time_slot in range(self.length): self.match_units_usage[time_slot] = 0
-        self.action_fields_usage = dict()
-        for time_slot in range(self.length): self.action_fields_usage[time_slot] = 0
         for v in self.G.nodes():
-          tv = schedule[v]
-          self.ops_at_time[tv].append(v)
           assert(self.G.node[v]['type'] == 'table')
-          self.match_units_usage[tv] += math.ceil((1.0 * self.G.node[v]['key_width'])/self.input_spec.match_unit_size)
-          self.action_fields_usage[tv] += self.G.node[v]['num_fields']
+          self.ops_at_time[schedule[v]].append(v)
+        arrays = ScheduleArrays(self.G, self.input_spec)
+        (match_units, action_fields) = arrays.usage(arrays.times(schedule), self.length)
+        self.match_units_usage = usage_dict(match_units)
+        self.action_fields_usage = usage_dict(action_fields)
         return schedule
  
     def check_usage(self, work_list):
@@ -0,0 +1,269 @@
+import os
+import re
+import tempfile
+import time
+
+import tracing
+
+# Variable types, same letters as gurobipy's GRB.CONTINUOUS/INTEGER/BINARY
+CONTINUOUS = 'C'
+INTEGER    = 'I'
+BINARY     = 'B'
+INFINITY   = float('inf')
+
+# Solve status, common to every backend
+OPTIMAL    = 'optimal'
+INFEASIBLE = 'infeasible'
+TIME_LIMIT = 'time_limit' # also used when the solve was interrupted
+OTHER      = 'other'
+
+# Backend used when a solver is not given one explicitly,
+# e.g. ILP_BACKEND=cbc on boxes without a Gurobi license
+DEFAULT_BACKEND = os.environ.get('ILP_BACKEND', 'gurobi')
+
+# Most threads any solver may use, 0 for no limit. run_batch sets it for
+# every job, so that concurrent runs share the cores instead of each
+# taking all of them.
+THREAD_LIMIT = int(os.environ.get('DRMT_THREADS', '0'))
+
+def capped_threads(threads):
+  """ Thread count for a solver asked for threads (0: solver's choice),
+  within THREAD_LIMIT """
+  if not THREAD_LIMIT:
+    return threads
+  if not threads:
+    return THREAD_LIMIT
+  return min(threads, THREAD_LIMIT)
+
+def make_backend(name = None, logToConsole = 0):
+  """ Returns an empty model for the named backend
+
+  Parameters
+  ----------
+  name : string
+      'gurobi', 'cbc' or 'highs', None for DEFAULT_BACKEND
+  logToConsole : int
+      Print the solver log
+
+  Returns
+  -------
+  backend : GurobiBackend or PulpBackend
+      Empty minimization model
+
+  Besides quicksum over generated terms, backends build an expression
+  in one call from parallel lists with linear(coeffs, variables), which
+  is much cheaper for long rows.
+  """
+  if name is None:
+    name = DEFAULT_BACKEND
+  if name == 'gurobi':
+    backend = GurobiBackend(logToConsole)
+  elif name in ('cbc', 'highs'):
+    backend = PulpBackend(name, logToConsole)
+  else:
+    raise ValueError('Unknown ILP backend: %s' % name)
+  if THREAD_LIMIT:
+    backend.set_threads(THREAD_LIMIT)
+  return backend
+
+class GurobiBackend:
+    """ Thin wrapper around a gurobipy Model """
+    name = 'gurobi'
+
+    def __init__(self, logToConsole = 0):
+        import gurobipy
+        self.grb = gurobipy
+        self.m = gurobipy.Model()
+        self.m.setParam("LogToConsole", logToConsole)
+
+    def add_var(self, lb = 0, ub = INFINITY, vtype = CONTINUOUS, name = ''):
+        return self.m.addVar(lb=lb, ub=self._bound(ub), vtype=vtype, name=name)
+
+    def add_vars(self, indices, lb = 0, ub = INFINITY, vtype = CONTINUOUS, name = ''):
+        return self.m.addVars(indices, lb=lb, ub=self._bound(ub), vtype=vtype, name=name)
+
+    def add_constr(self, constr, name = ''):
+        return self.m.addConstr(constr, name)
+
+    def add_constrs(self, constrs, name = ''):
+        return self.m.addConstrs(constrs, name)
+
+    def add_max_constr(self, res, args, name = ''):
+        return self.m.addConstr(res == self.grb.max_(args), name)
+
+    def quicksum(self, terms):
+        return self.grb.quicksum(terms)
+
+    def linear(self, coeffs, variables):
+        return self.grb.LinExpr(coeffs, variables)
+
+    def minimize(self, expr):
+        self.m.setObjective(expr, self.grb.GRB.MINIMIZE)
+
+    def set_start(self, var, value):
+        var.Start = value
+
+    def set_time_limit(self, seconds):
+        self.m.setParam('TimeLimit', seconds)
+
+    def set_threads(self, threads):
+        self.m.setParam('Threads', threads)
+
+    def optimize(self):
+        if tracing.enabled():
+          self._optimize_traced()
+        else:
+          self.m.optimize()
+        GRB = self.grb.GRB
+        ret = self.m.Status
+        if ret == GRB.OPTIMAL:
+          return OPTIMAL
+        elif ret == GRB.INFEASIBLE:
+          return INFEASIBLE
+        elif (ret == GRB.TIME_LIMIT) or (ret == GRB.INTERRUPTED):
+          return TIME_LIMIT
+        print ('Gurobi return code is %d' % ret)
+        return OTHER
+
+    def _optimize_traced(self):
+        # Presolve ends with the first callback from the simplex, barrier or
+        # MIP search, the rest of Runtime is the search
+        GRB = self.grb.GRB
+        presolve = []
+        def callback(model, where):
+          if (not presolve) and (where not in (GRB.Callback.POLLING, GRB.Callback.PRESOLVE, GRB.Callback.MESSAGE)):
+            presolve.append(model.cbGet(GRB.Callback.RUNTIME))
+        start = time.time()
+        self.m.optimize(callback)
+        runtime = self.m.Runtime
+        presolve_time = presolve[0] if presolve else runtime
+        tracing.add('presolve', start, presolve_time)
+        tracing.add('search', start + presolve_time, runtime - presolve_time)
+
+    def sol_count(self):
+        return self.m.SolCount
+
+    def mip_gap(self):
+        return self.m.MIPGap
+
+    def value(self, var):
+        return var.X
+
+    def _bound(self, value):
+        if value == INFINITY:
+          return self.grb.GRB.INFINITY
+        return value
+
+class PulpBackend:
+    """ Open-source backend, CBC or HiGHS through PuLP """
+    def __init__(self, name = 'cbc', logToConsole = 0):
+        import pulp
+        self.pulp = pulp
+        self.name = name
+        self.log = bool(logToConsole)
+        self.prob = pulp.LpProblem('schedule', pulp.LpMinimize)
+        self.time_limit = None
+        self.threads = None
+        self.warm_start = False
+        self.status = None
+        self.bound = None # best bound on the objective, when the solver reports it
+        self.var_count = 0
+        self.categories = {CONTINUOUS: pulp.LpContinuous, INTEGER: pulp.LpInteger, BINARY: pulp.LpBinary}
+
+    def add_var(self, lb = 0, ub = INFINITY, vtype = CONTINUOUS, name = ''):
+        # PuLP names must be unique and free of special characters
+        self.var_count += 1
+        return self.pulp.LpVariable('%s_%d' % (name or 'x', self.var_count),\
+                                    lowBound=lb, upBound=(None if ub == INFINITY else ub),\
+                                    cat=self.categories[vtype])
+
+    def add_vars(self, indices, lb = 0, ub = INFINITY, vtype = CONTINUOUS, name = ''):
+        return dict((i, self.add_var(lb, ub, vtype, name)) for i in indices)
+
+    def add_constr(self, constr, name = ''):
+        self.prob += constr
+        return constr
+
+    def add_constrs(self, constrs, name = ''):
+        return [self.add_constr(c) for c in constrs]
+
+    def add_max_constr(self, res, args, name = ''):
+        # Linearized as res >= each argument. This is exact whenever res
+        # is minimized, which is how every solver here uses it.
+        return [self.add_constr(res >= a) for a in args]
+
+    def quicksum(self, terms):
+        return self.pulp.lpSum(terms)
+
+    def linear(self, coeffs, variables):
+        return self.pulp.LpAffineExpression(list(zip(variables, coeffs)))
+
+    def minimize(self, expr):
+        self.prob.setObjective(expr)
+
+    def set_start(self, var, value):
+        var.setInitialValue(value)
+        self.warm_start = True
+
+    def set_time_limit(self, seconds):
+        self.time_limit = seconds
+
+    def set_threads(self, threads):
+        self.threads = threads
+
+    def optimize(self):
+        pulp = self.pulp
+        self.bound = None
+        if self.name == 'highs':
+          solver = pulp.HiGHS(msg=self.log, timeLimit=self.time_limit, threads=self.threads)
+          self.prob.solve(solver)
+          self.bound = self.prob.solverModel.getInfo().mip_dual_bound
+        else:
+          # CBC only reports its bound in the log
+          (fd, log_path) = tempfile.mkstemp(suffix = '.log')
+          os.close(fd)
+          solver = pulp.PULP_CBC_CMD(msg=self.log, timeLimit=self.time_limit, threads=self.threads,\
+                                     warmStart=self.warm_start, logPath=log_path)
+          try:
+            self.prob.solve(solver)
+            with open(log_path) as f:
+              log = f.read()
+          finally:
+            os.remove(log_path)
+          if self.log:
+            print (log)
+          found = re.search(r'^Lower bound:\s*(\S+)', log, re.M)
+          if found:
+            self.bound = float(found.group(1))
+        self.status = self.prob.status
+        if self.prob.sol_status == pulp.LpSolutionOptimal:
+          return OPTIMAL
+        elif self.status == pulp.LpStatusInfeasible:
+          return INFEASIBLE
+        elif self.status in (pulp.LpStatusNotSolved, pulp.LpStatusOptimal):
+          # Stopped early, with or without an integer solution
+          return TIME_LIMIT
+        return OTHER
+
+    def sol_count(self):
+        if self.prob.sol_status in (self.pulp.LpSolutionOptimal, self.pulp.LpSolutionIntegerFeasible):
+          return 1
+        return 0
+
+    def mip_gap(self):
+        # As Gurobi's MIPGap: |objective - bound| / |objective|, None
+        # without a solution or a bound
+        if self.prob.sol_status == self.pulp.LpSolutionOptimal:
+          return 0.0
+        if (not self.sol_count()) or (self.bound is None) or (abs(self.bound) == INFINITY):
+          return None
+        objective = self.pulp.value(self.prob.objective)
+        if objective == 0:
+          return 0.0 if self.bound == 0 else None
+        return abs(objective - self.bound) / abs(objective)
+
+    def value(self, var):
+        # CBC/HiGHS report integers with a tolerance, e.g. 2.9999999
+        if var.cat == self.pulp.LpContinuous:
+          return var.varValue
+        return int(round(var.varValue))
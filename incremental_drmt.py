@@ -0,0 +1,208 @@
+import math
+from ilp_backend import GurobiBackend
+from printing import Printing
+
+class IncrementalDrmtModel:
+    """ Model 2 of DrmtScheduleSolver, kept alive across periods
+
+    The binaries qr[v, q, r] do not depend on the period T, only on how
+    many quotients and remainders are in use. The period only shows up in
+    the division constraint, which is written as
+        t[v] = T * quot[v] + rem[v]
+    with quot[v] = sum(q * qr[v, q, r]) and rem[v] = sum(r * qr[v, q, r]).
+    Retargeting to a new period therefore only changes one coefficient per
+    node, switches (q, r) blocks on or off through their upper bounds and,
+    when the new period needs more quotients or remainders than ever
+    before, adds the missing columns.
+
+    This relies on Gurobi's in-place model editing, so it always uses the
+    Gurobi backend, and gurobipy is only imported when the model is built.
+    """
+    def __init__(self, dag, input_spec, logToConsole = 0):
+        self.G = dag
+        self.input_spec = input_spec
+        self.nodes = dag.nodes()
+        self.match_nodes = dag.nodes(select='match')
+        self.action_nodes = dag.nodes(select='action')
+        self.match_units = dict((v, math.ceil((1.0 * dag.node[v]['key_width']) / input_spec.match_unit_size))\
+                                for v in self.match_nodes)
+
+        # Per-probe statistics: period, Q_MAX, build time, solve time, status
+        self.probes = []
+        # Start times of the last solution, used to warm start the next probe
+        self.last_time_of_op = None
+
+        self.backend = GurobiBackend(logToConsole)
+        self.grb = self.backend.grb
+        GRB = self.grb.GRB
+        m = self.backend.m
+        self.m = m
+        nodes = self.nodes
+
+        self.t = m.addVars(nodes, lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="t")
+        self.quot = m.addVars(nodes, lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="quot")
+        self.rem = m.addVars(nodes, lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="rem")
+        self.length = m.addVar(lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="length")
+        m.setObjective(self.length, GRB.MINIMIZE)
+
+        # Period independent constraints, identical to model 2
+        m.addConstrs((self.t[v] <= self.length for v in nodes), "constr_length_is_max")
+        m.addConstrs((self.t[v] - self.t[u] >= dag.edge[u][v]['delay'] for (u,v) in dag.edges()),\
+                     "constr_dag_dependencies")
+
+        # Rows that receive coefficients as the qr columns are created
+        self.unique = m.addConstrs((self.grb.LinExpr() == 1 for v in nodes), "constr_unique_quotient_remainder")
+        self.quot_def = m.addConstrs((self.quot[v] == 0 for v in nodes), "constr_quotient")
+        self.rem_def = m.addConstrs((self.rem[v] == 0 for v in nodes), "constr_remainder")
+
+        # The period is the coefficient of quot[v], set on every retarget
+        self.division = m.addConstrs((self.t[v] - self.quot[v] - self.rem[v] == 0 for v in nodes),\
+                                     "constr_division")
+
+        # Per remainder rows, grown on demand
+        self.match_units_constr = dict()
+        self.action_fields_constr = dict()
+        self.match_proc_constr = dict()
+        self.action_proc_constr = dict()
+
+        self.qr = dict()
+        self.any_match = dict()
+        self.any_action = dict()
+        # All the variables of a (q, r) block, to switch it on and off
+        self.block_vars = dict()
+        self.active = set()
+        self.n_q = 0
+        self.n_r = 0
+        self.T = None
+        self.started = []
+
+    def retarget(self, period_duration, Q_MAX, init_schedule = None, windows = None):
+        """ Prepares the model for a new period
+
+        Parameters
+        ----------
+        period_duration : int
+            New period T
+        Q_MAX : int
+            Number of quotients (packets) allowed for this period
+        init_schedule : dict
+            Start time per node to warm start from. If None, the start
+            times of the previous probe are rotated into the new period.
+        windows : dict
+            (earliest, latest) start time per node, see bounds.time_windows.
+            qr[v, q, r] outside the window of v is fixed to 0.
+        """
+        timer = Printing()
+        timer.start()
+        T = period_duration
+        m = self.m
+        GRB = self.grb.GRB
+
+        self._grow(max(self.n_q, Q_MAX), max(self.n_r, T))
+
+        # Switch blocks on and off, only touching the ones that change
+        wanted = set((q, r) for q in range(Q_MAX) for r in range(T))
+        for block in wanted.symmetric_difference(self.active):
+          ub = 1.0 if block in wanted else 0.0
+          block_vars = self.block_vars[block]
+          m.setAttr('UB', block_vars, [ub] * len(block_vars))
+        self.active = wanted
+
+        # Time windows, on top of the blocks
+        t_vars = [self.t[v] for v in self.nodes]
+        if windows:
+          qr_vars = []
+          qr_ubs = []
+          for (q, r) in wanted:
+            for v in self.nodes:
+              qr_vars.append(self.qr[v, q, r])
+              qr_ubs.append(1.0 if windows[v][0] <= q * T + r <= windows[v][1] else 0.0)
+          m.setAttr('UB', qr_vars, qr_ubs)
+          m.setAttr('LB', t_vars, [windows[v][0] for v in self.nodes])
+          m.setAttr('UB', t_vars, [windows[v][1] for v in self.nodes])
+        else:
+          m.setAttr('LB', t_vars, [0.0] * len(t_vars))
+          m.setAttr('UB', t_vars, [GRB.INFINITY] * len(t_vars))
+
+        # t[v] = T * quot[v] + rem[v]
+        if T != self.T:
+          for v in self.nodes:
+            m.chgCoeff(self.division[v], self.quot[v], -T)
+          self.T = T
+
+        # Warm start
+        for var in self.started:
+          var.Start = GRB.UNDEFINED
+        self.started = []
+        schedule = init_schedule if init_schedule else self.last_time_of_op
+        if schedule:
+          for v in self.nodes:
+            (q, r) = divmod(schedule[v], T)
+            if q >= Q_MAX:
+              continue
+            for var, value in ((self.t[v], schedule[v]), (self.quot[v], q),\
+                               (self.rem[v], r), (self.qr[v, q, r], 1)):
+              var.Start = value
+              self.started.append(var)
+
+        m.update()
+        timer.stop()
+        self.probes.append({'period': T, 'Q_MAX': Q_MAX, 'build_time': timer.result})
+
+    def record_probe(self, status, solve_time, time_of_op):
+        """ Stores the outcome of the last probe, its start times are
+        the warm start for the next one """
+        self.probes[-1]['status'] = status
+        self.probes[-1]['solve_time'] = solve_time
+        if time_of_op:
+          self.last_time_of_op = dict(time_of_op)
+
+    def _grow(self, n_q, n_r):
+        if (n_q == self.n_q) and (n_r == self.n_r):
+          return
+        m = self.m
+        (GRB, LinExpr, Column) = (self.grb.GRB, self.grb.LinExpr, self.grb.Column)
+        limit_m = self.input_spec.match_unit_limit
+        limit_a = self.input_spec.action_fields_limit
+
+        # New per remainder rows start empty
+        for r in range(self.n_r, n_r):
+          self.match_units_constr[r] = m.addConstr(LinExpr() <= limit_m, "constr_match_units[%d]" % r)
+          self.action_fields_constr[r] = m.addConstr(LinExpr() <= limit_a, "constr_action_fields[%d]" % r)
+          self.match_proc_constr[r] = m.addConstr(LinExpr() <= self.input_spec.match_proc_limit,\
+                                                  "constr_match_proc[%d]" % r)
+          self.action_proc_constr[r] = m.addConstr(LinExpr() <= self.input_spec.action_proc_limit,\
+                                                   "constr_action_proc[%d]" % r)
+        m.update()
+
+        new_blocks = [(q, r) for q in range(n_q) for r in range(n_r)\
+                      if (q >= self.n_q) or (r >= self.n_r)]
+        for (q, r) in new_blocks:
+          block_vars = []
+          for v in self.nodes:
+            if v in self.match_units:
+              resource = (self.match_units[v], self.match_units_constr[r])
+            else:
+              resource = (self.G.node[v]['num_fields'], self.action_fields_constr[r])
+            entries = [(1.0, self.unique[v]), (-q, self.quot_def[v]), (-r, self.rem_def[v]), resource]
+            entries = [(c, constr) for (c, constr) in entries if c != 0]
+            self.qr[v, q, r] = m.addVar(ub=0.0, vtype=GRB.BINARY, name="qr[%s,%d,%d]" % (v, q, r),\
+                                        column=Column([c for (c, _) in entries], [constr for (_, constr) in entries]))
+            block_vars.append(self.qr[v, q, r])
+          self.any_match[q, r] = m.addVar(ub=0.0, vtype=GRB.BINARY, name="any_match[%d,%d]" % (q, r),\
+                                          column=Column([1.0], [self.match_proc_constr[r]]))
+          self.any_action[q, r] = m.addVar(ub=0.0, vtype=GRB.BINARY, name="any_action[%d,%d]" % (q, r),\
+                                           column=Column([1.0], [self.action_proc_constr[r]]))
+          block_vars += [self.any_match[q, r], self.any_action[q, r]]
+          self.block_vars[q, r] = block_vars
+
+        # The any_match/any_action detection rows only involve one block
+        m.update()
+        for (q, r) in new_blocks:
+          m.addConstr(self.grb.quicksum(self.qr[v, q, r] for v in self.match_nodes)\
+                      <= len(self.match_nodes) * self.any_match[q, r], "constr_any_match1[%d,%d]" % (q, r))
+          m.addConstr(self.grb.quicksum(self.qr[v, q, r] for v in self.action_nodes)\
+                      <= len(self.action_nodes) * self.any_action[q, r], "constr_any_action1[%d,%d]" % (q, r))
+
+        self.n_q = n_q
+        self.n_r = n_r
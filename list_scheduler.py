@@ -0,0 +1,132 @@
+import bisect
+import heapq
+import importlib
+import sys
+
+from schedule_dag import ScheduleDAG
+from dag_io import load_input_spec
+from randomized_sieve import SieveDAG
+
+def list_schedule(input_spec, dag, period_duration, priority = None, sdag = None, tie_break = None):
+  """ Deterministic list scheduler for dRMT
+
+  Nodes are taken in priority order among those whose predecessors are
+  all placed. Each joins the first packet already in use at or after the
+  time its predecessors allow, in a ring slot (time % period_duration)
+  with room for it in the modulo reservation table: match units and
+  action fields. Only if there is none, it opens a packet at the first
+  time, from its ALAP start time on, whose slot has room and fewer than
+  match_proc_limit (action_proc_limit) packets. Opening packets late and
+  joining them keeps slots free, which is what runs out first with one
+  or two packets per slot.
+
+  Parameters
+  ----------
+  input_spec : module
+      Input with the hardware limits filled in
+  dag : ScheduleDAG
+      The DAG
+  period_duration : int
+      Period T
+  priority : dict
+      Sort key of every node, lower first. By default two passes, one by
+      ALAP start time and one by critical path slack (ALAP - ASAP start
+      time), and the shorter schedule is returned.
+  sdag : SieveDAG
+      The compiled DAG, compiled here if not given
+  tie_break : dict
+      Sort key of every node among those equal in both default passes,
+      e.g. the order of another heuristic. Node index order if None.
+
+  Returns
+  -------
+  schedule : dict
+      Start time of every node, None if some node finds no slot
+  """
+  if sdag is None:
+    sdag = SieveDAG(input_spec, dag)
+  nodes = len(sdag.names)
+  critical = max([h + t for (h, t) in zip(sdag.head, sdag.tail)] or [0])
+  alap = [critical - sdag.tail[v] for v in range(nodes)]
+  if priority is not None:
+    return _place(input_spec, sdag, period_duration, [priority[sdag.names[v]] for v in range(nodes)], alap)
+  last = [(tie_break[sdag.names[v]] if tie_break else 0) for v in range(nodes)]
+  best = None
+  for key in ([(alap[v], sdag.slack[v], last[v]) for v in range(nodes)],\
+              [(sdag.slack[v], alap[v], last[v]) for v in range(nodes)]):
+    schedule = _place(input_spec, sdag, period_duration, key, alap)
+    if schedule and ((best is None) or (max(schedule.values()) < max(best.values()))):
+      best = schedule
+  return best
+
+def _place(input_spec, sdag, T, key, alap):
+  # One pass of list_schedule in the order of key
+  nodes = len(sdag.names)
+
+  # Modulo reservation table, and the sorted times of the packets in use
+  used = {True: [0] * T, False: [0] * T}
+  packets = {True: [set() for r in range(T)], False: [set() for r in range(T)]}
+  opened = {True: [], False: []}
+  limit = {True: input_spec.match_unit_limit, False: input_spec.action_fields_limit}
+  proc_limit = {True: input_spec.match_proc_limit, False: input_spec.action_proc_limit}
+
+  indegree = list(sdag.indegree)
+  ready = [(key[v], v) for v in range(nodes) if indegree[v] == 0]
+  heapq.heapify(ready)
+  time = [0] * nodes
+  while ready:
+    (k, v) = heapq.heappop(ready)
+    match = sdag.is_match[v]
+    earliest = max([time[sdag.pred_idx[e]] + sdag.pred_delay[e]\
+                    for e in range(sdag.pred_ptr[v], sdag.pred_ptr[v + 1])] or [0])
+
+    fits = lambda t: used[match][t % T] + sdag.cost[v] <= limit[match]
+    later = opened[match][bisect.bisect_left(opened[match], earliest):]
+    t = next((t for t in later if fits(t)), None)
+    if t is None:
+      # Every slot is tried once, from the ALAP start time on
+      start = max(earliest, alap[v])
+      t = next((t for t in range(start, start + T)\
+                if fits(t) and (len(packets[match][t % T]) < proc_limit[match])), None)
+      if t is None:
+        return None
+      packets[match][t % T].add(t)
+      bisect.insort(opened[match], t)
+    time[v] = t
+    used[match][t % T] += sdag.cost[v]
+
+    for e in range(sdag.succ_ptr[v], sdag.succ_ptr[v + 1]):
+      w = sdag.succ_idx[e]
+      indegree[w] -= 1
+      if indegree[w] == 0:
+        heapq.heappush(ready, (key[w], w))
+
+  return dict((sdag.names[v], time[v]) for v in range(nodes))
+
+if __name__ == "__main__":
+  # Cmd line args
+  if (len(sys.argv) != 5):
+    print ("Usage: ", sys.argv[0], " <DAG file> <HW file> <latency file> <P>")
+    exit(1)
+  input_file   = sys.argv[1]
+  hw_file      = sys.argv[2]
+  latency_file = sys.argv[3]
+  P = int(sys.argv[4])
+
+  input_spec = load_input_spec(input_file)
+  hw_spec    = importlib.import_module(hw_file, "*")
+  latency_spec=importlib.import_module(latency_file, "*")
+  input_spec.action_fields_limit = hw_spec.action_fields_limit
+  input_spec.match_unit_limit    = hw_spec.match_unit_limit
+  input_spec.match_unit_size     = hw_spec.match_unit_size
+  input_spec.action_proc_limit   = hw_spec.action_proc_limit
+  input_spec.match_proc_limit    = hw_spec.match_proc_limit
+
+  G = ScheduleDAG()
+  G.create_dag(input_spec.nodes, input_spec.edges, latency_spec)
+  schedule = list_schedule(input_spec, G, P)
+  if schedule is None:
+    print ("List scheduler found no schedule")
+  else:
+    print ("Latency for list scheduler: ", max(schedule.values()))
+    print (schedule)
@@ -1,7 +1,5 @@
-import os
+from run_batch import run, print_records
+import experiment_matrix
 
-#os.system("python2 compare_ilps.py +28 large_hw drmt_latencies 1")
-for i in range(30):
-  os.system("python2 compare_ilps.py +"+str(i)+" large_hw drmt_latencies_short 5")
-
-#os.system("python2 compare_ilps.py proba2 large_hw drmt_latencies 5")
+# compare_ilps.py on the random DAGs +0 ... +29, see experiment_matrix.py
+print_records(run(experiment_matrix.random_dags, 'results/random_dags'))
@@ -3,31 +3,41 @@ import math
 import random
 import sys
 from printing import Printing
-from randomized_sieve import random_topological_sort_recursive
+from randomized_sieve import SieveDAG, random_topological_order
 from schedule_dag import ScheduleDAG
+from dag_io import load_input_spec
 import networkx as nx
 
 class MyGreedySolver:
-  def __init__(self, G, input_spec):
-    self.G = G.copy()
+  # seed: the run is reproducible for the same seed, a random one if None.
+  # self.seed records it either way.
+  # tournament: critical path bias of the tie-breaking order, see random_topological_order
+  def __init__(self, G, input_spec, seed = None, tournament = 1):
+    # Nodes are removed as they are scheduled. A new graph from the frozen
+    # one, a deep copy would walk the caches other seed heuristics fill.
+    self.G = G.freeze().thaw()
     self.input_spec = input_spec
+    if seed is None:
+      seed = random.randrange(2**31)
+    self.seed = seed
+    self.rng = random.Random(seed)
+    self.tournament = tournament
   def solve(self):
     result = dict()
     action_time = set()
     match_time = set()
     i = 0
-    tmp_nodes = list(self.G.nodes())
-    random.shuffle(tmp_nodes)
     next_decided = False
-    top_sort = random_topological_sort_recursive(self.G)
+    # Random tie-breaking rank, nodes earlier in a random topological order first
+    sdag = SieveDAG(None, self.G)
+    top_sort = [sdag.names[v] for v in random_topological_order(sdag, self.rng, self.tournament)]
 
     #print(top_sort)
     #ind = self.G.nodes().index("egress_vlan_xlate_ACTION")
     #print(self.G.nodes()[ind])
     #print(self.G.in_degree("egress_vlan_xlate_ACTION"))
     #print(self.G.out_edges("egress_vlan_xlate_ACTION"))
-    #print(tmp_nodes)
-    rnd_nodes = {node: i for i,node in enumerate(tmp_nodes)}
+    rnd_nodes = {node: -i for i,node in enumerate(top_sort)}
 
 
     while len(self.G.nodes()) > 0:
@@ -61,13 +71,13 @@ class MyGreedySolver:
         next_decided = False
         M = not M
       elif sum_key_width >= 0.5*self.input_spec.match_unit_size and sum_num_fields >= 0.5*self.input_spec.action_fields_limit:
-        M = random.random()*(1.0*sum_key_width/self.input_spec.match_unit_size+1.0*sum_num_fields/self.input_spec.action_fields_limit) < sum_key_width
+        M = self.rng.random()*(1.0*sum_key_width/self.input_spec.match_unit_size+1.0*sum_num_fields/self.input_spec.action_fields_limit) < sum_key_width
       if sum_key_width >= 0.5*self.input_spec.match_unit_size and sum_num_fields < 0.5*self.input_spec.action_fields_limit:
         M = True
       elif sum_key_width < 0.5*self.input_spec.match_unit_size and sum_num_fields >= 0.5*self.input_spec.action_fields_limit:
         M = False
       else:
-        M = random.random()*(1.0*sum_key_width/self.input_spec.match_unit_size+1.0*sum_num_fields/self.input_spec.action_fields_limit) < sum_key_width
+        M = self.rng.random()*(1.0*sum_key_width/self.input_spec.match_unit_size+1.0*sum_num_fields/self.input_spec.action_fields_limit) < sum_key_width
         if sum_key_width>0 and sum_num_fields>0:
           next_decided = True
       # Add match nodes with positive width
@@ -109,6 +119,7 @@ class MyGreedySolver:
       #print(i, current_match_usage, current_action_usage)
 
       i += 1
+    self.result = result
     return len(match_time),len(action_time)
 
 
@@ -121,7 +132,7 @@ if __name__ == '__main__':
   latency_file = sys.argv[3]
 
   # Input specification
-  input_spec = importlib.import_module(input_file, "*")
+  input_spec = load_input_spec(input_file)
   hw_spec    = importlib.import_module(hw_file, "*")
   latency_spec_short=importlib.import_module(latency_file, "*")
   input_spec.action_fields_limit = hw_spec.action_fields_limit
@@ -145,7 +156,7 @@ if __name__ == '__main__':
     solution = solver.solve()
     if max(solution) < best_sol:
       best_sol = max(solution)
-      print(best_sol, timer.get_time(), i)
+      print(best_sol, timer.get_time(), i, 'seed', solver.seed)
     if max(solution) not in d:
       d[max(solution)] = 1
     else:
@@ -1,17 +1,18 @@
 import collections
 import itertools
 import math
-from gurobipy import GRB, Model, max_
+from ilp_backend import make_backend, INTEGER, BINARY, INFINITY, OPTIMAL, INFEASIBLE, TIME_LIMIT
 from printing import Printing
 
 from solution import MySolution
 
 
 class MyILP:
-	def __init__(self, dag, input_spec, minute_limit):
+	def __init__(self, dag, input_spec, minute_limit, backend = None):
 		self.G = dag
 		self.input_spec = input_spec
 		self.minute_limit    = minute_limit
+		self.backend = backend # None for ilp_backend.DEFAULT_BACKEND
 
 	def solve(self):
 		""" Returns the optimal schedule
@@ -32,71 +33,69 @@ class MyILP:
 		action_nodes = self.G.nodes(select='action')
 		edges = self.G.edges()
 
-		m = Model()
-		m.setParam("LogToConsole", 0)
+		m = make_backend(self.backend)
 
 		T = len(nodes)
-		t = m.addVars(nodes, lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="t")
-		qr  = m.addVars(list(itertools.product(nodes, range(T))), vtype=GRB.BINARY, name="qr")
-		any_match = m.addVars(list(range(T)), vtype=GRB.BINARY, name = "any_match")
-		any_action = m.addVars(list(range(T)), vtype=GRB.BINARY, name = "any_action")
-		P = m.addVar(lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="P")
-		A = m.addVar(lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="A")
-		M = m.addVar(lb=0, ub=GRB.INFINITY, vtype=GRB.INTEGER, name="M")
+		t = m.add_vars(nodes, lb=0, ub=INFINITY, vtype=INTEGER, name="t")
+		qr  = m.add_vars(list(itertools.product(nodes, range(T))), vtype=BINARY, name="qr")
+		any_match = m.add_vars(list(range(T)), vtype=BINARY, name = "any_match")
+		any_action = m.add_vars(list(range(T)), vtype=BINARY, name = "any_action")
+		P = m.add_var(lb=0, ub=INFINITY, vtype=INTEGER, name="P")
+		A = m.add_var(lb=0, ub=INFINITY, vtype=INTEGER, name="A")
+		M = m.add_var(lb=0, ub=INFINITY, vtype=INTEGER, name="M")
 
-		m.setObjective(P, GRB.MINIMIZE)
+		m.minimize(P)
 
-		m.addConstrs((sum(qr[v, r] for r in range(T)) == 1 for v in nodes),\
+		m.add_constrs((m.quicksum(qr[v, r] for r in range(T)) == 1 for v in nodes),\
 					"constr_unique_quotient_remainder")
-		m.addConstrs((t[v] == \
-						sum(r * qr[v, r] for r in range(T)) \
+		m.add_constrs((t[v] == \
+						m.quicksum(r * qr[v, r] for r in range(T)) \
 						for v in nodes), "constr_division")
-		m.addConstrs((t[v] - t[u] >= int(self.G.edge[u][v]['delay'] > 0) for (u,v) in edges),\
+		m.add_constrs((t[v] - t[u] >= int(self.G.edge[u][v]['delay'] > 0) for (u,v) in edges),\
 					"constr_dag_dependencies")
-		m.addConstrs((sum(math.ceil((1.0 * self.G.node[v]['key_width']) / self.input_spec.match_unit_size) * qr[v, r]\
+		m.add_constrs((m.quicksum(math.ceil((1.0 * self.G.node[v]['key_width']) / self.input_spec.match_unit_size) * qr[v, r]\
 						for v in match_nodes)\
 						<= self.input_spec.match_unit_limit * any_match[r]\
 						for r in range(T)),\
 						"constr_match_units")
-		m.addConstrs((sum(self.G.node[v]['num_fields'] * qr[v, r]\
+		m.add_constrs((m.quicksum(self.G.node[v]['num_fields'] * qr[v, r]\
 						for v in action_nodes)\
 						<= self.input_spec.action_fields_limit * any_action[r]\
 						for r in range(T)),\
 						"constr_action_fields")
-		#m.addConstrs((sum(qr[v, r] for v in match_nodes) <= (len(match_nodes) * any_match[r]) \
+		#m.add_constrs((m.quicksum(qr[v, r] for v in match_nodes) <= (len(match_nodes) * any_match[r]) \
 		#              for r in range(T)),\
 		#              "constr_any_match1");
-		#m.addConstrs((sum(qr[v, r] for v in action_nodes) <= (len(action_nodes) * any_action[r]) \
+		#m.add_constrs((m.quicksum(qr[v, r] for v in action_nodes) <= (len(action_nodes) * any_action[r]) \
 		#              for r in range(T)),\
 		#              "constr_any_action1");
-		m.addConstr(M == sum(any_match[i] for i in range(T)), "M_constraint")
-		m.addConstr(A == sum(any_action[i] for i in range(T)), "A_constraint")
-		m.addConstr(P == max_(A,M), "P_constraint")
+		m.add_constr(M == m.quicksum(any_match[i] for i in range(T)), "M_constraint")
+		m.add_constr(A == m.quicksum(any_action[i] for i in range(T)), "A_constraint")
+		m.add_max_constr(P, [A, M], "P_constraint")
 
 		# Solve model
-		m.setParam('TimeLimit', self.minute_limit * 60)
+		m.set_time_limit(self.minute_limit * 60)
 		my_timer = Printing()
 		my_timer.start()
-		m.optimize()
+		ret = m.optimize()
 		my_timer.stop()
-		ret = m.Status
 
 		solution = MySolution()
 		solution.P = -1
-		if (ret == GRB.INFEASIBLE):
+		if (ret == INFEASIBLE):
 			solution.descr = "Infeasible"
 			solution.result = False
 			return solution
-		elif ((ret == GRB.TIME_LIMIT) or (ret == GRB.INTERRUPTED)):
-			if (m.SolCount == 0):
+		elif (ret == TIME_LIMIT):
+			if (m.sol_count() == 0):
 				solution.descr = "Hit time limit or interrupted, no solution found yet"
 				solution.result = False
 				return solution
 			else:
 				solution.descr = "subopt"
 				solution.result = True
-				#print ('Hit time limit or interrupted, suboptimal solution found with gap ', m.MIPGap)
-		elif (ret == GRB.OPTIMAL):
+				#print ('Hit time limit or interrupted, suboptimal solution found with gap ', m.mip_gap())
+		elif (ret == OPTIMAL):
 			solution.descr = "opt"
 			solution.result = True
 		else:
@@ -108,13 +107,13 @@ class MyILP:
 		self.ops_at_time = collections.defaultdict(list)
 		for v in nodes:
 			for r in range(T):
-				if qr[v, r].x > 0:
+				if m.value(qr[v, r]) > 0:
 					pass
-					#print(v, r,self.G.node[v],qr[v, r].x)
-			self.length = int(P.x) + 1
-			assert(self.length == P.x + 1)
+					#print(v, r,self.G.node[v],m.value(qr[v, r]))
+			self.length = int(m.value(P)) + 1
+			assert(self.length == m.value(P) + 1)
 		for v in nodes:
-			tv = int(t[v].x)
+			tv = int(m.value(t[v]))
 			self.time_of_op[v] = tv
 			self.ops_at_time[tv].append(v)
 
@@ -125,9 +124,9 @@ class MyILP:
 		solution.time_of_op = self.time_of_op
 		solution.ops_at_time = self.ops_at_time
 		solution.length = self.length
-		solution.P = int(P.x)
-		solution.A = int(A.x)
-		solution.M = int(M.x)
+		solution.P = int(m.value(P))
+		solution.A = int(m.value(A))
+		solution.M = int(m.value(M))
 		solution.time = my_timer.result
 
 		return solution
\ No newline at end of file
@@ -0,0 +1,209 @@
+import multiprocessing
+import time
+
+from drmt import DrmtScheduleSolver, seedless_horizon
+from ilp_backend import THREAD_LIMIT
+from feasibility_memo import default_memo
+import tracing
+
+# Number of candidate periods probed at the same time
+PARALLEL_PROBES = 4
+
+# Seconds to wait between polls of the running probes
+POLL_INTERVAL = 0.2
+
+def _probe(conn, dag, input_spec, latency_spec, period, minute_limit, model, seed_rnd_sieve, threads, trace_parent):
+  # Runs in a child process: solve one period and send the outcome back,
+  # with the spans traced here
+  start = time.time()
+  print ('period = %d cycles' % period)
+  print ('{:*^80}'.format(' Scheduling DRMT '))
+  with tracing.span('probe', parent = trace_parent, period = period):
+    solver = DrmtScheduleSolver(dag, input_spec, latency_spec,\
+                                seed_rnd_sieve = seed_rnd_sieve, period_duration = period,\
+                                minute_limit = minute_limit, model = model, threads = threads)
+    solution = solver.solve()
+  conn.send((solution, time.time() - start, tracing.take()))
+  conn.close()
+
+class PeriodSweep:
+    """ Searches for the minimum feasible period by probing several
+    candidate periods in parallel, one DrmtScheduleSolver per process.
+
+    Feasibility is assumed to be monotone in the period, exactly as in
+    the serial binary search: a feasible period makes every larger
+    period pointless, an infeasible one every smaller period.
+    Running probes that become pointless are cancelled.
+
+    Periods whose answer follows from the FeasibilityMemo are not probed,
+    and every proven answer goes into the memo. If the best period is
+    only known from the memo, it is solved last for its schedule.
+    """
+    def __init__(self, dag, input_spec, latency_spec, minute_limit, model,\
+                 processes = PARALLEL_PROBES, seed_rnd_sieve = True, memo = True, program = None):
+        self.G = dag
+        self.input_spec = input_spec
+        self.latency_spec = latency_spec
+        self.minute_limit = minute_limit
+        self.model = model
+        # Share the cores between the concurrent Gurobi runs, only
+        # DRMT_THREADS of them if that is set
+        cores = THREAD_LIMIT or multiprocessing.cpu_count()
+        self.processes = max(1, min(processes, cores))
+        self.seed_rnd_sieve = seed_rnd_sieve
+        self.threads = max(1, cores // self.processes)
+        self.timings = dict()
+        # FeasibilityMemo, True for the default one, None for none
+        self.memo = default_memo() if (memo is True) else memo
+        # Name of the program in the memo table
+        self.program = program
+
+    def run(self, low, high):
+        """ Returns the smallest feasible period in [low, high]
+
+        Parameters
+        ----------
+        low : int
+            Smallest candidate period
+        high : int
+            Largest candidate period
+
+        Returns
+        -------
+        period : int
+            Smallest feasible period, None if no period is feasible
+        solution : Solution
+            Solution for that period, None if no period is feasible or the
+            memo knew the period feasible but the solver found no schedule
+        """
+        assert(low > 0)
+        best_period = None
+        best_solution = None
+        running = dict() # period -> (process, connection, start time)
+        self.timings = dict()
+
+        while True:
+          # Keep every process busy with the most informative period
+          while len(running) < self.processes:
+            period = self._next_period(low, high, running)
+            if period is None:
+              break
+            # Without a seed, the probe would search no further than this
+            known = self.memo.infer(self.G, self.input_spec, period, seedless_horizon(self.G, period))\
+                    if self.memo else None
+            if known is None:
+              running[period] = self._launch(period)
+            elif known:
+              self.timings[period] = ('memo: feasible', 0.0)
+              if (best_period is None) or (period < best_period):
+                best_period = period
+                best_solution = None
+              high = min(high, period - 1)
+              self._cancel(running, lambda p: p > period)
+            else:
+              self.timings[period] = ('memo: infeasible', 0.0)
+              low = max(low, period + 1)
+              self._cancel(running, lambda p: p < period)
+
+          if not running:
+            break
+
+          finished = False
+          for period in sorted(running.keys()):
+            (proc, conn, start) = running[period]
+            if conn.poll():
+              try:
+                (solution, elapsed, spans) = conn.recv()
+                tracing.merge(spans)
+              except EOFError:
+                # Child died without reporting
+                (solution, elapsed) = ('error', time.time() - start)
+              proc.join()
+            elif not proc.is_alive():
+              (solution, elapsed) = ('error', time.time() - start)
+            else:
+              continue
+            del running[period]
+            finished = True
+
+            if solution == 'error':
+              status = 'error'
+              tracing.add('probe', start, elapsed, period = period, status = status)
+            elif solution is None:
+              status = 'unknown'
+            elif solution.success:
+              status = 'feasible'
+            else:
+              status = 'infeasible'
+            self.timings[period] = (status, elapsed)
+            if self.memo and (status in ('feasible', 'infeasible')):
+              self.memo.record(self.G, self.input_spec, period, status == 'feasible',\
+                               solution.length if (status == 'feasible') else None,\
+                               'drmt model %d' % self.model, self.program, self.latency_spec,\
+                               getattr(solution, 'horizon', None))
+
+            if status == 'feasible':
+              if (best_period is None) or (period < best_period):
+                best_period = period
+                best_solution = solution
+              high = min(high, period - 1)
+              self._cancel(running, lambda p: p > period)
+            else:
+              # Like the serial search, a probe without a solution
+              # moves the lower limit up
+              low = max(low, period + 1)
+              self._cancel(running, lambda p: p < period)
+            break
+
+          if not finished:
+            time.sleep(POLL_INTERVAL)
+
+        if (best_period is not None) and (best_solution is None):
+          # Feasible by the memo, the schedule itself is still needed
+          start = time.time()
+          solver = DrmtScheduleSolver(self.G, self.input_spec, self.latency_spec,\
+                                      seed_rnd_sieve = self.seed_rnd_sieve, period_duration = best_period,\
+                                      minute_limit = self.minute_limit, model = self.model)
+          best_solution = solver.solve()
+          self.timings[best_period] = ('memo: solved', time.time() - start)
+          if (best_solution is None) or (not best_solution.success):
+            best_solution = None
+        return best_period, best_solution
+
+    def _next_period(self, low, high, running):
+        # Split the largest gap between running probes and the limits.
+        # With a single process this is exactly the serial binary search.
+        points = [low - 1] + sorted(p for p in running if low <= p <= high) + [high + 1]
+        best_gap = 1
+        period = None
+        for (a, b) in zip(points, points[1:]):
+          if b - a > best_gap:
+            best_gap = b - a
+            period = (a + b + 1) // 2
+        return period
+
+    def _launch(self, period):
+        (parent_conn, child_conn) = multiprocessing.Pipe(False)
+        proc = multiprocessing.Process(target = _probe,\
+                                       args = (child_conn, self.G, self.input_spec, self.latency_spec,\
+                                               period, self.minute_limit, self.model,\
+                                               self.seed_rnd_sieve, self.threads, tracing.current()))
+        proc.daemon = True
+        proc.start()
+        child_conn.close()
+        return (proc, parent_conn, time.time())
+
+    def _cancel(self, running, pointless):
+        for period in [p for p in running if pointless(p)]:
+          (proc, conn, start) = running.pop(period)
+          proc.terminate()
+          proc.join()
+          conn.close()
+          self.timings[period] = ('cancelled', time.time() - start)
+          tracing.add('probe', start, self.timings[period][1], period = period, status = 'cancelled')
+
+    def print_timings(self):
+        print ('{:*^80}'.format(' Period sweep timings '))
+        for period in sorted(self.timings):
+          (status, elapsed) = self.timings[period]
+          print ('period = %4d  %-10s %10.2f s' % (period, status, elapsed))
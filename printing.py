@@ -1,5 +1,13 @@
+import sys
 import time
 
+def peak_memory():
+	""" Peak resident set size of this process so far, in MB """
+	import resource
+	peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# kilobytes on Linux, bytes on macOS
+	return peak / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0)
+
 class Printing():
 	def __init__(self, status = 0):
 		self.counter = 0
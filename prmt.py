@@ -1,22 +1,34 @@
-from gurobipy import *
+from ilp_backend import make_backend, DEFAULT_BACKEND, INTEGER, BINARY, OPTIMAL
 import numpy as np
 import collections
 import importlib
+import itertools
 import math
+import sys
+import time
 from printing import Printing
 from schedule_dag import ScheduleDAG
+from dag_io import load_input_spec, program_name
 from greedy_prmt_solver import GreedyPrmtSolver
 from fine_to_coarse import contract_dag
 from printers import *
 from solution import Solution
+from schedule_arrays import usage_dict
+from schedule_cache import default_cache, fingerprint
+from schedule_validator import debug_check
+import result_store
+import tracing
 
 class PrmtFineSolver:
     def __init__(self, dag,
-                 input_spec, latency_spec, seed_greedy):
+                 input_spec, latency_spec, seed_greedy, backend = None, cache = True):
         self.G = dag
         self.input_spec          = input_spec
         self.latency_spec        = latency_spec
         self.seed_greedy         = seed_greedy
+        self.backend             = backend # None for ilp_backend.DEFAULT_BACKEND
+        # ScheduleCache for warm starts and known answers, True for the default one, None for none
+        self.cache               = default_cache() if (cache is True) else cache
 
     def solve(self, solve_coarse):
         """ Returns the optimal schedule
@@ -30,10 +42,31 @@ class PrmtFineSolver:
         length : int
             Maximum latency of optimal schedule
         """
+        with tracing.span('prmt solve', coarse = solve_coarse):
+          solution = self._solve(solve_coarse)
+        time_of_op = dict((v, t) for t in solution.ops_at_time for v in solution.ops_at_time[t])
+        debug_check(self.G, self.input_spec, time_of_op, solution.length,\
+                    'prmt coarse' if solve_coarse else 'prmt fine', unit_delays = True)
+        return solution
+
+    def _solve(self, solve_coarse):
+        key = None
+        cached = None
+        if self.cache is not None:
+          key = fingerprint(self.G, self.input_spec, self.latency_spec, None,\
+                            'prmt_coarse' if solve_coarse else 'prmt_fine')
+          cached = self.cache.lookup(key)
+        if cached and (cached['gap'] == 0.0):
+          print ('Optimal solution from the schedule cache')
+          solution = self._solution(cached['schedule'], cached['length'], 0.0)
+          (solution.gap, solution.seed) = (0.0, 'cache')
+          return solution
+
         if self.seed_greedy:
           #print ('{:*^80}'.format(' Running greedy heuristic '))
-          gsolver = GreedyPrmtSolver(contract_dag(self.input_spec, self.latency_spec), self.input_spec)
-          gschedule = gsolver.solve()
+          with tracing.span('greedy seed'):
+            gsolver = GreedyPrmtSolver(contract_dag(self.input_spec, self.latency_spec), self.input_spec)
+            gschedule = gsolver.solve()
           # gschedule was obtained as a solution to the coarse-grained model.
           # it needs to be modified to support the fine-grained model
           # although any solution to prmt_coarse is a solution to prmt_fine
@@ -53,57 +86,72 @@ class PrmtFineSolver:
         edges = self.G.edges()
         (_, cplen) = self.G.critical_path()
 
+        # A shorter schedule from an earlier run is the better start
+        seeded = self.seed_greedy
+        seed_name = 'greedy' if seeded else None
+        if cached and ((not seeded) or (cached['length'] < max(fine_grained_schedule.values()) + 1)):
+          print ('Seeding from the schedule cache, length %d' % cached['length'])
+          seeded = True
+          seed_name = 'cache'
+          fine_grained_schedule = cached['schedule']
+
         # Set T_MAX as the max of initial schedule + 1
-        if (self.seed_greedy):
+        if (seeded):
           T_MAX = max(fine_grained_schedule.values()) + 1
         else:
           T_MAX = 3 * cplen
 
-        m = Model()
-        m.setParam("LogToConsole", 0)
+        build = tracing.start('build')
+        m = make_backend(self.backend)
 
         # Create variables
         # t is the start substage (one match and one action substage make an RMT stage) for each DAG node
-        t = m.addVars(nodes, lb=0, ub=T_MAX, vtype=GRB.INTEGER, name="t")
+        t = m.add_vars(nodes, lb=0, ub=T_MAX, vtype=INTEGER, name="t")
 
         # k is the even/odd quotient for each DAG node, i.e., t = 2*k + 1 or 2*k
-        k = m.addVars(nodes, lb=0, ub=T_MAX, vtype=GRB.INTEGER, name="k")
+        k = m.add_vars(nodes, lb=0, ub=T_MAX, vtype=INTEGER, name="k")
 
         # indicator[v, t] = 1 if v is at substage t 
-        indicator  = m.addVars(list(itertools.product(nodes, range(T_MAX))),\
-                               vtype=GRB.BINARY, name="indicator")
+        indicator  = m.add_vars(list(itertools.product(nodes, range(T_MAX))),\
+                               vtype=BINARY, name="indicator")
 
         # The length of the schedule
-        length = m.addVar(lb=0, ub=T_MAX, vtype=GRB.INTEGER, name="length")
+        length = m.add_var(lb=0, ub=T_MAX, vtype=INTEGER, name="length")
+        build.mark('variables')
 
         # Set objective: minimize length of schedule
-        m.setObjective(length, GRB.MINIMIZE)
+        m.minimize(length)
 
         # Set constraints
 
         # The length is the maximum of all t's
-        m.addConstrs((t[v]  <= length for v in nodes), "constr_length_is_max")
+        m.add_constrs((t[v]  <= length for v in nodes), "constr_length_is_max")
+        build.mark('length is max')
 
         # Given v, indicator[v, t] is 1 for exactly one t
-        m.addConstrs((sum(indicator[v, t] for t in range(T_MAX)) == 1 for v in nodes),\
+        m.add_constrs((m.quicksum(indicator[v, t] for t in range(T_MAX)) == 1 for v in nodes),\
                      "constr_unique_time")
+        build.mark('unique time')
 
         # t is T * indicator
-        m.addConstrs(((t[v] == sum(time * indicator[v, time] for time in range(T_MAX)))\
+        m.add_constrs(((t[v] == m.quicksum(time * indicator[v, time] for time in range(T_MAX)))\
                      for v in nodes),\
                      "constr_equality")
+        build.mark('equality')
 
         # Respect dependencies in DAG, threshold delays at 0
-        m.addConstrs((t[v] - t[u] >= int(self.G.edge[u][v]['delay'] > 0) for (u,v) in edges),\
+        m.add_constrs((t[v] - t[u] >= int(self.G.edge[u][v]['delay'] > 0) for (u,v) in edges),\
                      "constr_dag_dependencies")
+        build.mark('dependencies')
 
         # matches can only happen at even time slots
         for v in match_nodes:
-          m.addConstr(t[v] == 2 * k[v])
+          m.add_constr(t[v] == 2 * k[v])
 
         # actions can only happen at odd time slots
         for v in action_nodes:
-          m.addConstr(t[v] == 2 * k[v] + 1)
+          m.add_constr(t[v] == 2 * k[v] + 1)
+        build.mark('parity')
 
         # Further, if this is coarse-grained PRMT
         # then match and actions from the same table need
@@ -118,55 +166,66 @@ class PrmtFineSolver:
               m_table = match.strip('MATCH')
               a_table = action.strip('ACTION')
               if (m_table == a_table):
-                m.addConstr(k[match] == k[action])
+                m.add_constr(k[match] == k[action])
+        build.mark('coarse')
 
         # Number of match units does not exceed match_unit_limit
-        m.addConstrs((sum(math.ceil((1.0 * self.G.node[v]['key_width']) / self.input_spec.match_unit_size) * indicator[v, t]\
+        m.add_constrs((m.quicksum(math.ceil((1.0 * self.G.node[v]['key_width']) / self.input_spec.match_unit_size) * indicator[v, t]\
                       for v in match_nodes)\
                       <= self.input_spec.match_unit_limit for t in range(T_MAX)),\
                       "constr_match_units")
 
         # The action field resource constraint (similar comments to above)
-        m.addConstrs((sum(self.G.node[v]['num_fields'] * indicator[v, t]\
+        m.add_constrs((m.quicksum(self.G.node[v]['num_fields'] * indicator[v, t]\
                       for v in action_nodes)\
                       <= self.input_spec.action_fields_limit for t in range(T_MAX)),\
                       "constr_action_fields")
+        build.mark('resources')
 
         # Initialize schedule
-        if (self.seed_greedy):
+        if (seeded):
           for v in nodes:
-            t[v].start = fine_grained_schedule[v]
+            m.set_start(t[v], fine_grained_schedule[v])
 
         # Any time slot (r) can have match or action operations
         # from only match_proc_limit/action_proc_limit packets
         # TODO
 
+        build.stop()
         my_timer = Printing()
         my_timer.start()
         # Solve model
-        m.optimize()
+        with tracing.span('solve'):
+          ret = m.optimize()
         my_timer.stop()
 
+        extract = tracing.start('extract')
+        time_of_op = dict((v, int(m.value(t[v]))) for v in nodes)
+        solution = self._solution(time_of_op, int(m.value(length) + 1), my_timer.result)
+        assert(solution.length == m.value(length) + 1)
+        solution.gap = 0.0 if (ret == OPTIMAL) else m.mip_gap()
+        solution.seed = seed_name
+        if key is not None:
+          self.cache.store(key, 'feasible', time_of_op, solution.gap,\
+                           {'solver': 'prmt coarse' if solve_coarse else 'prmt fine',\
+                            'backend': self.backend or DEFAULT_BACKEND,\
+                            'solve time': round(my_timer.result, 3)})
+        extract.stop()
+        return solution
+
+    def _solution(self, time_of_op, length, solve_time):
         # Construct length of schedule
         # and usage in every time slot
         solution = Solution()
         solution.ops_at_time = collections.defaultdict(list)
-        solution.length = int(length.x + 1)
-        solution.time = my_timer.result
-        assert(solution.length == length.x + 1)
-        for time_slot in range(solution.length):
-          solution.match_units_usage[time_slot] = 0
-          solution.action_fields_usage[time_slot] = 0
-        for v in nodes:
-            tv = int(t[v].x)
-            solution.ops_at_time[tv].append(v)
-            if self.G.node[v]['type'] == 'match':
-               solution.match_units_usage[tv] += math.ceil((1.0 * self.G.node[v]['key_width'])/self.input_spec.match_unit_size)
-            elif self.G.node[v]['type'] == 'action':
-               solution.action_fields_usage[tv] += self.G.node[v]['num_fields']
-            else:
-               print ("Found unexpected node type ", self.G.node[v]['type'])
-               assert(False)
+        solution.length = length
+        solution.time = solve_time
+        for v in time_of_op:
+            solution.ops_at_time[time_of_op[v]].append(v)
+        arrays = self.G.resource_arrays(self.input_spec)
+        (match_units, action_fields) = arrays.usage(arrays.times(time_of_op), solution.length)
+        solution.match_units_usage = usage_dict(match_units)
+        solution.action_fields_usage = usage_dict(action_fields)
         return solution
 
 if __name__ == "__main__":
@@ -181,8 +240,13 @@ if __name__ == "__main__":
     assert((sys.argv[4] == "coarse") or (sys.argv[4] == "fine"))
     solve_coarse = bool(sys.argv[4] == "coarse")
 
+  timings = dict() # seconds per phase, for the result record
+  start = time.time()
+  run = tracing.start('prmt', program = program_name(input_file), hw = hw_file, latency = latency_file)
+  load = tracing.start('load dag')
+
   # Input example
-  input_spec = importlib.import_module(input_file, "*")
+  input_spec = load_input_spec(input_file)
   hw_spec    = importlib.import_module(hw_file, "*")
   latency_spec=importlib.import_module(latency_file, "*")
   input_spec.action_fields_limit = hw_spec.action_fields_limit
@@ -193,14 +257,30 @@ if __name__ == "__main__":
 
   G = ScheduleDAG()
   G.create_dag(input_spec.nodes, input_spec.edges, latency_spec)
+  timings['dag'] = time.time() - start
+  load.stop()
   
   print ('{:*^80}'.format(' Input DAG '))
   print_problem(G, input_spec)
   
   print ('{:*^80}'.format(' Scheduling PRMT fine '))
   solver = PrmtFineSolver(G, input_spec, latency_spec, seed_greedy = True)
+  phase = time.time()
   solution = solver.solve(solve_coarse)
+  timings['solve'] = time.time() - phase
   print ('Number of pipeline stages: %f' % (math.ceil(solution.length / 2.0)))
   print ('{:*^80}'.format(' Schedule'))
   print (timeline_str(solution.ops_at_time, white_space=0, timeslots_per_row=4), '\n\n')
   print_resource_usage(input_spec, solution)
+
+  record = result_store.problem_record('prmt_coarse' if solve_coarse else 'prmt_fine', program_name(input_file),\
+                                       hw_file, latency_file, G, input_spec, latency_spec)
+  record.update(result_store.solution_record(solution))
+  record.update({'status': 'feasible',\
+                 'stages': int(math.ceil(solution.length / 2.0)),\
+                 'timings': dict(timings, total = time.time() - start)})
+  run.stop()
+  if tracing.enabled():
+    record['spans'] = tracing.totals()
+  result_store.emit(record)
+  tracing.report()
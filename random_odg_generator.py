@@ -2,6 +2,8 @@
 import networkx as nx
 import numpy as np
 
+from dag_io import save_program
+
 
 def digraph_generator(n):
     
@@ -148,7 +150,7 @@ def odg_attr_generator(G, delays):
     return nodes, edges
     
             
-def odg_generator(n, file_name):   
+def odg_generator(n, file_name, as_json=False):   
              
     # generate DAG    
     G = digraph_generator(n)
@@ -158,6 +160,11 @@ def odg_generator(n, file_name):
     
     # generate ODG
     nodes, edges = odg_attr_generator(G, delays)
+
+    # serialized, see dag_io: loads much faster than a module
+    if as_json:
+        save_program(file_name+'.json.gz', nodes, edges)
+        return
   
     with open(file_name+'.py', 'w') as f: f.write('nodes = ')
     with open(file_name+'.py', 'a') as f: f.write(repr(nodes))
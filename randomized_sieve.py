@@ -1,381 +1,305 @@
 import importlib
-from random import shuffle
+import multiprocessing
+import random
 import sys
 import time as tm
-import numpy as np
-import math
-import Queue
+from collections import deque
 import networkx as nx
 
 from schedule_dag import ScheduleDAG
+from dag_io import load_input_spec
 
-def random_topological_sort_recursive(dag):
-  # This is basically taken from networkx's topological_sort_recursive.
-  # The differences are: 
-  # 1. Randomization of the order we explore node's sucsessors.
-  # 2. Removed cycle detection checks.
-  def _dfs(v):
-    keys=list(dag[v].keys())
-    shuffle(list(keys))
-    for w in keys:   
-        if w not in explored:
-            _dfs(w)
-    explored.add(v)
-    order.append(v)
-              
-  explored = set()
+def random_topological_sort_recursive(dag, rng = None):
+  # Kept for its callers, despite the name it is no longer recursive:
+  # one random_topological_order of the DAG, as node names.
+  # rng is a random.Random, the module level generator if None.
+  sdag = SieveDAG(None, dag)
+  return [sdag.names[v] for v in random_topological_order(sdag, rng)]
+
+def random_topological_order(sdag, rng = None, tournament = 1):
+  """ Returns a random topological order of the nodes
+
+  Randomized Kahn's algorithm: the nodes whose predecessors are all
+  ordered are kept in a list, and the next node is drawn from it and
+  swapped out with the last one. Every topological order can come out.
+
+  Parameters
+  ----------
+  sdag : SieveDAG
+      The compiled DAG
+  rng : random.Random
+      Random generator, the module level one if None
+  tournament : int
+      The next node is the one with the least critical path slack among
+      this many draws. 1 draws uniformly, higher values bias the order
+      towards critical nodes first.
+
+  Returns
+  -------
+  order : list
+      Node indices of sdag
+  """
+  rnd = (rng or random).random
+  succ_ptr, succ_idx = sdag.succ_ptr, sdag.succ_idx
+  slack = sdag.slack
+  indegree = list(sdag.indegree)
+  ready = [v for v in range(len(indegree)) if indegree[v] == 0]
   order = []
+  while ready:
+    k = int(rnd() * len(ready))
+    for i in range(tournament - 1):
+      j = int(rnd() * len(ready))
+      if slack[ready[j]] < slack[ready[k]]:
+        k = j
+    v = ready[k]
+    ready[k] = ready[-1]
+    ready.pop()
+    order.append(v)
+    for e in range(succ_ptr[v], succ_ptr[v + 1]):
+      w = succ_idx[e]
+      indegree[w] -= 1
+      if indegree[w] == 0:
+        ready.append(w)
+  return order
 
-  for v in dag.nodes_iter():
-    if v not in explored:
-      _dfs(v)
+def random_topological_orders(sdag, rng = None, tournament = 1):
+  """ Yields random topological orders, see random_topological_order """
+  while True:
+    yield random_topological_order(sdag, rng, tournament)
 
-  return list(reversed(order))
+class SieveDAG:
+    """ The DAG compiled once into flat integer arrays for index_dag_sieve
 
-def index_dag_sieve(input_spec, dag, index, bound, period_duration):
-  # final schedule           
-  schedule = []
-  
-  period_duration
-      
-  # wild card intensity
+    Nodes are numbered by their position in dag.nodes(), as in
+    dag.freeze(), whose CSR arrays and head / tail this shares. The predecessors
+    of node i are pred_idx[pred_ptr[i]:pred_ptr[i+1]], with the edge delays
+    at the same positions of pred_delay (CSR layout), and likewise for the
+    successors. cost[i] is the number of match units (match nodes) or
+    action fields (action nodes) node i takes in its slot.
+    head[i] (tail[i]) is the longest delay on a path ending (starting)
+    at node i, so any complete schedule spans at least t[i] - head[i]
+    to t[i] + tail[i]. slack[i] is how much shorter than the critical
+    path the longest path through node i is.
+    Without input_spec only the graph is compiled, no cost, which is
+    enough for random_topological_order.
+    Plain lists are used on purpose: the sieve indexes them one element
+    at a time, which is much faster on lists than on NumPy arrays.
+    """
+    def __init__(self, input_spec, dag):
+        self.dag = dag
+        frozen = dag.freeze()
+        self.names = frozen.names
+        self.index = frozen.index
+        if input_spec is not None:
+          arrays = frozen.resource_arrays(input_spec)
+          self.is_match = arrays.is_match.tolist()
+          self.cost = (arrays.match_units + arrays.action_fields).tolist()
+
+        # Shared with the frozen DAG, never modified
+        self.pred_ptr, self.pred_idx, self.pred_delay = frozen.pred_ptr, frozen.pred_idx, frozen.pred_delay
+        self.succ_ptr, self.succ_idx, self.succ_delay = frozen.succ_ptr, frozen.succ_idx, frozen.succ_delay
+
+        self.head, self.tail = frozen.longest()
+        critical = max([h + t for (h, t) in zip(self.head, self.tail)] or [0])
+        self.slack = [critical - h - t for (h, t) in zip(self.head, self.tail)]
+        self.indegree = [self.pred_ptr[i + 1] - self.pred_ptr[i] for i in range(len(self.names))]
+
+def index_dag_sieve(input_spec, dag, index, bound, period_duration, sdag = None, rng = None, cutoff = None,\
+                    stats = None):
+  """ One trial of the randomized sieve
+
+  Places the nodes of a random topological order one by one, forward
+  from position index and backward from position index - 1, each at the
+  first time that respects the dependencies and the per-slot resources.
+
+  Parameters
+  ----------
+  input_spec : module
+      Input with the hardware limits filled in
+  dag : ScheduleDAG
+      The DAG
+  index : int
+      Position in the topological order where the trial starts
+  bound : int
+      Give up once a node would be placed beyond +-bound
+  period_duration : int
+      Period T
+  sdag : SieveDAG
+      The DAG compiled for the sieve, compiled here if not given
+  rng : random.Random
+      Random generator of the trial, the module level one if None
+  cutoff : int
+      Give up as soon as the trial cannot beat a schedule of latency
+      cutoff: the placed nodes, stretched by the critical path before
+      and after each of them, already span cutoff cycles or more
+  stats : dict
+      Counts the trials given up on because of the cutoff ('pruned')
+      and of the bound ('failed')
+
+  Returns
+  -------
+  schedule : list
+      (node, time) pairs in placement order, None if the trial failed
+  """
+  if sdag is None:
+    sdag = SieveDAG(input_spec, dag)
+  T = period_duration
+  rnd = (rng or random).random
+  if cutoff is None:
+    cutoff = 2 * bound + 1
+
+  # wild card intensity: a slot is refused with probability 1 / rf
   rf_m = 10**4
   rf_a = 10**4
-  
+  fail_m = 1.0 / rf_m
+  fail_a = 1.0 / rf_a
+
   # upper bound on nulls for each wild card
   m_nulls = 2
   a_nulls = 2
-  
-  # limit on keys of matches rounded to unit_size - match_unit_limit
-  match_limit = {}
-      
-  # concurrent number of packets that can be matched
-  concurrent_match_limit = {}
-  
-  # limit on bits of actions - action_fields_limit
-  action_limit = {}
-  
-  # concurrent number of packets for actions
-  concurrent_action_limit = {}
-  
-  # Init resource usage
-  for i in range(period_duration):
-      
-      # total resources at cycle
-      match_limit[i] = 0
-      action_limit[i] = 0
-      
-      # number of different packets
-      concurrent_match_limit[i] = []
-      concurrent_action_limit[i] = []
-      
-  # Init time for each node                         
-  for i in dag.nodes():
-      dag.node[i]['time'] = 0
-  
-  # topological sort of DAG    
-  ts = random_topological_sort_recursive(dag) 
-      
-
-  ts_ff_queue = Queue.Queue()
-  ts_rw_queue = Queue.Queue()
-          
-  for i in ts[index:]:
-      ts_ff_queue.put(i)
-          
-  for i in reversed(ts[:index]):
-      ts_rw_queue.put(i)
-      
-      
-  while not (ts_ff_queue.empty() and ts_rw_queue.empty()):
-      
-      coin = bool(np.random.choice(2))
-      
-      if ts_ff_queue.empty():
-          coin = False
-      elif ts_rw_queue.empty():
-          coin = True
-          
-          
-      # loop until all nodes are treated            
-      if coin:
-          
-          # exctact nect node in DAG according to topological sort
-          curr_node = ts_ff_queue.get()
-          
-          # the immediate predecessors of the current node                    
-          pred = dag.predecessors(curr_node)
-                  
-          # lower bound on time of current node                
-          if pred: 
-              time = max([dag.node[i]['time']+\
-              dag.edge[i][curr_node]['delay'] for i in pred])
-          else:
-              time = dag.node[curr_node]['time']
-              
-          # determine node type            
-          MA = dag.node[curr_node]['type']
-  
-          
-          # treat MATCH
-          if MA == 'match': 
-  
-             flag = True
-             
-             # loop until success
-             while flag:
-                                                                                                      
-                # check resources availability at time%period_duration
-                                                                                                      
-                match_limit_cond = match_limit[time%period_duration] + \
-                math.ceil((1.0 * dag.node[curr_node]['key_width']) / input_spec.match_unit_size)\
-                <= input_spec.match_unit_limit
-              
-                con_match_limit_cond = \
-                len(set(concurrent_match_limit[time%period_duration])) < input_spec.match_proc_limit                                                                                      
-                
-                same_con_match_limit_cond = \
-                time in concurrent_match_limit[time%period_duration]
-                
-                wild_card = np.random.choice(rf_m) > 0
-                
-                if match_limit_cond and wild_card and \
-                (con_match_limit_cond or same_con_match_limit_cond):
-  
-                    # node time
-                    dag.node[curr_node]['time'] = time
-                    
-                    # update resource usage
-                    match_limit[time%period_duration] += \
-                    math.ceil((1.0 * dag.node[curr_node]['key_width']) / input_spec.match_unit_size)
-                    
-                    # update different packet matches at that cycle
-                    concurrent_match_limit[time%period_duration].append(time)
-                    
-                    # add to final schedule
-                    schedule.append((curr_node, time))
-                    
-                    # break loop
-                    flag = False
-                 
-                # coalition or lack of resources 
-                else: 
-                    
-                    if not wild_card:
-                        time += np.random.choice(m_nulls)
-                        time += 1
-                        
-                    else:
-                        # advance time in case of failure
-                        time += 1
-                    
-                    # in case solution is not feasible
-                    if time > bound:
-                        return None
-                    
-                
-          # treat Action      
-          if MA == 'action': 
-              
-             flag = True
-             
-             # loop until success
-             while flag:
-                                                                      
-                # check resources availability at time%period_duration
-                                                                      
-                action_limit_cond = action_limit[time%period_duration] + \
-                dag.node[curr_node]['num_fields'] <= input_spec.action_fields_limit
-  
-                con_action_limit_cond = \
-                len(set(concurrent_action_limit[time%period_duration])) < input_spec.action_proc_limit
-                
-                same_con_action_limit_cond = \
-                time in concurrent_action_limit[time%period_duration]
-                
-                wild_card = np.random.choice(rf_a) > 0
-                                          
-                if action_limit_cond and wild_card and \
-                (con_action_limit_cond or same_con_action_limit_cond):
-                    
-                    # node time
-                    dag.node[curr_node]['time'] = time
-                    
-                    # update resource usage
-                    action_limit[time%period_duration] += dag.node[curr_node]['num_fields']
-                    
-                    # update different packet actions at that cycle
-                    concurrent_action_limit[time%period_duration].append(time) 
-                                              
-                    # add to final schedule
-                    schedule.append((curr_node, time))
-                    
-                    # break loop
-                    flag = False
-                    
-                # coalition or lack of resources    
-                else:  
-  
-                    if not wild_card:
-                        time += np.random.choice(a_nulls) 
-                        time += 1
-                        
-                    else:
-                        # advance time in case of failure
-                        time += 1
-                   
-                    # in case solution is not feasible
-                    if time > bound:
-                        return None
-                           
-          
+
+  # match units and action fields used in every slot
+  match_used = [0] * T
+  action_used = [0] * T
+
+  # absolute times (i.e. different packets) in every slot
+  match_packets = [set() for r in range(T)]
+  action_packets = [set() for r in range(T)]
+
+  is_match = sdag.is_match
+  cost = sdag.cost
+  pred_ptr, pred_idx, pred_delay = sdag.pred_ptr, sdag.pred_idx, sdag.pred_delay
+  succ_ptr, succ_idx, succ_delay = sdag.succ_ptr, sdag.succ_idx, sdag.succ_delay
+  names = sdag.names
+  node_time = [0] * len(names)
+
+  # topological sort of DAG
+  ts = random_topological_order(sdag, rng)
+  ts_ff_queue = deque(ts[index:])
+  ts_rw_queue = deque(reversed(ts[:index]))
+
+  # lower bound on the span of the schedule from the placed nodes
+  head, tail = sdag.head, sdag.tail
+  first_time = None
+  last_time = None
+
+  schedule = []
+  while ts_ff_queue or ts_rw_queue:
+      if not ts_ff_queue:
+          forward = False
+      elif not ts_rw_queue:
+          forward = True
       else:
-          
-          # exctact nect node in DAG according to topological sort
-          curr_node = ts_rw_queue.get()
-          
-          # the immediate successors of the current node                    
-          succ = dag.successors(curr_node)
-                  
-          # upper bound on time of current node                
-          if succ: 
-              time = min([dag.node[i]['time']-\
-              dag.edge[curr_node][i]['delay'] for i in succ])
-          else:
-              time = dag.node[curr_node]['time']
-              
-          # determine node type            
-          MA = dag.node[curr_node]['type']
-  
-          
-          # treat MATCH
-          if MA == 'match': 
-  
-             flag = True
-             
-             # loop until success
-             while flag:
-                                                                                                      
-                # check resources availability at time%period_duration
-                                                                                                      
-                match_limit_cond = match_limit[time%period_duration] + \
-                math.ceil((1.0 * dag.node[curr_node]['key_width']) / input_spec.match_unit_size)\
-                <= input_spec.match_unit_limit
-              
-                con_match_limit_cond = \
-                len(set(concurrent_match_limit[time%period_duration])) < input_spec.match_proc_limit                                                                                      
-                
-                same_con_match_limit_cond = \
-                time in concurrent_match_limit[time%period_duration]
-                
-                wild_card = np.random.choice(rf_m) > 0
-                
-                if match_limit_cond and wild_card and \
-                (con_match_limit_cond or same_con_match_limit_cond):
-  
-                    # node time
-                    dag.node[curr_node]['time'] = time
-                    
-                    # update resource usage
-                    match_limit[time%period_duration] += \
-                    math.ceil((1.0 * dag.node[curr_node]['key_width']) / input_spec.match_unit_size)
-                    
-                    # update different packet matches at that cycle
-                    concurrent_match_limit[time%period_duration].append(time)
-                    
-                    # add to final schedule
-                    schedule.append((curr_node, time))
-                    
-                    # break loop
-                    flag = False
-                 
-                # coalition or lack of resources 
-                else: 
-                    
-                    if not wild_card:
-                        time -= np.random.choice(m_nulls)
-                        time -= 1
-                        
-                    else:
-                        # advance time in case of failure
-                        time -= 1
-                    
-                    # in case solution is not feasible
-                    if time < -bound:
-                        return None
-                    
-                
-          # treat Action      
-          if MA == 'action': 
-              
-             flag = True
-             
-             # loop until success
-             while flag:
-                                                                      
-                # check resources availability at time%period_duration
-                                                                      
-                action_limit_cond = action_limit[time%period_duration] + \
-                dag.node[curr_node]['num_fields'] <= input_spec.action_fields_limit
-  
-                con_action_limit_cond = \
-                len(set(concurrent_action_limit[time%period_duration])) < input_spec.action_proc_limit
-                
-                same_con_action_limit_cond = \
-                time in concurrent_action_limit[time%period_duration]
-                
-                wild_card = np.random.choice(rf_a) > 0
-                                          
-                if action_limit_cond and wild_card and \
-                (con_action_limit_cond or same_con_action_limit_cond):
-                    
-                    # node time
-                    dag.node[curr_node]['time'] = time
-                    
-                    # update resource usage
-                    action_limit[time%period_duration] += dag.node[curr_node]['num_fields']
-                    
-                    # update different packet actions at that cycle
-                    concurrent_action_limit[time%period_duration].append(time) 
-                                              
-                    # add to final schedule
-                    schedule.append((curr_node, time))
-                    
-                    # break loop
-                    flag = False
-                    
-                # coalition or lack of resources    
-                else:  
-  
-                    if not wild_card:
-                        time -= np.random.choice(a_nulls) 
-                        time -= 1
-                        
-                    else:
-                        # advance time in case of failure
-                        time -= 1
-                   
-                    # in case solution is not feasible
-                    if time < -bound:
-                        return None
-                              
+          forward = rnd() < 0.5
+
+      if forward:
+          # earliest time after the predecessors
+          v = ts_ff_queue.popleft()
+          time = node_time[v]
+          lo, hi = pred_ptr[v], pred_ptr[v + 1]
+          if lo < hi:
+            time = max([node_time[pred_idx[k]] + pred_delay[k] for k in range(lo, hi)])
+          step = 1
+      else:
+          # latest time before the successors
+          v = ts_rw_queue.popleft()
+          time = node_time[v]
+          lo, hi = succ_ptr[v], succ_ptr[v + 1]
+          if lo < hi:
+            time = min([node_time[succ_idx[k]] - succ_delay[k] for k in range(lo, hi)])
+          step = -1
+
+      if is_match[v]:
+        used, packets = match_used, match_packets
+        limit, proc_limit = input_spec.match_unit_limit, input_spec.match_proc_limit
+        fail, nulls = fail_m, m_nulls
+      else:
+        used, packets = action_used, action_packets
+        limit, proc_limit = input_spec.action_fields_limit, input_spec.action_proc_limit
+        fail, nulls = fail_a, a_nulls
+      c = cost[v]
+
+      # loop until success
+      while True:
+        r = time % T
+        slot_packets = packets[r]
+        wild_card = rnd() >= fail
+        if wild_card and (used[r] + c <= limit) and\
+           ((len(slot_packets) < proc_limit) or (time in slot_packets)):
+          node_time[v] = time
+          used[r] += c
+          slot_packets.add(time)
+          schedule.append((names[v], time))
+          break
+
+        # collision or lack of resources, move on
+        if not wild_card:
+          time += step * int(rnd() * nulls)
+        time += step
+
+        # in case solution is not feasible
+        if time * step > bound:
+          if stats is not None:
+            stats['failed'] = stats.get('failed', 0) + 1
+          return None
+
+      # the bound only grows as nodes are added
+      if first_time is None:
+        first_time = time - head[v]
+        last_time = time + tail[v]
+      else:
+        first_time = min(first_time, time - head[v])
+        last_time = max(last_time, time + tail[v])
+      if last_time - first_time >= cutoff:
+        if stats is not None:
+          stats['pruned'] = stats.get('pruned', 0) + 1
+        return None
+
   return schedule
-    
-    
-def rnd_sieve(input_spec, dag, time_limit, period_duration):
+
+
+# Trial k of a sieve run with master seed s draws from
+# random.Random(s * TRIAL_STRIDE + k), this number is the seed of the trial.
+# The shared best of parallel_rnd_sieve is latency * TRIAL_STRIDE + k.
+TRIAL_STRIDE = 2**32
+
+class SeededSchedule(dict):
+  """ Start time of every node, as found by a randomized heuristic.
+  seed reproduces it, e.g. replay_sieve(..., schedule.seed) """
+  def __init__(self, schedule, seed):
+    dict.__init__(self, schedule)
+    self.seed = seed
+
+def new_seed():
+  """ A fresh master seed, for runs that are not given one """
+  return random.randrange(2**31)
+
+def normalize_schedule(schedule, seed):
+  """ (node, time) pairs of a trial as a SeededSchedule starting at 0 """
+  min_val = min([k[1] for k in schedule])
+  return SeededSchedule(((i[0], i[1] - min_val) for i in schedule), seed)
+
+def rnd_sieve(input_spec, dag, time_limit, period_duration, seed = None):
+  if seed is None:
+    seed = new_seed()
   star_time = tm.time()
   curr_time = tm.time()
-  greedy_initial = {}
   path, delay = dag.critical_path() 
   best = 2 * delay
   best_schedule = None 
+  best_seed = None
   index = 0 
 
   nodes = dag.number_of_nodes() 
+  sdag = SieveDAG(input_spec, dag)
+  stats = {'pruned': 0, 'failed': 0}
   print ('Looking for greedy feasible solution for %d seconds' % time_limit)
  
   while curr_time - star_time < time_limit:
-      schedule = index_dag_sieve(input_spec, dag, index%nodes, 2*delay, period_duration)
+      # only a latency below best is kept, prune trials that cannot get there
+      trial_seed = seed * TRIAL_STRIDE + index
+      schedule = index_dag_sieve(input_spec, dag, index%nodes, 2*delay, period_duration, sdag,\
+                                 rng=random.Random(trial_seed), cutoff=best, stats=stats)
       index += 1
       if schedule != None:
           max_val = max([k[1] for k in schedule])
@@ -383,25 +307,177 @@ def rnd_sieve(input_spec, dag, time_limit, period_duration):
           if max_val - min_val < best:
               best = max_val - min_val
               best_schedule = schedule
+              best_seed = trial_seed
               print ('Found Feasible Solution With Latency', best)
               
       curr_time = tm.time()
+  print ('Sieve trials: %d, pruned %d, failed %d' % (index, stats['pruned'], stats['failed']))
   if (best_schedule == None):
     return None
+  print ('Sieve seed %d' % best_seed)
+  return normalize_schedule(best_schedule, best_seed)
+
+def replay_sieve(input_spec, dag, period_duration, seed):
+  """ Runs again the sieve trial with the given trial seed
+
+  Returns
+  -------
+  greedy_initial : SeededSchedule
+      The schedule that rnd_sieve or parallel_rnd_sieve returned with this
+      seed (on the same DAG, hardware and Python version), None if the
+      trial fails
+  """
+  path, delay = dag.critical_path()
+  trial = seed % TRIAL_STRIDE
+  schedule = index_dag_sieve(input_spec, dag, trial % dag.number_of_nodes(), 2*delay, period_duration,\
+                             rng=random.Random(seed))
+  if schedule is None:
+    return None
+  return normalize_schedule(schedule, seed)
+
+def _sieve_trials(conn, input_spec, dag, sdag, period_duration, bound, seed, first, step,\
+                  deadline, max_trials, best, stop = None, known_best = None):
+  """ Runs trials first, first + step, ... until the deadline, max_trials
+  or stop
+
+  Trial k starts at index k % nodes with its own random.Random, seeded
+  from the master seed and k. Its result only matters if it beats the
+  shared best (latency, trial) pair, so it is abandoned as soon as its
+  partial schedule shows it cannot, or the latency in known_best when
+  it is set. Sends back
+  (trials, stats, key, schedule) of the best trial this worker completed.
+  """
+  nodes = len(sdag.names)
+  best_key = None
+  best_schedule = None
+  trials = 0
+  stats = {'pruned': 0, 'failed': 0}
+  trial = first
+  while (tm.time() < deadline) and ((max_trials is None) or (trial < max_trials)) and\
+        ((stop is None) or not stop.is_set()):
+      (best_lat, best_trial) = divmod(best.value, TRIAL_STRIDE)
+      # ties go to the lower trial number
+      cutoff = best_lat if trial > best_trial else best_lat + 1
+      if (known_best is not None) and known_best.value:
+        cutoff = min(cutoff, known_best.value)
+      rng = random.Random(seed * TRIAL_STRIDE + trial)
+      schedule = index_dag_sieve(input_spec, dag, trial % nodes, bound, period_duration,\
+                                 sdag, rng=rng, cutoff=cutoff, stats=stats)
+      trials += 1
+      if schedule != None:
+          latency = max([k[1] for k in schedule]) - min([k[1] for k in schedule])
+          key = latency * TRIAL_STRIDE + trial
+          with best.get_lock():
+            if key < best.value:
+              best.value = key
+          if (best_key is None) or (key < best_key):
+            best_key = key
+            best_schedule = schedule
+      trial += step
 
-  min_val = min([k[1] for k in best_schedule])
-  for i in best_schedule:
-    greedy_initial[i[0]] = i[1] - min_val
-  return greedy_initial
+  result = (trials, stats, best_key, best_schedule)
+  if conn is None:
+    return result
+  conn.send(result)
+  conn.close()
+
+def parallel_rnd_sieve(input_spec, dag, time_limit, period_duration, processes = None,\
+                       seed = None, max_trials = None, stop = None, known_best = None):
+  """ Runs the randomized sieve on several processes
+
+  Parameters
+  ----------
+  input_spec : module
+      Input with the hardware limits filled in
+  dag : ScheduleDAG
+      The DAG
+  time_limit : float
+      Wall clock budget in seconds
+  period_duration : int
+      Period T
+  processes : int
+      Worker processes, all cores if None. The sieve runs in this
+      process when it is 1 or this process is itself a daemon
+      (e.g. a PeriodSweep probe), as daemons cannot have children.
+  seed : int
+      Master seed, trial k uses a generator seeded from (seed, k).
+      A random one if None
+  max_trials : int
+      Stop after trials 0 .. max_trials - 1. The result is then the best
+      of exactly those trials (lowest trial number among equal
+      latencies), the same for any number of processes.
+      With only a time limit, it is the best of the trials that were done.
+  stop : multiprocessing.Event
+      Ends the run early once set, e.g. when the seed portfolio is done
+  known_best : multiprocessing.Value
+      Latency of the best schedule found elsewhere, which the caller may
+      lower while the sieve runs, 0 for none. Trials that cannot beat it
+      are abandoned, so which trial wins depends on it too. The winner
+      still replays from its seed (replay_sieve).
+
+  Returns
+  -------
+  greedy_initial : SeededSchedule
+      Start time of every node, None if no trial succeeded.
+      Its seed is the seed of the winning trial.
+  """
+  if seed is None:
+    seed = new_seed()
+  if processes is None:
+    processes = multiprocessing.cpu_count()
+  if multiprocessing.current_process().daemon:
+    processes = 1
+
+  path, delay = dag.critical_path()
+  sdag = SieveDAG(input_spec, dag)
+  # accept latencies below 2 * delay, like rnd_sieve
+  best = multiprocessing.Value('l', int(2 * delay) * TRIAL_STRIDE - 1)
+  deadline = tm.time() + time_limit
+  print ('Looking for greedy feasible solution for %d seconds on %d processes' % (time_limit, processes))
+
+  if processes == 1:
+    results = [_sieve_trials(None, input_spec, dag, sdag, period_duration, 2*delay, seed, 0, 1,\
+                             deadline, max_trials, best, stop, known_best)]
+  else:
+    workers = []
+    for i in range(processes):
+      (parent_conn, child_conn) = multiprocessing.Pipe(False)
+      proc = multiprocessing.Process(target = _sieve_trials,\
+                                     args = (child_conn, input_spec, dag, sdag, period_duration, 2*delay,\
+                                             seed, i, processes, deadline, max_trials, best, stop, known_best))
+      proc.daemon = True
+      proc.start()
+      child_conn.close()
+      workers.append((proc, parent_conn))
+    results = []
+    for (proc, conn) in workers:
+      try:
+        results.append(conn.recv())
+      except EOFError:
+        print ('Sieve worker %d died' % proc.pid)
+      proc.join()
+
+  trials = sum(r[0] for r in results)
+  print ('Sieve trials: %d, pruned %d, failed %d' % (trials, sum(r[1]['pruned'] for r in results),\
+                                                    sum(r[1]['failed'] for r in results)))
+  found = [r for r in results if r[2] is not None]
+  if not found:
+    print ('No feasible solution in %d trials' % trials)
+    return None
+  (_, _, key, best_schedule) = min(found, key=lambda r: r[2])
+  (latency, trial) = divmod(key, TRIAL_STRIDE)
+  print ('Found Feasible Solution With Latency %d in trial %d of %d' % (latency, trial, trials))
+  print ('Sieve seed %d' % (seed * TRIAL_STRIDE + trial))
+  return normalize_schedule(best_schedule, seed * TRIAL_STRIDE + trial)
 
 RND_SIEVE_TIME = 200
 
 if __name__ == "__main__":
   # Cmd line args
-  if (len(sys.argv) != 5):
-    print ("Usage: ", sys.argv[0], " <DAG file> <HW file> <latency file> <P>")
+  if (len(sys.argv) not in (5, 6)):
+    print ("Usage: ", sys.argv[0], " <DAG file> <HW file> <latency file> <P> [trial seed to replay]")
     exit(1)
-  elif (len(sys.argv) == 5):
+  else:
     input_file   = sys.argv[1]
     hw_file   = sys.argv[2]
     latency_file = sys.argv[3]
@@ -409,7 +485,7 @@ if __name__ == "__main__":
   original_stdout = sys.stdout
     #sys.stdout = f
 
-  input_spec = importlib.import_module(input_file, "*")
+  input_spec = load_input_spec(input_file)
   hw_spec    = importlib.import_module(hw_file, "*")
   latency_spec=importlib.import_module(latency_file, "*")
   input_spec.action_fields_limit = hw_spec.action_fields_limit
@@ -424,6 +500,9 @@ if __name__ == "__main__":
   nx.DiGraph.nodes(G)
   G.nodes()
   G.create_dag(input_spec.nodes, input_spec.edges, latency_spec)
-  rnd_sch = rnd_sieve(input_spec, G, RND_SIEVE_TIME, P)
+  if (len(sys.argv) == 6):
+    rnd_sch = replay_sieve(input_spec, G, P, int(sys.argv[5]))
+  else:
+    rnd_sch = rnd_sieve(input_spec, G, RND_SIEVE_TIME, P)
   cpath, cplat = G.critical_path()
   print(rnd_sch)
\ No newline at end of file
@@ -0,0 +1,109 @@
+import json
+import os
+import sys
+import time
+
+# JSONL file every entry point appends its result record to. run_batch
+# points it into the result folder of the batch.
+RESULTS_PATH = os.environ.get('DRMT_RESULTS', os.path.join('results', 'records.jsonl'))
+
+# Usage per slot (ring slot for dRMT, time slot for pRMT) in a record
+USAGES = ('match_key', 'match_units', 'action_fields', 'match_proc', 'action_proc')
+
+def problem_record(solver, program, hw_file, latency_file, dag, input_spec, latency_spec):
+  """ The fields that name a run: solver, program, hardware and latency
+  files with their values, and the size of the DAG """
+  record = {'solver': solver,\
+            'program': program,\
+            'hw': hw_file,\
+            'latency': latency_file,\
+            'limits': dict((name, getattr(input_spec, name)) for name in\
+                           ('match_unit_limit', 'match_unit_size', 'action_fields_limit',\
+                            'match_proc_limit', 'action_proc_limit')),\
+            'latencies': dict((name, getattr(latency_spec, name)) for name in ('dM', 'dA', 'dS')\
+                              if hasattr(latency_spec, name)),\
+            'nodes': dag.number_of_nodes(),\
+            'edges': dag.number_of_edges(),\
+            'critical_path': dag.critical_path()[1]}
+  # Set by run_batch, links the record to the job record
+  if os.environ.get('DRMT_JOB'):
+    record['job'] = os.environ['DRMT_JOB']
+  return record
+
+def solution_record(solution):
+  """ The fields of a Solution: schedule length, MIP gap, seed, times and
+  the usage in every slot as a list """
+  record = {'length': solution.length,\
+            'gap': solution.gap,\
+            'seed': solution.seed,\
+            'seed_value': getattr(solution, 'seed_value', None),\
+            'solve_time': getattr(solution, 'time', None),\
+            'build_time': getattr(solution, 'build_time', None),\
+            'build_memory': getattr(solution, 'build_memory', None),\
+            'usage': dict()}
+  for name in USAGES:
+    usage = getattr(solution, name + '_usage')
+    if usage:
+      record['usage'][name] = [int(usage.get(r, 0)) for r in range(max(usage) + 1)]
+  return record
+
+def output_path(name):
+  """ Path of the output file name of a run, in the folder of the result
+  records: results/ by default, the result folder under run_batch """
+  directory = os.path.dirname(RESULTS_PATH)
+  if directory and not os.path.isdir(directory):
+    os.makedirs(directory)
+  return os.path.join(directory, name)
+
+def emit(record, path = None):
+  """ Appends a record, with the date, as one line of JSON """
+  path = path or RESULTS_PATH
+  directory = os.path.dirname(path)
+  if directory and not os.path.isdir(directory):
+    os.makedirs(directory)
+  record = dict(record, date = time.strftime('%Y-%m-%d %H:%M:%S'))
+  with open(path, 'a') as f:
+    f.write(json.dumps(record, sort_keys = True) + '\n')
+    f.flush()
+    os.fsync(f.fileno())
+
+def load(path = None, **fields):
+  """ Records whose fields have the given values, in the order written.
+  Lines cut short by a crash are skipped. """
+  records = []
+  with open(path or RESULTS_PATH) as f:
+    for line in f:
+      try:
+        record = json.loads(line)
+      except ValueError:
+        continue
+      if all(record.get(key) == value for (key, value) in fields.items()):
+        records.append(record)
+  return records
+
+def latest(records, keys):
+  """ The last record of every combination of the key fields, by the
+  tuple of their values """
+  result = dict()
+  for record in records:
+    result[tuple(record.get(key) for key in keys)] = record
+  return result
+
+def _show(value, fmt):
+  return '-' if value is None else fmt % value
+
+if __name__ == "__main__":
+  # Prints the latest record of every run
+  path = sys.argv[1] if len(sys.argv) > 1 else RESULTS_PATH
+  if not os.path.exists(path):
+    print ("No result records in", path)
+    exit(0)
+  print ('%-12s %-24s %-14s %-22s %6s %6s %8s %10s  %s' %\
+         ('solver', 'program', 'hw', 'latency', 'period', 'length', 'gap', 'time (s)', 'date'))
+  runs = latest(load(path), ('solver', 'program', 'hw', 'latency'))
+  for key in sorted(runs, key = lambda key: tuple(str(k) for k in key)):
+    record = runs[key]
+    total = record.get('timings', {}).get('total')
+    print ('%-12s %-24s %-14s %-22s %6s %6s %8s %10s  %s' % (record['solver'], record['program'], record['hw'],\
+           record['latency'], _show(record.get('period'), '%d'), _show(record.get('length'), '%d'),\
+           _show(record.get('gap'), '%.4f'), _show(total, '%.1f'), record['date']))
@@ -0,0 +1,221 @@
+import importlib
+import itertools
+import json
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import time
+
+# Keys of a matrix block whose values are crossed, every combination is a job
+AXES = ('program', 'hw', 'latency', 'solver')
+
+# Settings of a job that its block does not give
+DEFAULTS = {'minutes': 10, 'model': 2, 'period': 32, 'threads': 4}
+
+# Result store in the result folder, one JSON record per finished job
+RESULTS = 'results.jsonl'
+
+# Result records of the solvers (see result_store), in the result folder
+RECORDS = 'records.jsonl'
+
+# Command line (script and arguments) of every solver
+SOLVERS = {
+  'drmt': lambda job: ['drmt.py', job['program'], job['hw'], job['latency'],\
+                       str(job['minutes']), str(job['model']), str(job['period'])],
+  'prmt_fine': lambda job: ['prmt.py', job['program'], job['hw'], job['latency'], 'fine'],
+  'prmt_coarse': lambda job: ['prmt.py', job['program'], job['hw'], job['latency'], 'coarse'],
+  'compare_ilps': lambda job: ['compare_ilps.py', job['program'], job['hw'], job['latency'], str(job['minutes'])],
+}
+
+def expand(matrix, cpus):
+  """ Jobs of a matrix, in matrix order
+
+  Parameters
+  ----------
+  matrix : list
+      Blocks, see experiment_matrix.py
+  cpus : int
+      Cores of the batch, no job takes more
+
+  Returns
+  -------
+  jobs : list
+      One dict per job: the block settings, one value per axis, the
+      command line and a name that is unique within the matrix
+  """
+  jobs = []
+  for block in matrix:
+    axes = [block[axis] if isinstance(block[axis], list) else [block[axis]] for axis in AXES]
+    for values in itertools.product(*axes):
+      job = dict(DEFAULTS)
+      job.update(block)
+      job.update(zip(AXES, values))
+      if job['solver'] not in SOLVERS:
+        raise ValueError('Unknown solver %s, expected one of %s' % (job['solver'], ', '.join(sorted(SOLVERS))))
+      job['threads'] = max(1, min(job['threads'], cpus))
+      job['command'] = SOLVERS[job['solver']](job)
+      job['name'] = '_'.join([os.path.splitext(job['command'][0])[0]] + job['command'][1:]).replace(os.sep, '-')
+      jobs.append(job)
+  return jobs
+
+def finished(path, retry_failed):
+  """ Names of the jobs with a record in the result store, except the
+  failed ones if retry_failed. A last line cut short by a crash is
+  ignored, that job runs again. """
+  names = set()
+  if not os.path.exists(path):
+    return names
+  with open(path) as f:
+    for line in f:
+      try:
+        record = json.loads(line)
+      except ValueError:
+        continue
+      if (record['status'] == 'ok') or not retry_failed:
+        names.add(record['job'])
+  return names
+
+def run(matrix, folder, cpus = None, max_jobs = None, retry_failed = False, python = sys.executable, trace = False,\
+        cache = False):
+  """ Runs the jobs of a matrix that have no result yet
+
+  Jobs start in matrix order as long as their threads fit into cpus and
+  fewer than max_jobs run. Every job gets DRMT_THREADS (and the usual
+  BLAS thread variables) set to its threads, writes its output to
+  <folder>/<job name>.txt, and appends a record to <folder>/results.jsonl
+  when it ends. The solvers append their result records, with the job
+  name, to <folder>/records.jsonl, and drmt.py its output next to them.
+  The jobs solve from scratch (DRMT_CACHE=0, DRMT_MEMO=0), unless cache:
+  then they share the schedule cache and the feasibility memo. With
+  trace, every job also writes its spans to
+  <folder>/<job name>.trace.json (see tracing). Running the same
+  matrix again after a crash or an interrupt only runs the jobs without a
+  record.
+
+  Returns
+  -------
+  records : list
+      Records of the jobs run now
+  """
+  cpus = cpus or multiprocessing.cpu_count()
+  max_jobs = max_jobs or cpus
+  if not os.path.isdir(folder):
+    os.makedirs(folder)
+  store = os.path.join(folder, RESULTS)
+  jobs = expand(matrix, cpus)
+  done = finished(store, retry_failed)
+  pending = [job for job in jobs if job['name'] not in done]
+  print ('%d jobs, %d already done, %d to run on %d cores' % (len(jobs), len(jobs) - len(pending), len(pending), cpus))
+
+  here = os.path.dirname(os.path.abspath(__file__))
+  running = dict() # pid -> (job, process, log file, start time)
+  records = []
+  used = 0
+  try:
+    while pending or running:
+      # The next job in order starts once its threads are free
+      while pending and (len(running) < max_jobs) and (used + pending[0]['threads'] <= cpus):
+        job = pending.pop(0)
+        threads = str(job['threads'])
+        env = dict(os.environ, DRMT_THREADS = threads, OMP_NUM_THREADS = threads,\
+                   OPENBLAS_NUM_THREADS = threads, MKL_NUM_THREADS = threads,\
+                   DRMT_RESULTS = os.path.abspath(os.path.join(folder, RECORDS)), DRMT_JOB = job['name'])
+        if not cache:
+          env.update(DRMT_CACHE = '0', DRMT_MEMO = '0')
+        if trace:
+          env['DRMT_TRACE'] = os.path.abspath(os.path.join(folder, job['name'] + '.trace.json'))
+        log = open(os.path.join(folder, job['name'] + '.txt'), 'w')
+        # In a process group of its own, with the probes it starts
+        process = subprocess.Popen([python, '-u'] + job['command'], cwd = here, env = env,\
+                                   stdout = log, stderr = subprocess.STDOUT, preexec_fn = os.setsid)
+        running[process.pid] = (job, process, log, time.time())
+        used += job['threads']
+        print ('start %s (%d threads)' % (job['name'], job['threads']))
+
+      # Wait for any job to end, with its CPU time and memory
+      (pid, status, usage) = os.wait4(-1, 0)
+      if pid not in running:
+        continue
+      (job, process, log, start) = running.pop(pid)
+      process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+      log.close()
+      used -= job['threads']
+      record = _record(job, process.returncode, start, usage, log.name)
+      _append(store, record)
+      records.append(record)
+      print ('%-6s %s  %.1f s' % (record['status'], job['name'], record['wall']))
+  except KeyboardInterrupt:
+    # The interrupted jobs get no record, so they run again next time
+    for (job, process, log, start) in running.values():
+      os.killpg(process.pid, signal.SIGTERM)
+    for (job, process, log, start) in running.values():
+      process.wait()
+      log.close()
+    raise
+  return records
+
+def _record(job, returncode, start, usage, log):
+  # kilobytes on Linux, bytes on macOS
+  rss = usage.ru_maxrss / (1024.0 * 1024.0 if sys.platform == 'darwin' else 1024.0)
+  record = dict((key, job[key]) for key in job if key not in ('name', 'command'))
+  record.update({'job': job['name'],\
+                 'command': job['command'],\
+                 'status': 'ok' if returncode == 0 else 'failed',\
+                 'returncode': returncode,\
+                 'log': log,\
+                 'date': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start)),\
+                 'wall': round(time.time() - start, 3),\
+                 'user': round(usage.ru_utime, 3),\
+                 'sys': round(usage.ru_stime, 3),\
+                 'max_rss_mb': round(rss, 1)})
+  return record
+
+def _append(path, record):
+  # One line per record, on disk before the next job is reported
+  with open(path, 'a') as f:
+    f.write(json.dumps(record, sort_keys = True) + '\n')
+    f.flush()
+    os.fsync(f.fileno())
+
+def load_matrix(name):
+  """ The matrix <module>[:<attribute>], attribute matrix by default """
+  (module, _, attribute) = name.partition(':')
+  return getattr(importlib.import_module(module), attribute or 'matrix')
+
+def print_records(records):
+  print ('{:*^80}'.format(' Batch results '))
+  print ('%-6s %4s %10s %10s %10s  %s' % ('status', 'thr', 'wall (s)', 'cpu (s)', 'rss (MB)', 'job'))
+  for record in records:
+    print ('%-6s %4d %10.1f %10.1f %10.1f  %s' % (record['status'], record['threads'], record['wall'],\
+           record['user'] + record['sys'], record['max_rss_mb'], record['job']))
+
+if __name__ == "__main__":
+  # Cmd line args
+  args = sys.argv[1:]
+  options = {'-c': None, '-j': None, '--python': sys.executable}
+  for option in ('-c', '-j', '--python'):
+    if option in args:
+      i = args.index(option)
+      options[option] = args[i + 1]
+      args = args[:i] + args[i + 2:]
+  retry_failed = '--retry-failed' in args
+  trace = '--trace' in args
+  cache = '--cache' in args
+  args = [arg for arg in args if arg not in ('--retry-failed', '--trace', '--cache')]
+  if (len(args) != 2):
+    print ("Usage: ", sys.argv[0], " <matrix module>[:<name>] <result folder> [-c <cores>] [-j <max jobs>]")
+    print ("       [--retry-failed] [--python <interpreter>] [--trace] [--cache]")
+    print ("Runs every job of the matrix (see experiment_matrix.py) without a record in")
+    print ("<result folder>/results.jsonl, as many at a time as their threads fit into the cores")
+    exit(1)
+  try:
+    records = run(load_matrix(args[0]), args[1],\
+                  cpus = int(options['-c']) if options['-c'] else None,\
+                  max_jobs = int(options['-j']) if options['-j'] else None,\
+                  retry_failed = retry_failed, python = options['--python'], trace = trace, cache = cache)
+  except KeyboardInterrupt:
+    print ("Interrupted, run again to continue with the unfinished jobs")
+    exit(130)
+  print_records(records)
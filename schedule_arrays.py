@@ -0,0 +1,96 @@
+import numpy as np
+
+class ScheduleArrays:
+    """ Compact array view of the per-node resource costs of a DAG
+
+    Nodes get an index (their position in dag.nodes(), the node ids of
+    dag.freeze()), and the costs that the usage loops used to recompute per
+    node live in NumPy arrays:
+      match_key     : key width of match (and table) nodes, 0 otherwise
+      match_units   : ceil(key_width / match_unit_size)
+      action_fields : num_fields of action (and table) nodes, 0 otherwise
+    A schedule is then a vector of start times in that index order,
+    or a (candidates x nodes) matrix of many schedules at once.
+    """
+    def __init__(self, dag, input_spec):
+        frozen = dag.freeze()
+        self.names = frozen.names
+        self.index = frozen.index
+        self.is_match = np.zeros(len(self.names), dtype=bool)
+        self.is_match[frozen.node_indices('match')] = True
+        self.is_action = np.zeros(len(self.names), dtype=bool)
+        self.is_action[frozen.node_indices('action')] = True
+        self.match_key = frozen.key_width
+        # Integer ceil(key_width / match_unit_size)
+        self.match_units = -(-self.match_key // input_spec.match_unit_size)
+        self.action_fields = frozen.num_fields
+
+    def times(self, time_of_op):
+        """ Returns the time-of-op dict as a vector in node index order """
+        return np.array([time_of_op[v] for v in self.names], dtype=np.int64)
+
+    def usage(self, times, length):
+        """ Returns match units and action fields used at every time slot
+        of a (non periodic) schedule of the given length
+
+        Returns
+        -------
+        match_units : np.array
+            Match units per time slot
+        action_fields : np.array
+            Action fields per time slot
+        """
+        match_units = np.bincount(times, weights=self.match_units, minlength=length).astype(np.int64)
+        action_fields = np.bincount(times, weights=self.action_fields, minlength=length).astype(np.int64)
+        return match_units, action_fields
+
+    def periodic_usage(self, times, period_duration):
+        """ Returns the resource usage in every slot of the ring
+
+        Parameters
+        ----------
+        times : np.array
+            Start times, shape (nodes,) or (candidates, nodes)
+        period_duration : int
+            Period T
+
+        Returns
+        -------
+        usage : dict
+            'match_key', 'match_units', 'action_fields', 'match_proc' and
+            'action_proc' arrays of shape (T,) or (candidates, T).
+            The proc entries count distinct packets per slot.
+        """
+        T = period_duration
+        times = np.asarray(times, dtype=np.int64)
+        single = (times.ndim == 1)
+        times = np.atleast_2d(times)
+        candidates = times.shape[0]
+
+        quotient = times // T
+        # Slot of every node, numbered across candidates
+        slot = (times % T) + T * np.arange(candidates)[:, np.newaxis]
+        size = candidates * T
+
+        usage = dict()
+        for (name, weights) in (('match_key', self.match_key),\
+                                ('match_units', self.match_units),\
+                                ('action_fields', self.action_fields)):
+          usage[name] = np.bincount(slot.ravel(), weights=np.tile(weights, candidates),\
+                                    minlength=size).astype(np.int64).reshape(candidates, T)
+
+        # Distinct (slot, packet) pairs, then pairs per slot
+        packets = int(quotient.max()) + 1 if quotient.size else 1
+        for (name, select) in (('match_proc', self.is_match), ('action_proc', self.is_action)):
+          pairs = np.unique(slot[:, select] * packets + quotient[:, select])
+          usage[name] = np.bincount(pairs // packets, minlength=size).astype(np.int64).reshape(candidates, T)
+
+        if single:
+          for name in usage:
+            usage[name] = usage[name][0]
+        return usage
+
+def usage_dict(array):
+    """ Converts a per-slot usage array into the {slot: usage} dict
+    that Solution and the printers use """
+    return dict(enumerate(int(x) for x in array))
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import os
+import sys
+import time
+
+# Set DRMT_CACHE=0 to solve every problem from scratch
+CACHE_ENABLED = (os.environ.get('DRMT_CACHE', '1') == '1')
+
+# Directory of the cache files, relative to the working directory
+CACHE_DIR = os.environ.get('DRMT_CACHE_DIR', '.schedule_cache')
+
+# Bytes the cache files may take before the least recently used ones go
+CACHE_SIZE = int(os.environ.get('DRMT_CACHE_SIZE', 64 * 1024 * 1024))
+
+HW_LIMITS = ('match_unit_limit', 'match_unit_size', 'action_fields_limit', 'match_proc_limit', 'action_proc_limit')
+LATENCIES = ('dM', 'dA', 'dS')
+
+def fingerprint(dag, input_spec, latency_spec, period, solver):
+  """ Hash of one scheduling problem
+
+  Parameters
+  ----------
+  dag : ScheduleDAG
+      The DAG, with node attributes and edge delays
+  input_spec : module
+      Input with the hardware limits filled in
+  latency_spec : module
+      Latencies the delays come from
+  period : int
+      Period of a dRMT schedule, None for PRMT
+  solver : string
+      Problem the schedule solves: 'drmt', 'prmt_fine' or 'prmt_coarse'
+
+  Returns
+  -------
+  key : string
+      Hex digest, the same for the same problem in any run
+  """
+  problem = _dag_problem(dag)
+  problem.update({'solver': solver,\
+                  'period': period,\
+                  'hw': [getattr(input_spec, name) for name in HW_LIMITS],\
+                  'latency': [getattr(latency_spec, name, None) for name in LATENCIES]})
+  return _digest(problem)
+
+def dag_fingerprint(dag):
+  """ Hash of the DAG alone: nodes with their attributes, edges with their delays """
+  return _digest(_dag_problem(dag))
+
+def _dag_problem(dag):
+  return {'nodes': sorted([str(v), sorted([str(k), d[k]] for k in d)] for (v, d) in dag.nodes(data=True)),\
+          'edges': sorted([str(u), str(v), d['delay']] for (u, v, d) in dag.edges(data=True))}
+
+def _digest(problem):
+  return hashlib.sha1(json.dumps(problem, sort_keys=True).encode('utf-8')).hexdigest()
+
+class ScheduleCache:
+    """ Best known schedules and infeasibility proofs on disk
+
+    One JSON file per fingerprint holds
+      status     : 'feasible' or 'infeasible' (proven by the solver for
+                   schedules up to provenance['horizon'] cycles long)
+      schedule   : start time of every node, None if infeasible
+      length     : schedule length
+      gap        : optimality gap, 0.0 if proven optimal, None if unknown
+      provenance : who found the schedule, with which settings and when
+    Every lookup marks an entry as used. When the files take more than
+    max_bytes, the least recently used ones are removed.
+    """
+    def __init__(self, directory = CACHE_DIR, max_bytes = CACHE_SIZE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def lookup(self, key):
+        """ Returns the entry of the fingerprint, None if there is none """
+        entry = self._read(key)
+        if entry is not None:
+          try:
+            os.utime(self._path(key), None)
+          except OSError:
+            pass
+        return entry
+
+    def store(self, key, status, schedule = None, gap = None, provenance = None):
+        """ Records a solver outcome, unless the cache already knows better
+
+        Feasibility, once known, is final. Infeasibility gives way to a
+        schedule, or to a proof over a longer horizon. Otherwise the
+        shorter schedule is kept, and the smaller gap for the same length.
+
+        Returns
+        -------
+        stored : bool
+            True if the entry was written
+        """
+        old = self._read(key)
+        entry = {'status': status,\
+                 'schedule': schedule,\
+                 'length': (max(schedule.values()) + 1) if schedule else None,\
+                 'gap': gap,\
+                 'provenance': dict(provenance or {}, date = time.strftime('%Y-%m-%d %H:%M:%S'))}
+        if (old is not None) and not _better(entry, old):
+          return False
+        if not os.path.isdir(self.directory):
+          os.makedirs(self.directory)
+        # Written next to the entry and renamed, so readers never see half a file
+        tmp = '%s.%d.tmp' % (self._path(key), os.getpid())
+        with open(tmp, 'w') as f:
+          json.dump(entry, f, sort_keys=True)
+        os.rename(tmp, self._path(key))
+        self.evict()
+        return True
+
+    def evict(self):
+        """ Removes the least recently used entries until the rest fits in max_bytes """
+        try:
+          names = [name for name in os.listdir(self.directory) if name.endswith('.json')]
+        except OSError:
+          return
+        files = []
+        for name in names:
+          try:
+            stat = os.stat(os.path.join(self.directory, name))
+          except OSError:
+            continue
+          files.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for (mtime, size, name) in files)
+        for (mtime, size, name) in sorted(files):
+          if total <= self.max_bytes:
+            break
+          try:
+            os.remove(os.path.join(self.directory, name))
+          except OSError:
+            pass
+          total -= size
+
+    def _read(self, key):
+        try:
+          with open(self._path(key)) as f:
+            return json.load(f)
+        except (IOError, OSError, ValueError):
+          return None
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+def _better(new, old):
+  # A schedule settles feasibility for good, infeasibility only up to the
+  # horizon of its proof
+  if old['status'] == 'infeasible':
+    return (new['status'] == 'feasible') or (_horizon(new) > _horizon(old))
+  if new['status'] == 'infeasible':
+    return False
+  if new['length'] != old['length']:
+    return new['length'] < old['length']
+  if new['gap'] is None:
+    return False
+  return (old['gap'] is None) or (new['gap'] < old['gap'])
+
+def _horizon(entry):
+  return (entry['provenance'] or {}).get('horizon') or 0
+
+def default_cache():
+  """ The cache the solvers use, None when DRMT_CACHE=0 """
+  if not CACHE_ENABLED:
+    return None
+  return ScheduleCache()
+
+if __name__ == "__main__":
+  # Lists the cache, most recently used first
+  cache = ScheduleCache(sys.argv[1] if len(sys.argv) > 1 else CACHE_DIR)
+  if not os.path.isdir(cache.directory):
+    print ("No schedule cache in", cache.directory)
+    exit(0)
+  entries = []
+  for name in os.listdir(cache.directory):
+    if name.endswith('.json'):
+      entries.append((os.stat(os.path.join(cache.directory, name)).st_mtime, name[:-len('.json')]))
+  print ('%-12s %-11s %6s %8s  %s' % ('fingerprint', 'status', 'length', 'gap', 'provenance'))
+  for (mtime, key) in sorted(entries, reverse = True):
+    entry = cache._read(key)
+    if entry is None:
+      continue
+    provenance = ', '.join('%s=%s' % (k, entry['provenance'][k]) for k in sorted(entry['provenance']))
+    print ('%-12s %-11s %6s %8s  %s' % (key[:12], entry['status'],\
+           '-' if entry['length'] is None else entry['length'],\
+           '-' if entry['gap'] is None else '%.4f' % entry['gap'], provenance))
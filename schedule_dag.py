@@ -1,14 +1,32 @@
 import networkx as nx
+import numpy as np
 import math
+from schedule_arrays import ScheduleArrays
 
 # For now, assume conditions cost 1 action field
 CONDITION_COST = 1
 
 # A DAG to represent fine-grained match-action scheduling constraints in dRMT and pRMT
+#
+# Derived properties (node lists, topological order, critical path, head
+# and tail delays, resource arrays) are computed once and cached. Adding or
+# removing nodes or edges drops the cache, changing attributes in place
+# (G.node[v][...] = ...) needs an explicit invalidate_caches(). They are
+# all computed on freeze(), the array-backed FrozenScheduleDAG below.
 class ScheduleDAG(nx.DiGraph):
     def __init__(self):
+        self._cache = dict()
         nx.DiGraph.__init__(self)
 
+    def invalidate_caches(self):
+        """ Drops every cached property, they are recomputed on the next query """
+        self._cache.clear()
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
     def create_dag(self, nodes, edges, latency_spec):
         """ Returns a DAG of match/action nodes
 
@@ -74,6 +92,13 @@ class ScheduleDAG(nx.DiGraph):
               print ("Unexpected dependency type: ", dep_type)
               assert(False)
 
+        # The attributes were set in place
+        self.invalidate_caches()
+
+    def freeze(self):
+        """ Returns the FrozenScheduleDAG of the graph, the same one until the graph changes """
+        return self._cached('frozen', lambda: FrozenScheduleDAG(self))
+
     def critical_path(self):
         """Returns the critical (longest) path in the DAG, and its latency
 
@@ -90,22 +115,43 @@ class ScheduleDAG(nx.DiGraph):
             Latency of longest path
 
         """
-        dist = {}  # stores [distance, node] pair.
-        # distance is distance from root and node is predecessor on path from root
-        for node in nx.topological_sort(self):
-            # pairs of dist,node for all incoming edges
-            pairs = [(dist[v][0] + self[v][u]['delay'], v) for v,u in self.in_edges(node)]
-            if pairs:
-                dist[node] = max(pairs)
-            else:
-                dist[node] = (0, node)
-        node, (length, _) = max(dist.items(), key=lambda x: x[1])
-        latency = length + 1 # one extra cycle for final operation
-        path = []
-        while length > 0:
-            path.append(node)
-            length, node = dist[node]
-        return list(reversed(path)), latency
+        return self.freeze().critical_path()
+
+    def topological_order(self):
+        """ Returns the nodes in a topological order, the same one every time """
+        return self.freeze().topological_order()
+
+    def head_and_tail(self):
+        """ Longest delay on a path ending (head) and starting (tail) at every node
+
+        Returns
+        -------
+        head : dict
+            ASAP start time of every node
+        tail : dict
+            Longest delay from every node to a sink, the ALAP start time
+            is the schedule length minus this
+        """
+        return self.freeze().head_and_tail()
+
+    def asap(self):
+        """ Earliest start time of every node """
+        return self.head_and_tail()[0]
+
+    def alap(self, horizon):
+        """ Latest start time of every node when all start within [0, horizon] """
+        tail = self.head_and_tail()[1]
+        return dict((v, horizon - tail[v]) for v in tail)
+
+    def node_indices(self, select):
+        """ Returns the positions in nodes() of the select ('match' or
+        'action') nodes as an array """
+        return self.freeze().node_indices(select)
+
+    def resource_arrays(self, input_spec):
+        """ Returns the ScheduleArrays of the node costs under the hardware
+        spec, shared by every caller with the same match_unit_size """
+        return self.freeze().resource_arrays(input_spec)
 
     def nodes(self, data=False, select='*'):
         """Returns list of nodes with optional data values and selection filter
@@ -124,6 +170,11 @@ class ScheduleDAG(nx.DiGraph):
             List of nodes
 
         """
+        if data is False:
+            return list(self._cached(('nodes', select), lambda: self._nodes(False, select)))
+        return self._nodes(data, select)
+
+    def _nodes(self, data, select):
         nodelist = []
         for (u, d) in nx.DiGraph.nodes(self, data=True):
             if (select == '*') or (d['type'] == select):
@@ -132,3 +183,227 @@ class ScheduleDAG(nx.DiGraph):
                 else:
                     nodelist.append((u,d))
         return nodelist
+
+# Node type codes of FrozenScheduleDAG.types, 'table' nodes come from fine_to_coarse
+NODE_TYPES = ('match', 'action', 'table')
+MATCH = 0
+ACTION = 1
+TABLE = 2
+
+# Immutable, array-backed copy of a ScheduleDAG for the solver hot paths
+#
+# Nodes are the integers 0 .. n - 1, in the order of ScheduleDAG.nodes(), and
+# names / index map them to and from the original labels. Per node there
+# are NumPy arrays of the type code, key_width and num_fields (0 where the
+# node has none) and the condition flag. Edges are in CSR form both ways:
+# the predecessors of v are pred_idx[pred_ptr[v]:pred_ptr[v + 1]], with
+# delays in pred_delay at the same positions, and the same for successors.
+# The CSR arrays are plain lists, element by element they are much faster
+# to index than NumPy arrays.
+#
+# The read-only queries of ScheduleDAG work the same by label, so code
+# that only reads the graph takes either form. thaw() gives a ScheduleDAG
+# back for code that needs networkx.
+class FrozenScheduleDAG(object):
+    __slots__ = ('names', 'index', 'types', 'key_width', 'num_fields', 'condition',\
+                 'pred_ptr', 'pred_idx', 'pred_delay', 'succ_ptr', 'succ_idx', 'succ_delay',\
+                 'order', '_cache')
+
+    def __init__(self, dag):
+        self.names = list(nx.DiGraph.nodes(dag))
+        self.index = dict((v, i) for (i, v) in enumerate(self.names))
+        attrs = [dag.node[v] for v in self.names]
+        self.types = np.array([NODE_TYPES.index(d['type']) for d in attrs], dtype=np.int8)
+        self.key_width = np.array([d.get('key_width', 0) for d in attrs], dtype=np.int64)
+        self.num_fields = np.array([d.get('num_fields', 0) for d in attrs], dtype=np.int64)
+        self.condition = np.array([d.get('condition', False) for d in attrs], dtype=bool)
+        (self.pred_ptr, self.pred_idx, self.pred_delay) = self._csr(dag, dag.predecessors, lambda v, u: (u, v))
+        (self.succ_ptr, self.succ_idx, self.succ_delay) = self._csr(dag, dag.successors, lambda v, w: (v, w))
+        self.order = [self.index[v] for v in nx.topological_sort(dag)]
+        self._cache = dict()
+
+    def _csr(self, dag, neighbors, edge):
+        ptr = [0]
+        idx = []
+        delay = []
+        for v in self.names:
+            for u in neighbors(v):
+                (a, b) = edge(v, u)
+                idx.append(self.index[u])
+                delay.append(dag.edge[a][b]['delay'])
+            ptr.append(len(idx))
+        return ptr, idx, delay
+
+    def _cached(self, key, compute):
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    def freeze(self):
+        return self
+
+    def thaw(self):
+        """ Returns a new ScheduleDAG with the same nodes, types, costs and delays """
+        G = ScheduleDAG()
+        for (v, d) in self.nodes(data=True):
+            G.add_node(v, d)
+        for (u, v, d) in self.edges(data=True):
+            G.add_edge(u, v, d)
+        return G
+
+    @property
+    def node(self):
+        """ Attribute dicts by label, as ScheduleDAG.node (built on first use, read only) """
+        return self._cached('node', lambda: dict((self.names[v], self.attributes(v)) for v in range(len(self.names))))
+
+    @property
+    def edge(self):
+        """ {u: {v: {'delay': delay}}}, as ScheduleDAG.edge (built on first use, read only) """
+        return self._cached('edge', lambda: dict((self.names[u], dict((self.names[self.succ_idx[k]], {'delay': self.succ_delay[k]})\
+                                                                     for k in range(self.succ_ptr[u], self.succ_ptr[u + 1])))\
+                                                 for u in range(len(self.names))))
+
+    def number_of_nodes(self):
+        return len(self.names)
+
+    def number_of_edges(self):
+        return len(self.succ_idx)
+
+    def nodes(self, data=False, select='*'):
+        """ Node labels, or (label, attributes) pairs, as ScheduleDAG.nodes """
+        if select == '*':
+            ids = range(len(self.names))
+        else:
+            ids = self.node_indices(select).tolist()
+        if data is False:
+            return [self.names[v] for v in ids]
+        return [(self.names[v], self.attributes(v)) for v in ids]
+
+    def attributes(self, v):
+        """ Attribute dict of node id v, as in ScheduleDAG """
+        code = self.types[v]
+        d = {'type': NODE_TYPES[code]}
+        if code in (MATCH, TABLE):
+            d['key_width'] = int(self.key_width[v])
+        if code in (ACTION, TABLE):
+            d['num_fields'] = int(self.num_fields[v])
+        if code == ACTION:
+            d['condition'] = bool(self.condition[v])
+        return d
+
+    def edges(self, data=False):
+        """ (u, v) label pairs, or (u, v, {'delay': delay}) with data """
+        edges = []
+        for u in range(len(self.names)):
+            for k in range(self.succ_ptr[u], self.succ_ptr[u + 1]):
+                if data is False:
+                    edges.append((self.names[u], self.names[self.succ_idx[k]]))
+                else:
+                    edges.append((self.names[u], self.names[self.succ_idx[k]], {'delay': self.succ_delay[k]}))
+        return edges
+
+    def edge_delays(self):
+        """ (u, v, delay) of every edge, in the order of edges() """
+        return self._cached('edge_delays', lambda: [(u, v, d['delay']) for (u, v, d) in self.edges(data=True)])
+
+    def edge_arrays(self):
+        """ (src, dst, delay) NumPy arrays of node ids and delays, one entry
+        per edge in the order of edges() """
+        return self._cached('edge_arrays', lambda: (np.repeat(np.arange(len(self.names)), np.diff(self.succ_ptr)),\
+                                                    np.array(self.succ_idx, dtype=np.int64),\
+                                                    np.array(self.succ_delay, dtype=np.int64)))
+
+    def predecessors(self, v):
+        i = self.index[v]
+        return [self.names[u] for u in self.pred_idx[self.pred_ptr[i]:self.pred_ptr[i + 1]]]
+
+    def successors(self, v):
+        i = self.index[v]
+        return [self.names[w] for w in self.succ_idx[self.succ_ptr[i]:self.succ_ptr[i + 1]]]
+
+    def in_degree(self, v):
+        i = self.index[v]
+        return self.pred_ptr[i + 1] - self.pred_ptr[i]
+
+    def out_degree(self, v):
+        i = self.index[v]
+        return self.succ_ptr[i + 1] - self.succ_ptr[i]
+
+    def delay(self, u, v):
+        """ Delay of the edge (u, v) """
+        i = self.index[u]
+        j = self.index[v]
+        for k in range(self.succ_ptr[i], self.succ_ptr[i + 1]):
+            if self.succ_idx[k] == j:
+                return self.succ_delay[k]
+        raise KeyError((u, v))
+
+    def topological_order(self):
+        return [self.names[v] for v in self.order]
+
+    def node_indices(self, select):
+        return self._cached(('node_indices', select),\
+                            lambda: np.flatnonzero(self.types == NODE_TYPES.index(select)))
+
+    def longest(self):
+        """ Returns (head, tail) lists by node id: the longest delay on a
+        path into and out of every node """
+        return self._cached('longest', self._longest)
+
+    def _longest(self):
+        n = len(self.names)
+        head = [0] * n
+        tail = [0] * n
+        for v in self.order:
+            for k in range(self.pred_ptr[v], self.pred_ptr[v + 1]):
+                head[v] = max(head[v], head[self.pred_idx[k]] + self.pred_delay[k])
+        for v in reversed(self.order):
+            for k in range(self.succ_ptr[v], self.succ_ptr[v + 1]):
+                tail[v] = max(tail[v], tail[self.succ_idx[k]] + self.succ_delay[k])
+        return head, tail
+
+    def head_and_tail(self):
+        (head, tail) = self.longest()
+        return dict(zip(self.names, head)), dict(zip(self.names, tail))
+
+    def critical_path(self):
+        (path, latency) = self._cached('critical_path', self._critical_path)
+        return list(path), latency
+
+    def _critical_path(self):
+        names = self.names
+        # (distance from a root, predecessor on the longest path) of every node
+        dist = [None] * len(names)
+        for v in self.order:
+            pairs = [(dist[self.pred_idx[k]][0] + self.pred_delay[k], names[self.pred_idx[k]])\
+                     for k in range(self.pred_ptr[v], self.pred_ptr[v + 1])]
+            dist[v] = max(pairs) if pairs else (0, names[v])
+        if not self.order:
+            return [], 1
+        v = max(self.order, key=lambda u: dist[u])
+        (length, _) = dist[v]
+        latency = length + 1 # one extra cycle for final operation
+        path = []
+        while length > 0:
+            path.append(names[v])
+            (length, u) = dist[v]
+            v = self.index[u]
+        return list(reversed(path)), latency
+
+    def resource_arrays(self, input_spec):
+        return self._cached(('resource_arrays', input_spec.match_unit_size),\
+                            lambda: ScheduleArrays(self, input_spec))
+
+def _invalidating(name):
+    method = getattr(nx.DiGraph, name)
+    def mutator(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        self.invalidate_caches()
+        return result
+    mutator.__name__ = name
+    mutator.__doc__ = method.__doc__
+    return mutator
+
+for _name in ('add_node', 'add_nodes_from', 'remove_node', 'remove_nodes_from', 'add_edge', 'add_edges_from',\
+              'add_weighted_edges_from', 'remove_edge', 'remove_edges_from', 'clear'):
+    setattr(ScheduleDAG, _name, _invalidating(_name))
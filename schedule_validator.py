@@ -0,0 +1,93 @@
+import collections
+import os
+import numpy as np
+
+# Set DRMT_VALIDATE=1 to check every schedule the solvers produce
+DEBUG_VALIDATE = (os.environ.get('DRMT_VALIDATE', '0') == '1')
+
+class Violation(collections.namedtuple('Violation', ['kind', 'slot', 'nodes', 'value', 'limit'])):
+    """ One broken constraint of a dRMT schedule
+
+    kind  : 'missing', 'dependency', 'match_units', 'action_fields',
+            'match_proc' or 'action_proc'
+    slot  : ring slot for resource violations, None otherwise
+    nodes : nodes involved (the edge (u, v) for dependencies)
+    value : observed value (time difference, usage in the slot)
+    limit : required minimum delay or maximum usage
+    """
+    __slots__ = ()
+
+    def __str__(self):
+        if self.kind == 'missing':
+            return 'missing: %s has no start time' % (self.nodes,)
+        if self.kind == 'dependency':
+            return 'dependency: %s -> %s is %d cycles apart, needs %d' %\
+                   (self.nodes[0], self.nodes[1], self.value, self.limit)
+        return '%s: slot %d uses %d, limit is %d (%s)' %\
+               (self.kind, self.slot, self.value, self.limit, ', '.join(str(v) for v in self.nodes))
+
+def validate_schedule(G, input_spec, schedule, period, unit_delays = False):
+  """ Checks a dRMT schedule against the DAG and the hardware spec
+
+  Parameters
+  ----------
+  G : ScheduleDAG or FrozenScheduleDAG
+      DAG with delays on the edges
+  input_spec : module
+      Input with the hardware limits filled in
+  schedule : dict
+      Start time of every node
+  period : int
+      Period of the schedule
+  unit_delays : bool
+      Every edge with a delay only needs one cycle, as in the pRMT models
+      where a dependency only needs a later substage. A pRMT schedule is
+      checked with its length as the period.
+
+  Returns
+  -------
+  violations : list
+      Violation for every broken constraint, empty if the schedule is valid
+  """
+  missing = [v for v in G.nodes() if v not in schedule]
+  if missing:
+    return [Violation('missing', None, v, None, None) for v in missing]
+
+  violations = []
+
+  # Dependency delays, all edges at once from the frozen DAG
+  frozen = G.freeze()
+  arrays = frozen.resource_arrays(input_spec)
+  times = arrays.times(schedule)
+  (src, dst, delay) = frozen.edge_arrays()
+  if unit_delays:
+    delay = (delay > 0).astype(delay.dtype)
+  for k in np.flatnonzero(times[dst] - times[src] < delay):
+    (u, v) = (frozen.names[src[k]], frozen.names[dst[k]])
+    violations.append(Violation('dependency', None, (u, v), schedule[v] - schedule[u], int(delay[k])))
+
+  # Resources per slot of the ring
+  usage = arrays.periodic_usage(times, period)
+  slots = times % period
+  for (kind, limit, select) in (('match_units', input_spec.match_unit_limit, arrays.is_match),\
+                                ('action_fields', input_spec.action_fields_limit, arrays.is_action),\
+                                ('match_proc', input_spec.match_proc_limit, arrays.is_match),\
+                                ('action_proc', input_spec.action_proc_limit, arrays.is_action)):
+    for r in np.flatnonzero(usage[kind] > limit):
+      nodes = [arrays.names[i] for i in np.flatnonzero(select & (slots == r))]
+      violations.append(Violation(kind, int(r), nodes, int(usage[kind][r]), limit))
+
+  return violations
+
+def debug_check(G, input_spec, schedule, period, source, unit_delays = False):
+  """ Validates a schedule when DEBUG_VALIDATE is on, a no-op otherwise
+
+  Prints every violation and fails an assertion, naming the source
+  (solver or heuristic) that produced the schedule.
+  """
+  if (not DEBUG_VALIDATE) or (schedule is None):
+    return
+  violations = validate_schedule(G, input_spec, schedule, period, unit_delays)
+  for violation in violations:
+    print ('Invalid schedule from %s: %s' % (source, violation))
+  assert(not violations)
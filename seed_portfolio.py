@@ -0,0 +1,303 @@
+import importlib
+import multiprocessing
+import random
+import sys
+import threading
+import time as tm
+from collections import deque
+
+from schedule_dag import ScheduleDAG
+from dag_io import load_input_spec
+from randomized_sieve import SieveDAG, index_dag_sieve, parallel_rnd_sieve, TRIAL_STRIDE, SeededSchedule,\
+                             normalize_schedule, new_seed
+from sieve_rotator import sieve_rotator
+from list_scheduler import list_schedule
+from my_greedy import MyGreedySolver
+from prmt import PrmtFineSolver
+from schedule_validator import debug_check
+import tracing
+
+# Wall clock time of one round, split between the heuristics still running
+ROUND_TIME = 1.0
+
+# Share of a round every running heuristic gets, however slow it improves
+MIN_SHARE = 0.1
+
+# Rounds whose improvements set the share of a heuristic in the next one
+RATE_ROUNDS = 5
+
+class SeedPortfolio:
+    """ Runs seed heuristics for the dRMT ILP under one time budget
+
+    A heuristic is registered as a factory that returns a generator.
+    Every step of the generator is one unit of work: it is sent the best
+    latency known so far (None before the first schedule) and yields a
+    schedule (dict of start times) or None. A heuristic that is done
+    simply returns. One that yields None is dropped from the rounds,
+    unless it is registered with retry, whose steps are independent
+    trials that may fail (the sieve).
+
+    The heuristics run in the same process, in rounds of ROUND_TIME
+    seconds. Every round, each running heuristic gets a slice in
+    proportion to how fast it lowered the best latency of the portfolio
+    in its last RATE_ROUNDS rounds (cycles per second of its slices), and
+    at least MIN_SHARE of the round. A first schedule counts as lowering
+    the critical path bound of the sieve. A heuristic that stopped
+    improving falls back to MIN_SHARE after RATE_ROUNDS rounds; when none
+    improved lately, they share the round equally. The rounds share one
+    process on purpose, so that a slice gives a heuristic more or less
+    of it; the sieve, which scales with cores, runs on worker processes
+    as a blocking heuristic instead, and PeriodSweep runs its probes in
+    parallel.
+
+    Heuristics registered as blocking, whose single step is a long solver
+    call (PRMT), instead run to completion on a thread of their own next
+    to the rounds. run() waits for them, as the seed stage always did.
+    The rounds stop early once the best latency meets the critical path,
+    and then set stop, which blocking heuristics that can end early
+    (the parallel sieve) watch. known_best holds the best latency so far
+    (0 before the first schedule) for heuristics in other processes.
+    """
+    def __init__(self, input_spec, dag, period_duration, time_limit):
+        self.input_spec = input_spec
+        self.G = dag
+        self.period_duration = period_duration
+        self.time_limit = time_limit
+        self.heuristics = []   # (name, factory, blocking, retry) in registration order
+        self.best = None       # (latency, name, schedule)
+        self.log = dict()      # name -> [(seconds since start, latency)] of every improvement
+        self.spent = dict()    # name -> seconds of running time
+        self.steps = dict()    # name -> number of steps
+        self.recent = dict()   # name -> (cycles gained, seconds) of its last RATE_ROUNDS slices
+        self.stop = multiprocessing.Event()
+        self.known_best = multiprocessing.Value('l', 0)
+
+    def register(self, name, factory, blocking = False, retry = False):
+        """ factory(portfolio) returns the step generator of the heuristic """
+        self.heuristics.append((name, factory, blocking, retry))
+
+    def run(self):
+        """ Returns (name, schedule) of the best seed, (None, None) if none is found """
+        start = tm.time()
+        deadline = start + self.time_limit
+        path, delay = self.G.critical_path()
+        reference = 2 * delay
+        # No schedule starts its last node before the longest path into it
+        lower = max(SieveDAG(None, self.G).head or [0])
+
+        running = []
+        threads = []
+        results = [] # (name, schedule) from the blocking heuristics
+        retries = set()
+        for (name, factory, blocking, retry) in self.heuristics:
+          if retry:
+            retries.add(name)
+          self.log[name] = []
+          self.spent[name] = 0.0
+          self.steps[name] = 0
+          self.recent[name] = deque(maxlen = RATE_ROUNDS)
+          gen = factory(self)
+          next(gen)
+          if blocking:
+            thread = threading.Thread(target = self._run_blocking, args = (name, gen, results, tracing.current()))
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+          else:
+            running.append((name, gen))
+
+        while (running or any(thread.is_alive() for thread in threads)) and (tm.time() < deadline):
+          self._drain(results, start)
+          if self.best and (self.best[0] <= lower):
+            break
+          if not running:
+            # Only blocking heuristics left
+            tm.sleep(min(MIN_SHARE * ROUND_TIME, max(0.0, deadline - tm.time())))
+            continue
+          rates = []
+          for (name, gen) in running:
+            recent = self.recent[name]
+            rates.append(sum(gain for (gain, seconds) in recent) /\
+                         max(sum(seconds for (gain, seconds) in recent), 1e-3))
+          total = sum(rates)
+          round_time = min(ROUND_TIME, deadline - tm.time())
+          finished = []
+          for ((name, gen), rate) in zip(running, rates):
+            share = max(MIN_SHARE, rate / total) if total else 1.0 / len(running)
+            slice_end = min(tm.time() + share * round_time, deadline)
+            slice_start = tm.time()
+            before = self.best[0] if self.best else reference
+            try:
+              while True:
+                schedule = gen.send(self.best[0] if self.best else None)
+                self.steps[name] += 1
+                if schedule:
+                  self._offer(name, schedule, start)
+                elif name not in retries:
+                  finished.append(name)
+                  break
+                if tm.time() >= slice_end:
+                  break
+            except StopIteration:
+              finished.append(name)
+            self.spent[name] += tm.time() - slice_start
+            gain = max(0, before - (self.best[0] if self.best else reference))
+            self.recent[name].append((gain, tm.time() - slice_start))
+            tracing.add(name, slice_start, tm.time() - slice_start)
+          running = [(name, gen) for (name, gen) in running if name not in finished]
+
+        self.stop.set()
+        for thread in threads:
+          thread.join()
+        self._drain(results, start)
+        if self.best is None:
+          print ("All heuristics returned nothing")
+          return (None, None)
+        seed = getattr(self.best[2], 'seed', None)
+        print ("Picking output from %s, latency %d%s" % (self.best[1], self.best[0],\
+                                                        '' if seed is None else ', seed %d' % seed))
+        return (self.best[1], self.best[2])
+
+    def _run_blocking(self, name, gen, results, trace_parent):
+        slice_start = tm.time()
+        # Under the span that started the portfolio, on this thread
+        with tracing.span(name, parent = trace_parent):
+          try:
+            while True:
+              # list.append is atomic, run() pops the results
+              results.append((name, gen.send(None)))
+          except StopIteration:
+            pass
+        self.spent[name] = tm.time() - slice_start
+
+    def _drain(self, results, start):
+        while results:
+          (name, schedule) = results.pop(0)
+          self.steps[name] += 1
+          if schedule:
+            self._offer(name, schedule, start)
+
+    def _offer(self, name, schedule, start):
+        debug_check(self.G, self.input_spec, schedule, self.period_duration, name)
+        latency = max(schedule.values())
+        best = self.log[name][-1][1] if self.log[name] else None
+        if (best is None) or (latency < best):
+          self.log[name].append((tm.time() - start, latency))
+        # ties go to the earlier improvement
+        if (self.best is None) or (latency < self.best[0]):
+          self.best = (latency, name, schedule)
+          self.known_best.value = latency
+
+    def print_log(self):
+        print ('{:*^80}'.format(' Seed heuristics '))
+        for (name, factory, blocking, retry) in self.heuristics:
+          improvements = ', '.join('%d at %.2f s' % (latency, elapsed) for (elapsed, latency) in self.log[name])
+          print ('%-16s %8d steps %8.2f s   %s' % (name, self.steps[name], self.spent[name], improvements or 'nothing'))
+
+def sieve_steps(portfolio, seed = None):
+  """ rnd_sieve one trial per step, the returned schedules are SeededSchedules """
+  if seed is None:
+    seed = new_seed()
+  dag = portfolio.G
+  sdag = SieveDAG(portfolio.input_spec, dag)
+  path, delay = dag.critical_path()
+  nodes = dag.number_of_nodes()
+  trial = 0
+  best = yield None
+  while True:
+    trial_seed = seed * TRIAL_STRIDE + trial
+    schedule = index_dag_sieve(portfolio.input_spec, dag, trial % nodes, 2*delay, portfolio.period_duration,\
+                               sdag, rng=random.Random(trial_seed), cutoff=(best if best else 2*delay))
+    trial += 1
+    best = yield (normalize_schedule(schedule, trial_seed) if schedule else None)
+
+def parallel_sieve_steps(portfolio, seed = None, processes = None):
+  """ parallel_rnd_sieve on worker processes until the portfolio stops, a
+  single blocking step. Its trials prune against the best latency of the
+  whole portfolio. """
+  yield None
+  yield parallel_rnd_sieve(portfolio.input_spec, portfolio.G, portfolio.time_limit, portfolio.period_duration,\
+                           processes, seed, stop=portfolio.stop, known_best=portfolio.known_best)
+
+def prmt_steps(portfolio, latency_spec, backend = None):
+  """ PRMT + rotator, a single step. backend is the ILP backend name,
+  None for ilp_backend.DEFAULT_BACKEND """
+  yield None
+  psolver = PrmtFineSolver(portfolio.G, portfolio.input_spec, latency_spec, seed_greedy=True, backend=backend)
+  solution = psolver.solve(solve_coarse = False)
+  yield sieve_rotator(solution.ops_at_time, portfolio.period_duration, latency_spec.dM, latency_spec.dA)
+
+def list_steps(portfolio):
+  """ The list scheduler with its default priority, a single step """
+  yield None
+  yield list_schedule(portfolio.input_spec, portfolio.G, portfolio.period_duration)
+
+def greedy_steps(portfolio, seed = None):
+  """ One MyGreedySolver run per step, its order breaks the ties of the
+  list scheduler priorities. The returned schedules are SeededSchedules,
+  see replay_greedy. """
+  rng = random.Random(seed)
+  sdag = SieveDAG(portfolio.input_spec, portfolio.G)
+  yield None
+  while True:
+    yield replay_greedy(portfolio.input_spec, portfolio.G, portfolio.period_duration, rng.randrange(2**31), sdag)
+
+def replay_greedy(input_spec, dag, period_duration, seed, sdag = None):
+  """ Runs the greedy step with the given MyGreedySolver seed
+
+  Returns
+  -------
+  schedule : SeededSchedule
+      The schedule greedy_steps returned with this seed (on the same DAG,
+      hardware and Python version), None if the list scheduler fails
+  """
+  solver = MyGreedySolver(dag, input_spec, seed=seed, tournament=3)
+  solver.solve()
+  schedule = list_schedule(input_spec, dag, period_duration, sdag=sdag, tie_break=solver.result)
+  return (SeededSchedule(schedule, seed) if schedule else None)
+
+def default_portfolio(input_spec, dag, latency_spec, period_duration, time_limit, seed = None, processes = None,\
+                      backend = None):
+  """ The portfolio DrmtScheduleSolver seeds from: the list scheduler,
+  PRMT + rotator, MyGreedySolver + list scheduler and the sieve.
+  The sieve runs on processes worker processes (all cores if None),
+  in the rounds instead when that is one core or this process is a
+  daemon (a PeriodSweep probe), which cannot have children. PRMT solves
+  with the ILP backend named backend, the default one if None. """
+  if processes is None:
+    processes = multiprocessing.cpu_count()
+  portfolio = SeedPortfolio(input_spec, dag, period_duration, time_limit)
+  portfolio.register('list scheduler', list_steps)
+  portfolio.register('PRMT', lambda p: prmt_steps(p, latency_spec, backend), blocking = True)
+  portfolio.register('greedy', lambda p: greedy_steps(p, seed))
+  if (processes > 1) and not multiprocessing.current_process().daemon:
+    portfolio.register('RND sieve', lambda p: parallel_sieve_steps(p, seed, processes), blocking = True)
+  else:
+    portfolio.register('RND sieve', lambda p: sieve_steps(p, seed), retry = True)
+  return portfolio
+
+if __name__ == "__main__":
+  # Cmd line args
+  if (len(sys.argv) != 6):
+    print ("Usage: ", sys.argv[0], " <DAG file> <HW file> <latency file> <P> <time limit in secs>")
+    exit(1)
+  input_file   = sys.argv[1]
+  hw_file      = sys.argv[2]
+  latency_file = sys.argv[3]
+  P = int(sys.argv[4])
+  time_limit = float(sys.argv[5])
+
+  input_spec = load_input_spec(input_file)
+  hw_spec    = importlib.import_module(hw_file, "*")
+  latency_spec=importlib.import_module(latency_file, "*")
+  input_spec.action_fields_limit = hw_spec.action_fields_limit
+  input_spec.match_unit_limit    = hw_spec.match_unit_limit
+  input_spec.match_unit_size     = hw_spec.match_unit_size
+  input_spec.action_proc_limit   = hw_spec.action_proc_limit
+  input_spec.match_proc_limit    = hw_spec.match_proc_limit
+
+  G = ScheduleDAG()
+  G.create_dag(input_spec.nodes, input_spec.edges, latency_spec)
+  portfolio = default_portfolio(input_spec, G, latency_spec, P, time_limit)
+  (name, schedule) = portfolio.run()
+  portfolio.print_log()
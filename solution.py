@@ -5,6 +5,10 @@ class Solution:
     self.match_units_usage   = dict()
     self.match_proc_usage    = dict()
     self.action_proc_usage   = dict()
+    self.gap                 = None # MIP gap, 0.0 if proven optimal
+    self.seed                = None # where the MIP start came from
+    self.seed_value          = None # seed that replays the MIP start, None if it is not from a randomized heuristic
+    self.horizon             = None # longest schedule the dRMT ILP searched, infeasible only means none up to it
 
 class MySolution():
   def __init__(self):
@@ -0,0 +1,48 @@
+import importlib
+
+from dag_io import load_dag
+from list_scheduler import list_schedule
+from schedule_validator import validate_schedule
+
+# Optimal periods of the paper runs (experiment_results/drmt_ipc_*), the
+# list scheduler finds a schedule at each of them
+OPTIMAL = [('large_hw', 'switch_egress', 11),\
+           ('large_hw', 'switch_egress_subset', 5),\
+           ('large_hw_ipc2', 'switch_combined', 21),\
+           ('large_hw_ipc2', 'switch_combined_subset', 11),\
+           ('large_hw_ipc2', 'switch_egress', 7),\
+           ('large_hw_ipc2', 'switch_egress_subset', 3)]
+
+# With one packet per slot the other programs need a few cycles more than
+# the optimum (21, 11, 17 and 11), still far below where the scheduler
+# used to find its first schedule
+NEAR_OPTIMAL = [('large_hw', 'switch_combined', 25),\
+                ('large_hw', 'switch_combined_subset', 14),\
+                ('large_hw', 'switch_ingress', 21),\
+                ('large_hw', 'switch_ingress_subset', 14)]
+
+def _problem(hw_file, program):
+  hw_spec = importlib.import_module(hw_file)
+  latency_spec = importlib.import_module('drmt_latencies')
+  (input_spec, G) = load_dag(program, latency_spec)
+  for name in ('action_fields_limit', 'match_unit_limit', 'match_unit_size', 'action_proc_limit', 'match_proc_limit'):
+    setattr(input_spec, name, getattr(hw_spec, name))
+  return (input_spec, G)
+
+def _check(cases):
+  for (hw_file, program, period) in cases:
+    (input_spec, G) = _problem(hw_file, program)
+    schedule = list_schedule(input_spec, G, period)
+    assert schedule is not None, '%s %s: no schedule at period %d' % (hw_file, program, period)
+    assert not validate_schedule(G, input_spec, schedule, period), '%s %s: invalid schedule' % (hw_file, program)
+
+def test_optimal_periods():
+  _check(OPTIMAL)
+
+def test_near_optimal_periods():
+  _check(NEAR_OPTIMAL)
+
+if __name__ == "__main__":
+  test_optimal_periods()
+  test_near_optimal_periods()
+  print ('ok')
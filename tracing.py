@@ -0,0 +1,214 @@
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+# Set DRMT_TRACE=<file> to record named spans, print a summary table and
+# write the spans to <file> in the Chrome trace format (chrome://tracing,
+# Perfetto). When unset every call below returns at once.
+TRACE_PATH = os.environ.get('DRMT_TRACE')
+
+_enabled = bool(TRACE_PATH)
+_events = [] # (path, start, duration, pid, thread, args) of the finished spans
+_local = threading.local()
+
+class _NullSpan(object):
+    """ What span() and start() return when tracing is off """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def mark(self, name):
+        pass
+
+    def stop(self):
+        pass
+
+_NULL = _NullSpan()
+
+class _Span(object):
+    """ An open span, the child of the span open in this thread when it
+    starts, or of parent when given """
+    __slots__ = ('path', 'args', 'begin', 'last')
+
+    def __init__(self, name, parent, args):
+        if parent is None:
+          parent = current()
+        self.path = name if parent is None else parent + '/' + name
+        self.args = args
+
+    def __enter__(self):
+        _stack().append(self)
+        self.begin = self.last = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def mark(self, name):
+        """ Ends the child span name, that started at the last mark """
+        now = time.time()
+        _record(self.path + '/' + name, self.last, now - self.last, None)
+        self.last = now
+
+    def stop(self):
+        now = time.time()
+        stack = _stack()
+        if self in stack:
+          # Spans left open inside this one end with it
+          del stack[stack.index(self):]
+        _record(self.path, self.begin, now - self.begin, self.args)
+
+def _stack():
+  try:
+    return _local.stack
+  except AttributeError:
+    _local.stack = []
+    return _local.stack
+
+def _record(path, start, duration, args):
+  # list.append is atomic, spans end on any thread
+  _events.append((path, start, duration, os.getpid(), threading.current_thread().name, args))
+
+def enabled():
+  return _enabled
+
+def enable(path):
+  """ Turns tracing on, as DRMT_TRACE=path would """
+  global TRACE_PATH, _enabled
+  (TRACE_PATH, _enabled) = (path, True)
+
+def current():
+  """ Path of the span open in this thread, None if there is none """
+  stack = getattr(_local, 'stack', None)
+  return stack[-1].path if stack else None
+
+def span(name, parent = None, **args):
+  """ Context manager timing its block as the span name
+
+  Parameters
+  ----------
+  name : string
+      Span name, the spans with the same path are aggregated
+  parent : string
+      Path of the parent span, for spans started on another thread or
+      process than their parent (see current()). By default the span
+      open in this thread.
+  args : dict
+      Shown with the span in the trace
+  """
+  if not _enabled:
+    return _NULL
+  return _Span(name, parent, args)
+
+def start(name, parent = None, **args):
+  """ Like span(), for a block with several exits: returns the open span,
+  span.mark(child) ends a child span that started at the previous mark
+  (checkpoints) and span.stop() ends the span """
+  if not _enabled:
+    return _NULL
+  return _Span(name, parent, args).__enter__()
+
+def add(name, start, duration, parent = None, **args):
+  """ Records a span timed by the caller, e.g. one reported by a solver """
+  if not _enabled:
+    return
+  if parent is None:
+    parent = current()
+  _record(name if parent is None else parent + '/' + name, start, duration, args)
+
+def take():
+  """ Returns and forgets the spans of this process, to send them to the
+  parent process. A forked child drops the spans it inherited. """
+  pid = os.getpid()
+  events = [event for event in _events if event[3] == pid]
+  del _events[:]
+  return events
+
+def merge(events):
+  """ Adds the spans of a child process """
+  _events.extend(events)
+
+def summary():
+  """ Count, total and max seconds of every span path, over all threads,
+  processes and binary search probes
+
+  Returns
+  -------
+  rows : list
+      (path, count, total, max) with every path after its parent, the
+      children in the order they first started
+  """
+  first = dict()
+  totals = collections.defaultdict(lambda: [0, 0.0, 0.0])
+  for (path, start, duration, pid, thread, args) in _events:
+    first[path] = min(first.get(path, start), start)
+    row = totals[path]
+    row[0] += 1
+    row[1] += duration
+    row[2] = max(row[2], duration)
+  def order(path):
+    names = path.split('/')
+    return [(first.get('/'.join(names[:i + 1]), 0.0), names[i]) for i in range(len(names))]
+  return [(path,) + tuple(totals[path]) for path in sorted(totals, key = order)]
+
+def totals():
+  """ Total seconds per span path, for result records """
+  return dict((path, round(total, 6)) for (path, count, total, longest) in summary())
+
+def print_summary():
+  print ('{:*^80}'.format(' Trace summary '))
+  print ('%-44s %6s %10s %10s %10s' % ('span', 'count', 'total (s)', 'mean (s)', 'max (s)'))
+  for (path, count, total, longest) in summary():
+    depth = path.count('/')
+    label = '  ' * depth + path.rsplit('/', 1)[-1]
+    print ('%-44s %6d %10.3f %10.3f %10.3f' % (label, count, total, total / count, longest))
+
+def write_chrome_trace(path):
+  """ Writes the spans as complete ('X') events of the Chrome trace
+  format, one row per process and thread """
+  origin = min([event[1] for event in _events] or [0.0])
+  threads = dict()
+  trace = []
+  for (span_path, start, duration, pid, thread, args) in sorted(_events, key = lambda event: event[1]):
+    tid = threads.setdefault((pid, thread), len(threads) + 1)
+    event_args = dict(args or {}, path = span_path)
+    trace.append({'name': span_path.rsplit('/', 1)[-1], 'cat': span_path.split('/', 1)[0], 'ph': 'X',\
+                  'ts': round((start - origin) * 1e6, 1), 'dur': round(duration * 1e6, 1),\
+                  'pid': pid, 'tid': tid, 'args': event_args})
+  for ((pid, thread), tid) in threads.items():
+    trace.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread}})
+  directory = os.path.dirname(path)
+  if directory and not os.path.isdir(directory):
+    os.makedirs(directory)
+  with open(path, 'w') as f:
+    json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+
+def report():
+  """ Prints the summary and writes the trace file, if tracing is on """
+  if not _enabled:
+    return
+  print_summary()
+  write_chrome_trace(TRACE_PATH)
+  print ('Trace of %d spans written to %s' % (len(_events), TRACE_PATH))
+
+if __name__ == "__main__":
+  # Summary of a trace file
+  if (len(sys.argv) != 2):
+    print ("Usage: ", sys.argv[0], " <trace file>")
+    print ("Prints the span summary of a trace written with DRMT_TRACE=<trace file>")
+    exit(1)
+  with open(sys.argv[1]) as f:
+    trace = json.load(f)
+  for event in trace['traceEvents']:
+    if event['ph'] == 'X':
+      _events.append((event['args']['path'], event['ts'] / 1e6, event['dur'] / 1e6,\
+                      event['pid'], event['tid'], None))
+  print_summary()